@@ -0,0 +1,82 @@
+#Live version of DropAreaExtraction.py for an experiment that is still running: the selected
+#folder is polled for new ScanArea frames, only new frames are analysed (earlier results come
+#from the per-frame cache in .droplet_cache) and the droplet volumes are appended to
+#spot_analysis_live.csv and to the plot. Stop with Ctrl+C or by closing the plot window.
+
+import os
+import matplotlib.pyplot as plt
+from tkinter import Tk
+from tkinter.filedialog import askdirectory
+
+from Functions.droplet_watch import CACHE_FOLDER, LIVE_FILENAME, LiveResults, watch_frames
+
+# Seconds between two looks at the folder
+POLL_SECONDS = 10
+
+# Worker processes for frames that land together (None = all cores, 1 = no pool)
+MAX_WORKERS = None
+
+# No legend when more droplets are tracked
+MAX_LEGEND = 20
+
+
+def main():
+    # 📂 Select folder receiving the images
+    Tk().withdraw()
+    folder_path = askdirectory(title="Select the folder receiving the images")
+
+    if not folder_path:
+        print("No folder selected. Exiting.")
+        return
+
+    # Create a subfolder for ROI images
+    roi_folder = os.path.join(folder_path, "ROIs")
+    os.makedirs(roi_folder, exist_ok=True)
+
+    output_path = os.path.join(folder_path, LIVE_FILENAME)
+    results = LiveResults(output_path)
+
+    # 🎨 Live plot of the volume over time, one line per droplet
+    plt.ion()
+    fig, ax = plt.subplots(figsize=(8, 5))
+    ax.set_xlabel("Elapsed Time (minutes)")
+    ax.set_ylabel("Estimated Volume (nL)")
+    ax.set_title("Change in Droplet Volume Over Time")
+    ax.grid(True)
+    curves = {}
+
+    def wait(seconds):
+        if not plt.fignum_exists(fig.number):
+            raise KeyboardInterrupt
+        plt.pause(seconds)
+
+    try:
+        for filename, _, time_str, spots in watch_frames(folder_path, cache_dir=os.path.join(folder_path, CACHE_FOLDER),
+                                                         poll_seconds=POLL_SECONDS, roi_folder=roi_folder,
+                                                         max_workers=MAX_WORKERS, sleep=wait):
+            rows = results.add(time_str, spots)
+            new_droplets = False
+            for _, elapsed_time, spot, _, _, _, _, volume in rows:
+                if spot not in curves:
+                    (line,) = ax.plot([], [], marker="o", label=spot)
+                    curves[spot] = (line, [], [])
+                    new_droplets = True
+                line, times, volumes = curves[spot]
+                times.append(elapsed_time)
+                volumes.append(volume)
+                line.set_data(times, volumes)
+
+            if new_droplets and len(curves) <= MAX_LEGEND:
+                ax.legend()
+            ax.relim()
+            ax.autoscale_view()
+            fig.canvas.draw_idle()
+            print(f"{filename}: {len(rows)} droplets")
+    except KeyboardInterrupt:
+        pass
+
+    print(f"✅ Results saved to: {output_path}")
+
+
+if __name__ == "__main__":
+    main()
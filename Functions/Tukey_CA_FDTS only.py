@@ -3,12 +3,11 @@ import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
 import seaborn as sns
-import statsmodels.api as sm
-from statsmodels.formula.api import ols
-from statsmodels.stats.multicomp import pairwise_tukeyhsd
 from tkinter import Tk
 from tkinter.filedialog import askopenfilename
 
+from Functions.factorial_anova import anova_table as factorial_anova_table, tukey_hsd
+
 # 📂 Ask user to select the Excel file
 Tk().withdraw()
 file_path = askopenfilename(title="Select the Excel file", filetypes=[("Excel files", "*.xlsx")])
@@ -36,17 +35,14 @@ df_melted["Surface_Type"] = df_melted["Condition"].apply(lambda x: "F" if x.star
 df_f_only = df_melted[df_melted["Surface_Type"] == "F"].dropna()
 
 # 🎯 Run One-Way ANOVA for Nanopillar Heights
-anova_model = ols('Measurement ~ C(Nanostructure)', data=df_f_only).fit()
-anova_table = sm.stats.anova_lm(anova_model, typ=2)
+anova_table = factorial_anova_table(df_f_only, "Measurement", ["Nanostructure"])
 
 # 🎯 Tukey's HSD Post-Hoc Test (Only if there are multiple groups)
 unique_nanostructures = df_f_only["Nanostructure"].nunique()
 
 if unique_nanostructures > 1:
-    tukey_results = pairwise_tukeyhsd(df_f_only["Measurement"], df_f_only["Nanostructure"])
-
-    # 🎯 Convert Tukey results into a DataFrame
-    tukey_summary = pd.DataFrame(data=tukey_results._results_table.data[1:], columns=tukey_results._results_table.data[0])
+    # 🎯 Tukey results as a DataFrame (rounded like the statsmodels summary table)
+    tukey_summary = tukey_hsd(df_f_only, "Measurement", "Nanostructure").round(4)
 
     # Rename columns for clarity
     tukey_summary = tukey_summary.rename(columns={
@@ -0,0 +1,120 @@
+#Presence/absence of every peptide in every replicate column, stored as packed bits.
+#Each peptide row holds its replicate columns as bits (np.packbits, 8 replicates per byte),
+#so the matrix takes 1/64 of an int64 0/1 table. Detection counts per peptide x condition
+#are popcounts of the row bytes under one bit mask per condition, and counts per GRAVY bin
+#or per condition are sums of those, without unpacking the matrix or going to long form.
+#A replicate counts as detected when its value is neither missing nor 0.
+
+import numpy as np
+import pandas as pd
+
+# Rows packed per step when building the matrix, so only a block is held unpacked
+PACK_CHUNK_ROWS = 65536
+
+# Number of set bits of every byte value
+_POPCOUNT = np.array([bin(value).count("1") for value in range(256)], dtype=np.uint8)
+
+
+class DetectionMatrix:
+    """Packed detected/not-detected bits of a peptide x replicate table.
+
+    bits is a (peptides, ceil(replicates / 8)) uint8 array as returned by
+    np.packbits(detected, axis=1); columns are the replicate names in bit order and index
+    the peptide labels.
+    """
+
+    def __init__(self, bits, columns, index=None):
+        self.bits = bits
+        self.columns = list(columns)
+        self.index = pd.RangeIndex(len(bits)) if index is None else index
+        self._position = {col: i for i, col in enumerate(self.columns)}
+
+    @classmethod
+    def from_frame(cls, df, columns, chunk_rows=PACK_CHUNK_ROWS):
+        """Pack the replicate columns of df, a block of rows at a time."""
+        columns = list(columns)
+        bits = np.empty((len(df), (len(columns) + 7) // 8), dtype=np.uint8)
+        for start in range(0, len(df), chunk_rows):
+            values = df[columns].iloc[start:start + chunk_rows].to_numpy(dtype=float)
+            bits[start:start + len(values)] = np.packbits(~np.isnan(values) & (values != 0), axis=1)
+        return cls(bits, columns, df.index)
+
+    @property
+    def shape(self):
+        return len(self.bits), len(self.columns)
+
+    def detected(self, rows=None):
+        """Unpacked bool matrix (of all rows, or of a slice/index of rows)."""
+        bits = self.bits if rows is None else self.bits[rows]
+        return np.unpackbits(bits, axis=1, count=len(self.columns)).astype(bool)
+
+    def group_masks(self, groups):
+        """One byte mask per group ({name: [columns]}), shape (groups, bytes per row)."""
+        selected = np.zeros((len(groups), len(self.columns)), dtype=bool)
+        for i, cols in enumerate(groups.values()):
+            selected[i, [self._position[col] for col in cols]] = True
+        return np.packbits(selected, axis=1)
+
+    def detected_counts(self, groups):
+        """Detected replicates per peptide x group (uint16 array, groups in dict order)."""
+        counts = np.empty((len(self.bits), len(groups)), dtype=np.uint16)
+        for i, mask in enumerate(self.group_masks(groups)):
+            counts[:, i] = _POPCOUNT[self.bits & mask].sum(axis=1, dtype=np.uint16)
+        return counts
+
+    def missing_rates(self, groups, pool_labels=False):
+        """Fraction of missing replicates per peptide x group, as a DataFrame.
+
+        With pool_labels, rows sharing an index label (a peptide at several charges) are
+        counted together and the result has one row per label, sorted like a groupby.
+        """
+        n_replicates = np.array([len(cols) for cols in groups.values()])
+        counts = self.detected_counts(groups)
+        index = self.index
+        rows = np.ones(len(counts), dtype=np.int64)
+        if pool_labels:
+            codes, index = pd.factorize(self.index, sort=True)
+            rows = np.bincount(codes, minlength=len(index))
+            counts = np.stack([np.bincount(codes, weights=counts[:, i], minlength=len(index))
+                               for i in range(len(groups))], axis=1)
+        values = rows[:, None] * n_replicates
+        rates = (values - counts) / values
+        return pd.DataFrame(rates, index=index, columns=list(groups))
+
+    def replicate_counts(self):
+        """Detected peptides per replicate column, as a Series."""
+        counts = np.zeros(len(self.columns), dtype=np.int64)
+        for byte in range(self.bits.shape[1]):
+            # Every byte holds up to 8 replicates, most significant bit first
+            column = self.bits[:, byte]
+            for bit in range(min(8, len(self.columns) - byte * 8)):
+                counts[byte * 8 + bit] = np.count_nonzero(column & (0x80 >> bit))
+        return pd.Series(counts, index=self.columns)
+
+    def binned_missing_rates(self, groups, bin_index, bin_codes):
+        """Mean missing rate per GRAVY bin x group, for the bin codes of a GravyBinIndex.
+
+        The mean over the peptides of a bin of their per-group missing rate. Rows with code
+        -1 are left out; bins without peptides are NaN.
+        """
+        bin_codes = np.asarray(bin_codes)
+        in_range = bin_codes >= 0
+        counts = self.detected_counts(groups)[in_range]
+        codes = bin_codes[in_range]
+        n_replicates = np.array([len(cols) for cols in groups.values()])
+
+        peptides = np.bincount(codes, minlength=bin_index.num_bins)
+        detected = np.stack([np.bincount(codes, weights=counts[:, i], minlength=bin_index.num_bins)
+                             for i in range(len(groups))], axis=1)
+        values = peptides[:, None] * n_replicates
+        with np.errstate(invalid="ignore", divide="ignore"):
+            rates = (values - detected) / values
+        return pd.DataFrame(rates, index=pd.RangeIndex(bin_index.num_bins, name="GravyScore_bin"),
+                            columns=list(groups))
+
+    def group_missing_rates(self, groups):
+        """Fraction of missing values over all peptides and replicates of each group."""
+        n_replicates = np.array([len(cols) for cols in groups.values()])
+        detected = self.detected_counts(groups).sum(axis=0, dtype=np.int64)
+        values = len(self.bits) * n_replicates
+        return pd.Series((values - detected) / values, index=list(groups))
@@ -0,0 +1,337 @@
+#Droplet detection on ScanArea timelapse frames (YYYYMMDD_ScanArea_HHMMSS images).
+#Every frame is read, blurred, thresholded and contoured on its own, so the frames are
+#spread over a process pool and the spots come back in frame (timestamp) order. The ROI
+#image of a frame (the contours drawn in green) is encoded in the worker and written by a
+#background thread, so detection never waits on the disk. Detection can be restricted to a
+#region of interest (saved next to the frames or derived from the first one) and can find
+#candidate droplets on a downscaled pyramid level first, then contour them at full
+#resolution only in small windows around the candidates. Spots are measured for the whole
+#frame at once by droplet_metrics (one SPOT_DTYPE row per droplet, volume from a volume model).
+
+import json
+import os
+import queue
+import re
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+import numpy as np
+
+from Functions.droplet_metrics import contour_areas, contour_metrics
+
+IMAGE_EXTENSIONS = (".jpg", ".png", ".tif")
+
+# Contours with an area (pixels²) strictly between these are droplets
+MIN_AREA, MAX_AREA = 2000, 50000
+
+# Pixels darker than THRESHOLD (after the blur) are droplet
+THRESHOLD = 50
+BLUR_KERNEL = (5, 5)
+
+ROI_COLOR = (0, 255, 0)
+
+# Region of interest (x, y, width, height) saved in the image folder
+REGION_FILE = "region.json"
+
+# Pixels added around the droplets of the first frame by auto_region (about one droplet radius)
+REGION_MARGIN = 128
+
+# Contours less than EDGE pixels from a window side inside the frame may be cut by the blur border
+EDGE = BLUR_KERNEL[0] // 2 + 1
+
+# Extra pixels around a candidate's upscaled box in which it is contoured at full resolution
+WINDOW_PAD = 8
+
+# Encoded ROI images waiting for the writer thread (bounds the memory they take)
+ROI_QUEUE_SIZE = 16
+
+
+def extract_time_from_filename(filename):
+    """(date, time) strings of a ScanArea file name, or (None, None)."""
+    match = re.search(r"(\d{8})_ScanArea_(\d{6})", filename)
+    if match:
+        date_part, time_part = match.groups()
+        return date_part, time_part
+    return None, None
+
+
+def find_frames(folder_path, extensions=IMAGE_EXTENSIONS):
+    """[(filename, date, time)] of the timestamped images in folder_path, sorted by time."""
+    frames = []
+    for filename in sorted(f for f in os.listdir(folder_path) if f.endswith(extensions)):
+        date_str, time_str = extract_time_from_filename(filename)
+        if date_str and time_str:
+            frames.append((filename, date_str, time_str))
+    frames.sort(key=lambda x: x[2])
+    return frames
+
+
+def detect_large_spots(image, min_area=MIN_AREA, max_area=MAX_AREA, offset=(0, 0), volume_model=None):
+    """Spots of a grayscale image and their contours.
+
+    Spots are a SPOT_DTYPE array (see droplet_metrics) sorted by the whole-pixel centroid
+    (y, x); contours are all contours in the area range, as drawn on the ROI image. offset
+    is added to the coordinates (position of image in the full frame).
+    """
+    contours = _find_contours(image, min_area, max_area, offset)
+    return _measure(contours, volume_model), contours
+
+
+def detect_spots_pyramid(image, levels=2, min_area=MIN_AREA, max_area=MAX_AREA, offset=(0, 0),
+                         volume_model=None):
+    """detect_large_spots through a coarse pass on a downscaled pyramid level.
+
+    Candidates are thresholded on the image reduced levels times by cv2.pyrDown; each is
+    then contoured at full resolution in a window around it, grown until no contour touches
+    a side of the window inside the image. The spots match those of detect_large_spots
+    while only the windows are processed at full size.
+    """
+    small = image
+    for _ in range(levels):
+        small = cv2.pyrDown(small)
+    scale = 2 ** levels
+    _, binary = cv2.threshold(small, THRESHOLD, 255, cv2.THRESH_BINARY_INV)
+    candidates, _ = cv2.findContours(binary, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+
+    pad = WINDOW_PAD + scale
+    # Loose area range: the pyramid blurs droplet edges and may join close neighbours
+    candidate_areas = contour_areas(candidates) * scale ** 2
+    contours, seen = [], set()
+    for i in np.flatnonzero((candidate_areas > min_area / 4) & (candidate_areas < max_area * 4)):
+        x, y, w, h = cv2.boundingRect(candidates[i])
+        window = (x * scale - pad, y * scale - pad, (x + w) * scale + pad, (y + h) * scale + pad)
+        window_contours = _window_contours(image, window, pad)
+        areas = contour_areas(window_contours)
+        for cnt, area in zip(window_contours, areas):
+            if not min_area < area < max_area:
+                continue
+            # Overlapping windows find the same droplet more than once
+            key = (*cv2.boundingRect(cnt), area)
+            if key not in seen:
+                seen.add(key)
+                contours.append(cnt + np.asarray(offset, dtype=cnt.dtype))
+    return _measure(contours, volume_model), contours
+
+
+def load_region(path):
+    """(x, y, width, height) region of interest saved by save_region."""
+    with open(path, "r", encoding="utf-8") as file:
+        region = json.load(file)
+    return tuple(int(region[key]) for key in ("x", "y", "width", "height"))
+
+
+def save_region(path, region):
+    """Write an (x, y, width, height) region as JSON (x, y, width and height keys)."""
+    x, y, width, height = (int(value) for value in region)
+    with open(path, "w", encoding="utf-8") as file:
+        json.dump({"x": x, "y": y, "width": width, "height": height}, file, indent=2)
+    return path
+
+
+def auto_region(image, margin=REGION_MARGIN):
+    """Box around the droplets of a grayscale frame plus margin pixels, or None without droplets."""
+    _, contours = detect_large_spots(image)
+    if not contours:
+        return None
+    x, y, w, h = cv2.boundingRect(np.concatenate(contours))
+    height, width = image.shape[:2]
+    x0, y0 = max(x - margin, 0), max(y - margin, 0)
+    x1, y1 = min(x + w + margin, width), min(y + h + margin, height)
+    return x0, y0, x1 - x0, y1 - y0
+
+
+def series_region(folder_path, first_image_path, filename=REGION_FILE):
+    """Region of interest of a series: REGION_FILE in folder_path, else derived from the first
+    frame and saved there (edit it to adjust). None when the first frame has no droplets."""
+    region_file = os.path.join(folder_path, filename)
+    if os.path.isfile(region_file):
+        return load_region(region_file)
+    region = auto_region(_read_gray(first_image_path))
+    if region is not None:
+        save_region(region_file, region)
+    return region
+
+
+def roi_image(image, contours):
+    """BGR copy of a grayscale image with the contours drawn in ROI_COLOR."""
+    image_with_contours = cv2.cvtColor(image, cv2.COLOR_GRAY2BGR)
+    cv2.drawContours(image_with_contours, contours, -1, ROI_COLOR, 1)
+    return image_with_contours
+
+
+def analyze_frame(image_path, save_roi=True, region=None, pyramid_levels=0, volume_model=None):
+    """(spots, encoded ROI image or None) of one frame; runs in the worker processes.
+
+    With a region (x, y, width, height) only that part of the frame is searched; spot
+    coordinates stay those of the full frame. pyramid_levels > 0 uses detect_spots_pyramid.
+    volume_model gives the spot volumes (default AreaVolume()).
+    The ROI image is the full frame, encoded in the format of image_path as cv2.imwrite
+    would write it.
+    """
+    image = _read_gray(image_path)
+    offset = (0, 0)
+    cropped = image
+    if region is not None:
+        x, y, width, height = region
+        offset = (x, y)
+        cropped = image[y:y + height, x:x + width]
+
+    if pyramid_levels:
+        spot_data, contours = detect_spots_pyramid(cropped, pyramid_levels, offset=offset,
+                                                   volume_model=volume_model)
+    else:
+        spot_data, contours = detect_large_spots(cropped, offset=offset, volume_model=volume_model)
+    if not save_roi:
+        return spot_data, None
+    ok, encoded = cv2.imencode(os.path.splitext(image_path)[1], roi_image(image, contours))
+    if not ok:
+        raise ValueError(f"Cannot encode the ROI image of {image_path}")
+    return spot_data, encoded.tobytes()
+
+
+class RoiWriter:
+    """Background thread writing encoded ROI images to disk.
+
+    write() only queues the bytes (and blocks when ROI_QUEUE_SIZE images are waiting);
+    close() waits for the queue to be written and re-raises the first write error.
+    """
+
+    def __init__(self, maxsize=ROI_QUEUE_SIZE):
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._error = None
+        self._thread = threading.Thread(target=self._run, name="roi-writer", daemon=True)
+        self._thread.start()
+
+    def write(self, path, data):
+        if self._error is not None:
+            raise self._error
+        self._queue.put((path, data))
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join()
+        if self._error is not None:
+            raise self._error
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            if self._error is not None:
+                continue
+            path, data = item
+            try:
+                with open(path, "wb") as file:
+                    file.write(data)
+            except OSError as e:
+                self._error = e
+
+
+def analyze_frames(image_paths, roi_folder=None, max_workers=None, region=None, pyramid_levels=0,
+                   volume_model=None):
+    """Spots of every frame, in the order of image_paths.
+
+    Frames are analysed in a process pool of max_workers (None = all cores, 1 = in this
+    process). With a roi_folder the ROI images are written there under the frame's file
+    name. At most two frames per worker are in flight, so memory does not grow with the
+    length of the series. region, pyramid_levels and volume_model (which must pickle)
+    are passed to analyze_frame.
+    """
+    image_paths = list(image_paths)
+    save_roi = roi_folder is not None
+    max_workers = max_workers or os.cpu_count() or 1
+    detected_spots_data = []
+
+    with RoiWriter() as writer:
+        def collect(image_path, result):
+            spot_data, encoded = result
+            if encoded is not None:
+                writer.write(os.path.join(roi_folder, os.path.basename(image_path)), encoded)
+            detected_spots_data.append(spot_data)
+
+        if max_workers == 1 or len(image_paths) <= 1:
+            for image_path in image_paths:
+                collect(image_path, analyze_frame(image_path, save_roi, region, pyramid_levels, volume_model))
+            return detected_spots_data
+
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker) as executor:
+            pending = deque()
+            for image_path in image_paths:
+                pending.append((image_path, executor.submit(analyze_frame, image_path, save_roi,
+                                                          region, pyramid_levels, volume_model)))
+                # Collected in frame order no matter which worker finishes first
+                if len(pending) >= 2 * max_workers:
+                    image_path, future = pending.popleft()
+                    collect(image_path, future.result())
+            while pending:
+                image_path, future = pending.popleft()
+                collect(image_path, future.result())
+    return detected_spots_data
+
+
+def _init_worker():
+    # One OpenCV thread per worker; the pool already keeps every core busy
+    cv2.setNumThreads(1)
+
+
+def _read_gray(image_path):
+    image = cv2.imread(image_path, cv2.IMREAD_GRAYSCALE)
+    if image is None:
+        raise ValueError(f"Cannot read image {image_path}")
+    return image
+
+
+def _find_contours(image, min_area, max_area, offset):
+    # Outer contours of the dark (thresholded) regions with an area in the range
+    contours = _dark_contours(image, offset)
+    areas = contour_areas(contours)
+    return [contours[i] for i in np.flatnonzero((areas > min_area) & (areas < max_area))]
+
+
+def _dark_contours(image, offset):
+    blurred = cv2.GaussianBlur(image, BLUR_KERNEL, 0)
+    _, binary = cv2.threshold(blurred, THRESHOLD, 255, cv2.THRESH_BINARY_INV)
+
+    contours, _ = cv2.findContours(binary, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE, offset=offset)
+    return contours
+
+
+def _window_contours(image, window, pad):
+    # All contours of a (x0, y0, x1, y1) window of image. Near a side cut through the image the
+    # blur border changes the threshold, so the window grows (by pad) over every contour that
+    # comes within EDGE pixels of such a side, until all contours are whole and exact.
+    height, width = image.shape[:2]
+    x0, y0, x1, y1 = max(window[0], 0), max(window[1], 0), min(window[2], width), min(window[3], height)
+    while True:
+        contours = _dark_contours(image[y0:y1, x0:x1], (x0, y0))
+        grown = [x0, y0, x1, y1]
+        for cnt in contours:
+            bx, by, bw, bh = cv2.boundingRect(cnt)
+            if x0 > 0 and bx < x0 + EDGE:
+                grown[0] = min(grown[0], max(bx - pad, 0))
+            if y0 > 0 and by < y0 + EDGE:
+                grown[1] = min(grown[1], max(by - pad, 0))
+            if x1 < width and bx + bw > x1 - EDGE:
+                grown[2] = max(grown[2], min(bx + bw + pad, width))
+            if y1 < height and by + bh > y1 - EDGE:
+                grown[3] = max(grown[3], min(by + bh + pad, height))
+        if grown == [x0, y0, x1, y1]:
+            return contours
+        x0, y0, x1, y1 = grown
+
+
+def _measure(contours, volume_model):
+    # Metrics of all contours at once, sorted by whole-pixel centroid (y, x); contours without
+    # area have no centroid and are drawn but not measured
+    spot_data = contour_metrics(contours, volume_model)
+    spot_data = spot_data[np.isfinite(spot_data["x"])]
+    return spot_data[np.lexsort((np.trunc(spot_data["x"]), np.trunc(spot_data["y"])))]
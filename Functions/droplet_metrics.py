@@ -0,0 +1,115 @@
+#Measurements of droplet contours, for all contours of a frame at once.
+#The contour points are concatenated into one array and area (shoelace), perimeter, centroid
+#(polygon moments, as cv2.moments), circularity, equivalent diameter and volume are reduced
+#per contour with np.add.reduceat into a preallocated structured array (SPOT_DTYPE). The
+#volume comes from a volume model: AreaVolume (V = V0 * (A / A0)^(3/2)) or SphericalCapVolume.
+
+import numpy as np
+
+# One droplet: centroid (pixels), area (pixels²), perimeter and equivalent diameter (pixels),
+# circularity 4πA/P² and volume (nL)
+SPOT_DTYPE = np.dtype([("x", np.float64), ("y", np.float64), ("area", np.float64), ("perimeter", np.float64),
+                       ("circularity", np.float64), ("diameter", np.float64), ("volume", np.float64)])
+
+A0 = 5600.0  # Reference area in pixels² for 50 nL droplet
+V0 = 50.0    # Reference volume in nanoliters
+
+UM3_PER_NL = 1e6
+
+
+class AreaVolume:
+    """Area-only volume model V = v0 * (area / a0)^(3/2) (nL), calibrated on one droplet."""
+
+    def __init__(self, a0=A0, v0=V0):
+        self.a0 = a0
+        self.v0 = v0
+
+    def __call__(self, area):
+        return ((area / self.a0) ** 1.5) * self.v0
+
+    def __repr__(self):
+        return f"AreaVolume(a0={self.a0!r}, v0={self.v0!r})"
+
+
+class SphericalCapVolume:
+    """Volume (nL) of a spherical cap on the droplet's footprint.
+
+    The footprint is the circle of the droplet's area (pixel_size µm per pixel) and
+    contact_angle (degrees, 0-180) the angle between the droplet surface and the plate.
+    """
+
+    def __init__(self, contact_angle, pixel_size):
+        if not 0 < contact_angle < 180:
+            raise ValueError(f"Contact angle must be between 0 and 180 degrees, not {contact_angle}")
+        self.contact_angle = contact_angle
+        self.pixel_size = pixel_size
+        theta = np.radians(contact_angle)
+        # V = π r³ (2 - 3cosθ + cos³θ) / (3 sin³θ) for base radius r
+        self._factor = np.pi * (2 - 3 * np.cos(theta) + np.cos(theta) ** 3) / (3 * np.sin(theta) ** 3)
+
+    def __call__(self, area):
+        radius = np.sqrt(area / np.pi) * self.pixel_size
+        return self._factor * radius ** 3 / UM3_PER_NL
+
+    def __repr__(self):
+        return f"SphericalCapVolume(contact_angle={self.contact_angle!r}, pixel_size={self.pixel_size!r})"
+
+
+def contour_areas(contours):
+    """Area of every contour (as cv2.contourArea), in one pass over all points."""
+    _, cross, starts = _contour_terms(contours)
+    return np.abs(np.add.reduceat(cross, starts)) / 2 if len(starts) else np.empty(0)
+
+
+def contour_metrics(contours, volume_model=None):
+    """SPOT_DTYPE array with one row per contour (volume_model default AreaVolume()).
+
+    Contours without area get NaN centroids; circularity is 0 without perimeter.
+    """
+    volume_model = AreaVolume() if volume_model is None else volume_model
+    metrics = np.empty(len(contours), dtype=SPOT_DTYPE)
+    if not len(contours):
+        return metrics
+
+    (x, y, dx, dy), cross, starts = _contour_terms(contours)
+    signed_area = np.add.reduceat(cross, starts) / 2
+    area = np.abs(signed_area)
+    perimeter = np.add.reduceat(np.hypot(dx, dy), starts)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        metrics["x"] = np.add.reduceat((2 * x + dx) * cross, starts) / (6 * signed_area)
+        metrics["y"] = np.add.reduceat((2 * y + dy) * cross, starts) / (6 * signed_area)
+        metrics["circularity"] = np.where(perimeter > 0, 4 * np.pi * area / perimeter ** 2, 0)
+    metrics["area"] = area
+    metrics["perimeter"] = perimeter
+    metrics["diameter"] = np.sqrt(4 * area / np.pi)
+    metrics["volume"] = volume_model(area)
+    return metrics
+
+
+def empty_metrics(shape):
+    """SPOT_DTYPE array of the given shape filled with NaN (no droplet)."""
+    metrics = np.empty(shape, dtype=SPOT_DTYPE)
+    for name in SPOT_DTYPE.names:
+        metrics[name] = np.nan
+    return metrics
+
+
+def _contour_terms(contours):
+    # ((x, y, dx, dy) of every point to the next one of its closed contour, shoelace cross
+    # terms, index of the first point of every contour)
+    lengths = np.fromiter((len(cnt) for cnt in contours), dtype=np.intp, count=len(contours))
+    if not len(lengths):
+        empty = np.empty(0)
+        return (empty, empty, empty, empty), empty, np.empty(0, dtype=np.intp)
+    points = np.concatenate(contours).reshape(-1, 2).astype(np.float64)
+    ends = np.cumsum(lengths)
+    starts = ends - lengths
+
+    # Next point: the following row, except for the last point of a contour (its first point)
+    x, y = points[:, 0], points[:, 1]
+    x_next, y_next = np.empty_like(x), np.empty_like(y)
+    x_next[:-1], y_next[:-1] = x[1:], y[1:]
+    x_next[ends - 1], y_next[ends - 1] = x[starts], y[starts]
+    cross = x * y_next - x_next * y
+    return (x, y, x_next - x, y_next - y), cross, starts
@@ -0,0 +1,87 @@
+#Tracking of droplets across timelapse frames by their centroids.
+#Each frame's centroids are matched to those of the previous frame through a KD-tree
+#(nearest candidates within a maximum displacement, closest pairs first), so a droplet keeps
+#its ID when another one evaporates or appears. Unmatched centroids start new tracks.
+#A track that finds no droplet keeps its last position for up to MAX_GAP frames, so a
+#droplet missed by the detection in a frame or two comes back under its old ID.
+#Matching is O(n log n) per frame, for arrays of thousands of droplets.
+
+import numpy as np
+from scipy.spatial import cKDTree
+
+from Functions.droplet_metrics import empty_metrics
+
+# Largest centroid shift (pixels) between consecutive frames that is still the same droplet;
+# below the radius of the smallest droplet (MIN_AREA 2000 px² ~ 25 px), so neighbours never swap
+MAX_DISPLACEMENT = 20.0
+
+# Nearest previous centroids considered per droplet when resolving conflicts
+MATCH_CANDIDATES = 4
+
+# Consecutive frames a droplet may be missing before its track is retired (0 = retire at once);
+# a new droplet appearing near a waiting track's last position in that time takes over its ID
+MAX_GAP = 3
+
+
+class DropletTracker:
+    """Persistent droplet IDs (0, 1, ...) for a sequence of frames.
+
+    update(centroids) takes the (x, y) centroids of the next frame and returns their IDs.
+    IDs are given in order of first appearance, so the droplets of the first frame get
+    0..n-1 in the order they are passed. Tracks unmatched for more than max_gap frames in a
+    row are retired; until then they are matched at their last position.
+    """
+
+    def __init__(self, max_displacement=MAX_DISPLACEMENT, max_gap=MAX_GAP):
+        self.max_displacement = max_displacement
+        self.max_gap = max_gap
+        self.n_tracks = 0
+        self._ids = np.empty(0, dtype=np.intp)
+        self._positions = np.empty((0, 2))
+        self._missed = np.empty(0, dtype=np.intp)
+
+    def update(self, centroids):
+        centroids = np.asarray(centroids, dtype=float).reshape(-1, 2)
+        ids = np.full(len(centroids), -1, dtype=np.intp)
+
+        if len(centroids) and len(self._positions):
+            k = min(MATCH_CANDIDATES, len(self._positions))
+            distances, neighbours = cKDTree(self._positions).query(
+                centroids, k=k, distance_upper_bound=self.max_displacement)
+            distances = distances.reshape(len(centroids), k)
+            neighbours = neighbours.reshape(len(centroids), k)
+
+            # Candidate pairs within the gate, closest first; each droplet and track used once
+            rows, cols = np.nonzero(np.isfinite(distances))
+            order = np.argsort(distances[rows, cols], kind="stable")
+            taken = np.zeros(len(self._positions), dtype=bool)
+            for row, previous in zip(rows[order], neighbours[rows, cols][order]):
+                if ids[row] < 0 and not taken[previous]:
+                    ids[row] = self._ids[previous]
+                    taken[previous] = True
+
+        new = ids < 0
+        ids[new] = np.arange(self.n_tracks, self.n_tracks + np.count_nonzero(new))
+        self.n_tracks += int(np.count_nonzero(new))
+
+        # Unmatched tracks stay at their last position until they have missed max_gap frames
+        waiting = ~np.isin(self._ids, ids) & (self._missed < self.max_gap)
+        self._ids = np.concatenate((ids, self._ids[waiting]))
+        self._positions = np.concatenate((centroids, self._positions[waiting]))
+        self._missed = np.concatenate((np.zeros(len(ids), dtype=np.intp), self._missed[waiting] + 1))
+        return ids
+
+
+def track_spots(detected_spots_data, max_displacement=MAX_DISPLACEMENT, max_gap=MAX_GAP):
+    """(droplet IDs per frame, number of tracks) of the spot arrays (SPOT_DTYPE) of consecutive frames."""
+    tracker = DropletTracker(max_displacement, max_gap)
+    track_ids = [tracker.update(np.column_stack((spots["x"], spots["y"]))) for spots in detected_spots_data]
+    return track_ids, tracker.n_tracks
+
+
+def track_table(detected_spots_data, track_ids, n_tracks):
+    """frames x droplets SPOT_DTYPE array of the tracked spots, NaN where a droplet is absent."""
+    table = empty_metrics((len(detected_spots_data), n_tracks))
+    for frame, (spots, ids) in enumerate(zip(detected_spots_data, track_ids)):
+        table[frame, ids] = spots
+    return table
@@ -0,0 +1,135 @@
+#Incremental analysis of a droplet timelapse folder that is still receiving frames.
+#The folder is polled for new ScanArea frames; each new frame is analysed once (results are
+#cached per frame under its file name and content hash, so a restart only re-reads the
+#cache), its droplets are matched to the previous frame by the tracker and one row per
+#droplet is appended to a live CSV table. The work per update does not grow with the series.
+
+import csv
+import hashlib
+import os
+import pickle
+import time
+from datetime import datetime
+
+import numpy as np
+
+from Functions.droplet_frames import BLUR_KERNEL, MAX_AREA, MIN_AREA, THRESHOLD, analyze_frames, find_frames
+from Functions.droplet_tracking import MAX_DISPLACEMENT, MAX_GAP, DropletTracker
+from Functions.task_graph import file_hash
+
+CACHE_FOLDER = ".droplet_cache"
+
+LIVE_FILENAME = "spot_analysis_live.csv"
+
+POLL_SECONDS = 10.0
+
+# Frames changed less than SETTLE_SECONDS ago may still be being written
+SETTLE_SECONDS = 2.0
+
+LIVE_COLUMNS = ("Time", "Elapsed Time (minutes)", "Spot", "Area", "Perimeter", "Circularity",
+                "Equivalent Diameter", "Estimated Volume (nL)")
+
+
+class FrameCache:
+    """Spots of single frames, pickled under a key of file name, content hash and settings."""
+
+    def __init__(self, cache_dir, settings=""):
+        self.cache_dir = cache_dir
+        self.settings = settings
+
+    def get(self, filename, digest):
+        try:
+            with open(self._cache_file(filename, digest), "rb") as file:
+                return pickle.load(file)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            return None
+
+    def put(self, filename, digest, spots):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self._cache_file(filename, digest)
+        with open(path + ".tmp", "wb") as file:
+            pickle.dump(spots, file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(path + ".tmp", path)
+
+    def _cache_file(self, filename, digest):
+        key = hashlib.sha256(f"{digest}\0{self.settings}".encode()).hexdigest()[:16]
+        return os.path.join(self.cache_dir, f"{filename}-{key}.pkl")
+
+
+def watch_frames(folder_path, cache_dir=None, poll_seconds=POLL_SECONDS, roi_folder=None, max_workers=None,
+                 region=None, pyramid_levels=0, volume_model=None, sleep=time.sleep):
+    """Yield (filename, date, time, spots) of the frames in folder_path, then of new ones as they land.
+
+    Every poll the frames not seen yet (and unchanged for SETTLE_SECONDS) are taken in time
+    order; those not in the cache are analysed together with analyze_frames (region,
+    pyramid_levels and volume_model are passed on). Frames are
+    expected to land in time order. poll_seconds=None stops after the frames already there;
+    sleep is called between polls (e.g. plt.pause to keep a live plot responsive).
+    """
+    cache = None
+    if cache_dir is not None:
+        # repr of the volume model holds its parameters (AreaVolume, SphericalCapVolume)
+        cache = FrameCache(cache_dir, repr((MIN_AREA, MAX_AREA, THRESHOLD, BLUR_KERNEL, region, volume_model)))
+    done = set()
+
+    while True:
+        now = time.time()
+        new_frames = []
+        for frame in find_frames(folder_path):
+            if frame[0] in done:
+                continue
+            path = os.path.join(folder_path, frame[0])
+            if poll_seconds is not None and now - os.path.getmtime(path) < SETTLE_SECONDS:
+                continue
+            new_frames.append(frame)
+
+        if new_frames:
+            paths = [os.path.join(folder_path, filename) for filename, _, _ in new_frames]
+            digests = [file_hash(path) if cache is not None else None for path in paths]
+            spots = [cache.get(frame[0], digest) if cache is not None else None
+                     for frame, digest in zip(new_frames, digests)]
+
+            missing = [i for i, frame_spots in enumerate(spots) if frame_spots is None]
+            analysed = analyze_frames([paths[i] for i in missing], roi_folder=roi_folder, max_workers=max_workers,
+                                      region=region, pyramid_levels=pyramid_levels, volume_model=volume_model)
+            for i, frame_spots in zip(missing, analysed):
+                spots[i] = frame_spots
+                if cache is not None:
+                    cache.put(new_frames[i][0], digests[i], frame_spots)
+
+            for frame, frame_spots in zip(new_frames, spots):
+                done.add(frame[0])
+                yield (*frame, frame_spots)
+
+        if poll_seconds is None:
+            return
+        sleep(poll_seconds)
+
+
+class LiveResults:
+    """Tracked droplets of the frames added so far, appended to a long CSV table (LIVE_COLUMNS).
+
+    The table is started anew; add(time, spots) appends one row per droplet of the frame and
+    returns those rows. Spot labels (Spot1, Spot2, ...) are the persistent tracker IDs and
+    elapsed minutes count from the first frame, as in DropAreaExtraction.py.
+    """
+
+    def __init__(self, output_file, max_displacement=MAX_DISPLACEMENT, max_gap=MAX_GAP):
+        self.output_file = output_file
+        self.tracker = DropletTracker(max_displacement, max_gap)
+        self.first_timestamp = None
+        with open(output_file, "w", newline="") as file:
+            csv.writer(file).writerow(LIVE_COLUMNS)
+
+    def add(self, time_str, spots):
+        current_time = datetime.strptime(time_str, "%H%M%S")
+        self.first_timestamp = self.first_timestamp or current_time
+        elapsed_time = round((current_time - self.first_timestamp).total_seconds() / 60, 0)
+
+        track_ids = self.tracker.update(np.column_stack((spots["x"], spots["y"])))
+        rows = [(time_str, elapsed_time, f"Spot{track_id + 1}", *spot[["area", "perimeter", "circularity", "diameter",
+                                                                        "volume"]].tolist())
+                for track_id, spot in zip(track_ids, spots)]
+        with open(self.output_file, "a", newline="") as file:
+            csv.writer(file).writerows(rows)
+        return rows
@@ -0,0 +1,180 @@
+#Factorial ANOVA (type II sums of squares) and Tukey HSD without formula models.
+#Factors are turned into integer codes once. Balanced complete designs get their sums of
+#squares straight from cell and marginal means (bincount reductions); unbalanced designs
+#project onto the indicator columns of each term with one small least-squares solve per
+#model. by= runs one fit per group (GRAVY bin, position, ...) and returns one tidy table,
+#so hundreds of fits are a loop over integer codes instead of hundreds of ols() calls.
+
+import itertools
+
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+ALPHA = 0.05
+
+RESIDUAL = "Residual"
+
+
+def factorial_terms(factors, max_order=None):
+    """All main effects and interactions of factors, in formula order (A, B, A:B, ...)."""
+    max_order = len(factors) if max_order is None else max_order
+    return [term for order in range(1, max_order + 1) for term in itertools.combinations(factors, order)]
+
+
+def term_label(term):
+    # ("Load", "Position") -> "C(Load):C(Position)", like statsmodels
+    return ":".join(f"C({factor})" for factor in term)
+
+
+def anova_table(data, response, factors, terms=None):
+    """Type II ANOVA table of one fit, indexed like statsmodels anova_lm (sum_sq, df, F, PR(>F))."""
+    table = factorial_anova(data, response, factors, terms=terms)
+    table = table.set_index("term")[["sum_sq", "df", "F", "p_value"]]
+    table.index.name = None
+    return table.rename(columns={"p_value": "PR(>F)"})
+
+
+def factorial_anova(data, response, factors, by=None, terms=None):
+    """Type II factorial ANOVA of response, one fit per by-group.
+
+    terms defaults to the full factorial of factors. Rows with a missing response or factor
+    are left out. Returns a tidy table: the by columns, term (statsmodels label, plus
+    "Residual"), sum_sq, df, F and p_value.
+    """
+    factors = list(factors)
+    terms = factorial_terms(factors) if terms is None else [tuple(term) for term in terms]
+    rows = []
+    for key, group in _by_groups(data, by):
+        group = group.dropna(subset=[response] + factors)
+        y = group[response].to_numpy(dtype=float)
+        codes = {factor: pd.factorize(group[factor], sort=True)[0] for factor in factors}
+        for label, sum_sq, df, f_value, p_value in _anova_rows(y, codes, terms):
+            rows.append(key + (label, sum_sq, df, f_value, p_value))
+    return pd.DataFrame(rows, columns=_by_columns(by) + ["term", "sum_sq", "df", "F", "p_value"])
+
+
+def tukey_hsd(data, response, group, by=None, alpha=ALPHA):
+    """Tukey HSD of all pairs of levels of group, one family per by-group.
+
+    Returns a tidy table like pairwise_tukeyhsd's summary: the by columns, group1, group2,
+    meandiff (group2 - group1), p-adj, lower, upper and reject.
+    """
+    rows = []
+    for key, part in _by_groups(data, by):
+        part = part.dropna(subset=[response, group])
+        codes, levels = pd.factorize(part[group], sort=True)
+        if len(levels) < 2:
+            continue
+        y = part[response].to_numpy(dtype=float)
+        counts = np.bincount(codes, minlength=len(levels))
+        means = np.bincount(codes, weights=y, minlength=len(levels)) / counts
+        df_resid = len(y) - len(levels)
+        mse = np.sum((y - means[codes]) ** 2) / df_resid
+
+        first, second = np.triu_indices(len(levels), k=1)
+        meandiff = means[second] - means[first]
+        std_err = np.sqrt(mse / 2 * (1 / counts[first] + 1 / counts[second]))
+        p_adj = stats.studentized_range.sf(np.abs(meandiff) / std_err, len(levels), df_resid)
+        margin = stats.studentized_range.ppf(1 - alpha, len(levels), df_resid) * std_err
+        for i, j, diff, p, half in zip(first, second, meandiff, p_adj, margin):
+            rows.append(key + (levels[i], levels[j], diff, p, diff - half, diff + half, p < alpha))
+    columns = _by_columns(by) + ["group1", "group2", "meandiff", "p-adj", "lower", "upper", "reject"]
+    return pd.DataFrame(rows, columns=columns)
+
+
+def _by_columns(by):
+    if by is None:
+        return []
+    return [by] if isinstance(by, str) else list(by)
+
+
+def _by_groups(data, by):
+    # (key tuple, rows) per by-group; one group with an empty key without by
+    if by is None:
+        yield (), data
+        return
+    for key, group in data.groupby(_by_columns(by), sort=False, observed=True):
+        yield key, group
+
+
+def _anova_rows(y, codes, terms):
+    n = len(y)
+    levels = {factor: int(code.max()) + 1 if len(code) else 0 for factor, code in codes.items()}
+    cells = _term_codes(codes, tuple(codes), levels)
+    n_cells = len(np.unique(cells))
+    full_factorial = set(terms) == set(factorial_terms(list(codes)))
+
+    if full_factorial and _is_balanced(cells, levels):
+        sums_of_squares, dfs, rss = _balanced_sums_of_squares(y, codes, terms, levels)
+        df_resid = n - n_cells
+    else:
+        sums_of_squares, dfs = [], []
+        rss, rank = _projection(y, codes, terms, levels)
+        for term in terms:
+            others = [other for other in terms if other != term and not set(term) <= set(other)]
+            reduced_rss, reduced_rank = _projection(y, codes, others, levels)
+            with_rss, with_rank = _projection(y, codes, others + [term], levels)
+            sums_of_squares.append(reduced_rss - with_rss)
+            dfs.append(with_rank - reduced_rank)
+        df_resid = n - rank
+
+    rows = []
+    mse = rss / df_resid if df_resid > 0 else np.nan
+    for term, sum_sq, df in zip(terms, sums_of_squares, dfs):
+        with np.errstate(invalid="ignore", divide="ignore"):
+            f_value = (sum_sq / df) / mse if df > 0 else np.nan
+        p_value = stats.f.sf(f_value, df, df_resid) if df > 0 and df_resid > 0 else np.nan
+        rows.append((term_label(term), sum_sq, float(df), f_value, p_value))
+    rows.append((RESIDUAL, rss, float(df_resid), np.nan, np.nan))
+    return rows
+
+
+def _term_codes(codes, term, levels):
+    # One integer code per combination of the term's factor levels
+    if not term:
+        return np.zeros(len(next(iter(codes.values()))), dtype=np.int64)
+    return np.ravel_multi_index([codes[factor] for factor in term], [levels[factor] for factor in term])
+
+
+def _is_balanced(cells, levels):
+    counts = np.bincount(cells, minlength=int(np.prod(list(levels.values()))))
+    return len(counts) > 0 and counts.min() > 0 and (counts == counts[0]).all()
+
+
+def _balanced_sums_of_squares(y, codes, terms, levels):
+    # Orthogonal decomposition: the effect of a term is the inclusion-exclusion sum of the
+    # marginal means of all its sub-terms, evaluated at every observation
+    marginal = {}
+    for order in range(len(codes) + 1):
+        for term in itertools.combinations(tuple(codes), order):
+            term_codes = _term_codes(codes, term, levels)
+            size = int(np.prod([levels[factor] for factor in term])) if term else 1
+            means = np.bincount(term_codes, weights=y, minlength=size) / np.bincount(term_codes, minlength=size)
+            marginal[term] = means[term_codes]
+
+    sums_of_squares, dfs = [], []
+    for term in terms:
+        effect = np.zeros(len(y))
+        for order in range(len(term) + 1):
+            for sub_term in itertools.combinations(term, order):
+                effect += (-1) ** (len(term) - order) * marginal[sub_term]
+        sums_of_squares.append(np.sum(effect ** 2))
+        dfs.append(int(np.prod([levels[factor] - 1 for factor in term])))
+    rss = np.sum((y - marginal[tuple(codes)]) ** 2)
+    return sums_of_squares, dfs, rss
+
+
+def _projection(y, codes, terms, levels):
+    # (residual sum of squares, rank) of y on the intercept and the indicators of the terms
+    columns = [np.ones((len(y), 1))]
+    for term in terms:
+        term_codes = _term_codes(codes, term, levels)
+        present, term_codes = np.unique(term_codes, return_inverse=True)
+        indicators = np.zeros((len(y), len(present)))
+        indicators[np.arange(len(y)), term_codes] = 1.0
+        columns.append(indicators)
+    design = np.hstack(columns)
+    coefficients, _, rank, _ = np.linalg.lstsq(design, y, rcond=None)
+    residuals = y - design @ coefficients
+    return float(residuals @ residuals), int(rank)
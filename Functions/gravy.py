@@ -0,0 +1,133 @@
+#Vectorized GRAVY (grand average of hydropathy) for whole columns of peptide sequences.
+#Sequences are encoded as one uint8 byte array, each byte is looked up in a 256-entry
+#Kyte & Doolittle table and the values are summed position by position over all sequences
+#at once, in the order (and with the compensation) of Python's sum() in calculate_gravy.
+
+import sys
+
+import numpy as np
+
+# Kyte & Doolittle hydropathy index (U = carbamidomethylated C, see replace_modification)
+HYDROPATHY_INDEX = {
+    'A': 1.8, 'R': -4.5, 'N': -3.5, 'D': -3.5, 'C': 2.5,
+    'Q': -3.5, 'E': -3.5, 'G': -0.4, 'H': -3.2, 'I': 4.5,
+    'L': 3.8, 'K': -3.9, 'M': 1.9, 'F': 2.8, 'P': -1.6,
+    'S': -0.8, 'T': -0.7, 'W': -0.9, 'Y': -1.3, 'V': 4.2,
+    'U': 0.0
+}
+
+# Any other character (modification brackets, digits, ...) counts as 0, like dict.get(aa, 0)
+_HYDROPATHY_TABLE = np.zeros(256)
+for _aa, _value in HYDROPATHY_INDEX.items():
+    _HYDROPATHY_TABLE[ord(_aa)] = _value
+
+# sum() of floats is compensated (Neumaier) since Python 3.12
+COMPENSATED_SUM = sys.version_info >= (3, 12)
+
+_MODIFICATION = np.frombuffer(b"C(UniMod:4)", dtype=np.uint8)
+
+
+def replace_modification(sequence):
+    # Convert C(UniMod:4) to U
+    return sequence.replace("C(UniMod:4)", "U")
+
+
+def calculate_gravy(sequence, decimals=2):
+    """Scalar reference implementation (one sequence, Python loop)."""
+    sequence = replace_modification(sequence)
+    values = [HYDROPATHY_INDEX.get(aa, 0) for aa in sequence]
+    mean = sum(values) / len(values)
+    return round(mean, decimals) if decimals is not None else mean
+
+
+def hydropathy_means(sequences):
+    """Mean hydropathy of every sequence; NaN for missing or empty sequences.
+
+    Bit for bit sum(values) / len(values) of calculate_gravy: np.add.reduceat would sum
+    pairwise, so the values are added one position at a time, left to right like sum().
+    """
+    encoded, starts, lengths = _encode(sequences)
+    values = _HYDROPATHY_TABLE[encoded]
+
+    # Every C(UniMod:4) is a single U (0.0); its other characters add 0.0 and no length
+    matches = _find_bytes(encoded, _MODIFICATION)
+    residues = lengths
+    if len(matches):
+        values[matches[:, None] + np.arange(len(_MODIFICATION))] = 0.0
+        owner = np.searchsorted(starts, matches, side="right") - 1
+        residues = lengths - np.bincount(owner, minlength=len(lengths)) * (len(_MODIFICATION) - 1)
+
+    # Longest sequences first, so the ones still being summed at a position are a prefix
+    order = np.argsort(-lengths, kind="stable")
+    sorted_starts = starts[order]
+    descending = -lengths[order]
+    sums = np.zeros(len(lengths))
+    compensation = np.zeros(len(lengths))
+    for position in range(lengths.max() if len(lengths) else 0):
+        n = np.searchsorted(descending, -position, side="left")
+        total = sums[:n]
+        x = values[sorted_starts[:n] + position]
+        t = total + x
+        if COMPENSATED_SUM:
+            compensation[:n] += np.where(np.abs(total) >= np.abs(x), (total - t) + x, (x - t) + total)
+        sums[:n] = t
+    if COMPENSATED_SUM:
+        sums += compensation
+
+    means = np.full(len(lengths), np.nan)
+    non_empty = residues[order] > 0
+    means[order[non_empty]] = sums[non_empty] / residues[order][non_empty]
+    return means
+
+
+def _encode(sequences):
+    # (one byte per character of all sequences joined by a newline, so a modification can
+    # never match across two sequences, start and length of every sequence). Missing
+    # sequences get length 0; non-ASCII becomes '?' (value 0).
+    if hasattr(sequences, "tolist"):
+        # Iterating a pandas/NumPy column element by element is much slower than a list
+        sequences = sequences.tolist()
+    sequences = [seq if isinstance(seq, str) else "" for seq in sequences]
+    lengths = np.fromiter(map(len, sequences), dtype=np.int64, count=len(sequences))
+    encoded = np.frombuffer("\n".join(sequences).encode("ascii", errors="replace"), dtype=np.uint8)
+    starts = np.concatenate(([0], np.cumsum(lengths + 1)[:-1])).astype(np.int64)
+    return encoded, starts, lengths
+
+
+def _find_bytes(encoded, pattern):
+    # Start positions of every occurrence of pattern (uint8 array) in encoded
+    candidates = np.flatnonzero(encoded[:len(encoded) - len(pattern) + 1] == pattern[0])
+    for i in range(1, len(pattern)):
+        candidates = candidates[encoded[candidates + i] == pattern[i]]
+    return candidates
+
+
+def gravy_scores(sequences, decimals=2):
+    """GRAVY for a whole column of sequences; NaN for missing or empty sequences.
+
+    With decimals set, the result is identical to calculate_gravy(seq, decimals) for every
+    sequence; with decimals=None to calculate_gravy(seq, None), the unrounded mean.
+    """
+    scores = hydropathy_means(sequences)
+    if decimals is None:
+        return scores
+    return round_gravy(scores, decimals)
+
+
+def round_gravy(scores, decimals=2):
+    """Round GRAVY scores (from hydropathy_means) exactly like Python's round().
+
+    A mean of n tenths is a fraction with a small denominator, so it is either an exact
+    rounding tie or far (>= 1/(20n)) away from one. Non-ties are rounded in NumPy; the few
+    exact ties depend on the float error of the sum and are rounded with round() itself.
+    """
+    scores = np.asarray(scores, dtype=np.float64)
+    scale = 10.0 ** decimals
+    scaled = scores * scale
+    # round() keeps the sign of a negative mean that rounds to zero (-0.0)
+    rounded = np.copysign(np.floor(scaled + 0.5) / scale, scores)
+
+    ties = np.flatnonzero(np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6)
+    for i in ties:
+        rounded[i] = round(float(scores[i]), decimals)
+    return rounded
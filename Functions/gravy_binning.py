@@ -0,0 +1,260 @@
+#GRAVY binning shared by all scripts, and per-bin statistics of the sample columns.
+#GravyBinIndex holds one set of equal-width bin edges (fixed range, global range of several
+#files or a fixed step) and turns scores into compact int16 bin codes with an O(1) lookup,
+#so every script bins with the same edge rules instead of running its own pd.cut.
+#GravyBinIndex.shared keeps the edges of a data folder in a JSON file there, so scripts
+#binning the same files reuse one set of bins and their bins line up.
+#bin_statistics orders the rows once by bin code; sums, counts and variances are segment
+#reductions over that order and medians/quantiles are read from each segment after sorting
+#the values inside it, so all statistics come from one binning and one sort.
+
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+NUM_BINS = 50
+
+# Bin index file kept in a data folder by GravyBinIndex.shared, one per grid (bins or step)
+BIN_INDEX_FILE = "gravy_bins_{grid}.json"
+
+# count = non-missing values; q25/q75 = quantiles (any qNN works)
+BIN_STATISTICS = ("count", "sum", "mean", "median", "std", "sem", "q25", "q75")
+
+
+class GravyBinIndex:
+    """Equal-width GRAVY bins, built once per analysis and shared by all of its files.
+
+    Bins are closed on the right like pd.cut (the lowest edge belongs to the first bin);
+    with right=False they are closed on the left like np.digitize and the highest edge is
+    outside. Bin codes run from 0 to num_bins - 1, -1 marks missing or out-of-range scores.
+    """
+
+    def __init__(self, edges, right=True):
+        self.edges = np.asarray(edges, dtype=float)
+        self.right = right
+        self.num_bins = len(self.edges) - 1
+        self.width = (self.edges[-1] - self.edges[0]) / self.num_bins
+
+    @classmethod
+    def from_range(cls, low, high, num_bins=NUM_BINS, right=True):
+        return cls(np.linspace(low, high, num_bins + 1), right=right)
+
+    @classmethod
+    def from_scores(cls, *score_columns, num_bins=NUM_BINS, right=True):
+        """num_bins bins over the global range of one or more score columns."""
+        low = min(np.nanmin(np.asarray(scores, dtype=float)) for scores in score_columns)
+        high = max(np.nanmax(np.asarray(scores, dtype=float)) for scores in score_columns)
+        return cls.from_range(low, high, num_bins, right=right)
+
+    @classmethod
+    def from_step(cls, *score_columns, step=0.05, right=True):
+        """Bins of a fixed width on multiples of step, covering the scores."""
+        per_unit = 1 / step
+        low = min(np.nanmin(np.asarray(scores, dtype=float)) for scores in score_columns)
+        high = max(np.nanmax(np.asarray(scores, dtype=float)) for scores in score_columns)
+        low = np.floor(low * per_unit) / per_unit
+        high = np.ceil(high * per_unit) / per_unit
+        return cls(np.arange(low, high + step, step), right=right)
+
+    @classmethod
+    def shared(cls, folder, *score_columns, num_bins=NUM_BINS, step=None, right=True):
+        """The bin index of a data folder: BIN_INDEX_FILE in folder when it covers the scores,
+        else from_scores (from_step when step is given) widened to the saved range and saved
+        there, so every script binning the folder's files gets the same edges."""
+        grid = str(num_bins) if step is None else f"step{step:g}"
+        path = os.path.join(folder, BIN_INDEX_FILE.format(grid=grid if right else grid + "_left"))
+        if os.path.isfile(path):
+            saved = cls.load(path)
+            low = min(np.nanmin(np.asarray(scores, dtype=float)) for scores in score_columns)
+            high = max(np.nanmax(np.asarray(scores, dtype=float)) for scores in score_columns)
+            if saved.edges[0] <= low and (high <= saved.edges[-1] if right else high < saved.edges[-1]):
+                return saved
+            score_columns += ([saved.edges[0], saved.edges[-1]],)
+
+        if step is None:
+            bin_index = cls.from_scores(*score_columns, num_bins=num_bins, right=right)
+        else:
+            bin_index = cls.from_step(*score_columns, step=step, right=right)
+        bin_index.save(path)
+        return bin_index
+
+    @classmethod
+    def load(cls, path):
+        """Bin index saved by save."""
+        with open(path, "r", encoding="utf-8") as file:
+            saved = json.load(file)
+        return cls(saved["edges"], right=saved["right"])
+
+    def save(self, path):
+        """Write the edges and side of the bins as JSON (edges and right keys)."""
+        with open(path, "w", encoding="utf-8") as file:
+            json.dump({"edges": self.edges.tolist(), "right": self.right}, file, indent=2)
+        return path
+
+    @property
+    def starts(self):
+        return self.edges[:-1]
+
+    def codes(self, scores):
+        """int16 bin code of every score (-1 for missing or out of range)."""
+        scores = np.asarray(scores, dtype=float)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            guess = np.floor((scores - self.edges[0]) / self.width)
+        codes = np.clip(np.nan_to_num(guess, nan=0), 0, self.num_bins - 1).astype(np.int64)
+
+        # The arithmetic guess can be one bin off at an edge; settle it against the edges
+        if self.right:
+            codes -= (codes > 0) & (scores <= self.edges[codes])
+            codes += (codes < self.num_bins - 1) & (scores > self.edges[codes + 1])
+            outside = ~((scores >= self.edges[0]) & (scores <= self.edges[-1]))
+        else:
+            codes -= (codes > 0) & (scores < self.edges[codes])
+            codes += (codes < self.num_bins - 1) & (scores >= self.edges[codes + 1])
+            outside = ~((scores >= self.edges[0]) & (scores < self.edges[-1]))
+        codes[outside] = -1
+        return codes.astype(np.int16)
+
+    def start_labels(self, decimals=1):
+        return [f"{round(edge, decimals)}" for edge in self.starts]
+
+    def range_labels(self, decimals=3):
+        return [f"{round(self.edges[i], decimals)} to {round(self.edges[i + 1], decimals)}"
+                for i in range(self.num_bins)]
+
+    def cut_labels(self, precision=3):
+        """Interval labels as pd.cut(scores, num_bins, precision=precision) prints them.
+
+        pd.cut moves the outer edge by 0.1 % of the range so the extreme score falls inside a
+        bin, and rounds the edges to precision significant digits.
+        """
+        edges = self.edges.copy()
+        adjustment = (edges[-1] - edges[0]) * 0.001
+        if self.right:
+            edges[0] -= adjustment
+        else:
+            edges[-1] += adjustment
+        return pd.cut(np.empty(0), edges, right=self.right, precision=precision).categories
+
+    def intervals(self):
+        return pd.IntervalIndex.from_breaks(self.edges, closed="right" if self.right else "left")
+
+    def categorical(self, scores, labels=None):
+        """Scores as a Categorical of bins, like pd.cut(scores, edges, labels, include_lowest=True)."""
+        categories = self.intervals() if labels is None else labels
+        return pd.Categorical.from_codes(self.codes(scores), categories=categories, ordered=True)
+
+    def group_offsets(self, codes):
+        """(order, offsets): the rows of bin b are order[offsets[b]:offsets[b + 1]]."""
+        codes = np.asarray(codes)
+        in_range = codes >= 0
+        order = np.flatnonzero(in_range)[np.argsort(codes[in_range], kind="stable")]
+        offsets = np.concatenate(([0], np.cumsum(np.bincount(codes[in_range], minlength=self.num_bins))))
+        return order, offsets
+
+
+def bin_statistics(df, value_columns, bin_index, bin_codes, statistics=BIN_STATISTICS,
+                   empty_bin_value=np.nan):
+    """Per-bin statistics of value_columns, for the bin codes of a GravyBinIndex.
+
+    Rows with code -1 are left out; missing values are skipped like in pandas groupby (std
+    and sem use ddof=1). Returns {statistic: DataFrame} with one row per bin and one column
+    per value column, plus "peptides" (rows per bin). Every statistic of a bin without rows
+    is set to empty_bin_value.
+    """
+    num_bins = bin_index.num_bins
+    order, offsets = bin_index.group_offsets(bin_codes)
+    row_bins = np.asarray(bin_codes)[order].astype(np.int64)
+    values = df[list(value_columns)].to_numpy(dtype=float)[order]
+
+    peptides = np.diff(offsets)
+    starts = offsets[:-1]
+
+    valid = ~np.isnan(values)
+    count = _segment_sum(valid.astype(float), starts, peptides)
+    total = _segment_sum(np.where(valid, values, 0.0), starts, peptides)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = total / count
+        deviation = np.where(valid, values - mean[row_bins], 0.0)
+        std = np.sqrt(_segment_sum(deviation ** 2, starts, peptides) / (count - 1))
+        std[count < 2] = np.nan
+        sem = std / np.sqrt(count)
+
+    computed = {"count": count, "sum": total, "mean": mean, "std": std, "sem": sem}
+    ordered = None
+    for statistic in statistics:
+        if statistic in computed:
+            continue
+        if ordered is None:
+            ordered = _sort_within_bins(values, row_bins)
+        if statistic == "median":
+            low = _segment_take(ordered, starts, (count - 1) // 2)
+            high = _segment_take(ordered, starts, count // 2)
+            computed[statistic] = (low + high) / 2
+        elif statistic.startswith("q"):
+            computed[statistic] = _segment_quantile(ordered, starts, count, float(statistic[1:]) / 100)
+        else:
+            raise ValueError(f"Unknown bin statistic: {statistic}")
+        computed[statistic][count == 0] = np.nan
+
+    index = pd.RangeIndex(num_bins, name="GravyScore_bin")
+    binned = {"peptides": pd.Series(peptides, index=index)}
+    for statistic in statistics:
+        table = pd.DataFrame(computed[statistic], index=index, columns=list(value_columns))
+        table[peptides == 0] = empty_bin_value
+        binned[statistic] = table
+    return binned
+
+
+def binned_statistics_table(binned, bin_starts, statistics=None):
+    """One long table of all statistics: statistic, bin_start, peptides_count, value columns."""
+    statistics = [name for name in binned if name != "peptides"] if statistics is None else statistics
+    tables = []
+    for statistic in statistics:
+        table = binned[statistic].copy()
+        table.insert(0, "peptides_count", binned["peptides"])
+        table.insert(0, "bin_start", bin_starts)
+        table.insert(0, "statistic", statistic)
+        tables.append(table)
+    return pd.concat(tables, ignore_index=True)
+
+
+def select_statistic(table, statistic):
+    """The rows of one statistic from binned_statistics_table (or its CSV), without the label."""
+    selected = table[table["statistic"] == statistic]
+    return selected.drop(columns="statistic").reset_index(drop=True)
+
+
+def _segment_sum(values, starts, sizes):
+    # np.add.reduceat misbehaves on empty segments, so only non-empty bins are reduced
+    result = np.zeros((len(sizes),) + values.shape[1:])
+    non_empty = sizes > 0
+    if non_empty.any():
+        result[non_empty] = np.add.reduceat(values, starts[non_empty], axis=0)
+    return result
+
+
+def _sort_within_bins(values, row_bins):
+    # Rows are already grouped by bin; sort each column inside its bins, NaNs last
+    ordered = np.empty_like(values)
+    for j in range(values.shape[1]):
+        ordered[:, j] = values[np.lexsort((values[:, j], row_bins)), j]
+    return ordered
+
+
+def _segment_take(ordered, starts, positions):
+    # Value at the given rank inside each bin (bins x columns); empty bins are masked by the caller
+    if len(ordered) == 0:
+        return np.full(positions.shape, np.nan)
+    rows = np.clip(starts[:, None] + positions.astype(np.int64), 0, len(ordered) - 1)
+    return np.take_along_axis(ordered, rows, axis=0)
+
+
+def _segment_quantile(ordered, starts, count, q):
+    # Linear interpolation between the closest ranks
+    virtual = q * np.clip(count - 1, 0, None)
+    below = np.floor(virtual)
+    a = _segment_take(ordered, starts, below)
+    b = _segment_take(ordered, starts, np.ceil(virtual))
+    return a + (b - a) * (virtual - below)
@@ -0,0 +1,126 @@
+#Batched two-sample tests (Welch t, Mann-Whitney U, Kolmogorov-Smirnov) with Benjamini-Hochberg
+#correction. The comparisons are bucketed by sample sizes; each bucket is stacked into two
+#2-D arrays and every test runs once per bucket through the scipy.stats axis argument, so
+#thousands of comparisons (all GRAVY bins x condition pairs) cost a handful of scipy calls.
+
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+TESTS = ("welch", "mannwhitney", "ks")
+
+# Smallest sample (after dropping missing values) a comparison is tested with
+MIN_SAMPLES = 2
+
+
+def benjamini_hochberg(p_values):
+    """BH-adjusted p-values (q-values); missing p-values stay missing and are not counted."""
+    p_values = np.asarray(p_values, dtype=float)
+    q_values = np.full(p_values.shape, np.nan)
+    valid = np.flatnonzero(~np.isnan(p_values))
+    if len(valid) == 0:
+        return q_values
+    order = valid[np.argsort(p_values[valid], kind="stable")]
+    ranked = p_values[order] * len(valid) / np.arange(1, len(valid) + 1)
+    q_values[order] = np.minimum(np.minimum.accumulate(ranked[::-1])[::-1], 1.0)
+    return q_values
+
+
+def column_samples(table, strata=None):
+    """{column: values} of a table, or {(stratum, column): values} per row stratum (e.g. GRAVY bin).
+
+    Missing values are dropped; strata may be bin codes with -1 for rows to leave out.
+    """
+    values = table.to_numpy(dtype=float)
+    if strata is None:
+        return {col: _present(values[:, j]) for j, col in enumerate(table.columns)}
+
+    strata = np.asarray(strata)
+    samples = {}
+    for stratum in pd.unique(strata[~pd.isna(strata)]):
+        if isinstance(stratum, (int, np.integer)) and stratum < 0:
+            continue
+        rows = values[strata == stratum]
+        for j, col in enumerate(table.columns):
+            samples[(stratum, col)] = _present(rows[:, j])
+    return samples
+
+
+def stratified_pairs(samples, pairs):
+    """Every (group_a, group_b) pair inside every stratum of column_samples(..., strata)."""
+    strata = list(dict.fromkeys(key[0] for key in samples))
+    return [((stratum, a), (stratum, b)) for stratum in strata for a, b in pairs
+            if (stratum, a) in samples and (stratum, b) in samples]
+
+
+def pairwise_tests(samples, pairs, tests=TESTS, min_samples=MIN_SAMPLES):
+    """Run the tests on all pairs of samples at once.
+
+    samples maps a key to a 1-D array of values, pairs is a list of (key_a, key_b). Returns
+    one row per pair with n_a, n_b, mean_a, mean_b and, per test, its statistic, p-value
+    and BH q-value over all pairs (<test>_stat, <test>_p, <test>_q). Pairs where a sample
+    has fewer than min_samples values get NaN.
+    """
+    unknown = set(tests) - set(TESTS)
+    if unknown:
+        raise ValueError(f"Unknown tests: {sorted(unknown)}")
+
+    pairs = list(pairs)
+    x_samples = [_present(samples[a]) for a, _ in pairs]
+    y_samples = [_present(samples[b]) for _, b in pairs]
+    n_x = np.array([len(x) for x in x_samples], dtype=np.int64)
+    n_y = np.array([len(y) for y in y_samples], dtype=np.int64)
+
+    results = {test: (np.full(len(pairs), np.nan), np.full(len(pairs), np.nan)) for test in tests}
+    buckets = {}
+    for i in np.flatnonzero((n_x >= min_samples) & (n_y >= min_samples)):
+        buckets.setdefault((n_x[i], n_y[i]), []).append(i)
+
+    for members in buckets.values():
+        x = np.stack([x_samples[i] for i in members])
+        y = np.stack([y_samples[i] for i in members])
+        for test in tests:
+            statistic, p_value = _run_test(test, x, y)
+            results[test][0][members] = statistic
+            results[test][1][members] = p_value
+
+    table = pd.DataFrame({
+        "group_a": [a for a, _ in pairs],
+        "group_b": [b for _, b in pairs],
+        "n_a": n_x,
+        "n_b": n_y,
+        "mean_a": [x.mean() if len(x) else np.nan for x in x_samples],
+        "mean_b": [y.mean() if len(y) else np.nan for y in y_samples],
+    })
+    for test in tests:
+        statistic, p_value = results[test]
+        table[f"{test}_stat"] = statistic
+        table[f"{test}_p"] = p_value
+        table[f"{test}_q"] = benjamini_hochberg(p_value)
+    return table
+
+
+def _present(values):
+    values = np.asarray(values, dtype=float)
+    return values[~np.isnan(values)]
+
+
+def _run_test(test, x, y):
+    if test == "welch":
+        result = stats.ttest_ind(x, y, axis=1, equal_var=False)
+    elif test == "mannwhitney":
+        # scipy picks the exact or the asymptotic method for a whole call depending on ties,
+        # so comparisons with and without ties go through separate calls
+        statistic = np.empty(len(x))
+        p_value = np.empty(len(x))
+        ordered = np.sort(np.concatenate([x, y], axis=1), axis=1)
+        tied = (np.diff(ordered, axis=1) == 0).any(axis=1)
+        for rows in (tied, ~tied):
+            if rows.any():
+                result = stats.mannwhitneyu(x[rows], y[rows], axis=1, alternative="two-sided")
+                statistic[rows] = result.statistic
+                p_value[rows] = result.pvalue
+        return statistic, p_value
+    else:
+        result = stats.ks_2samp(x, y, axis=1)
+    return result.statistic, result.pvalue
@@ -0,0 +1,57 @@
+#Missingness of every peptide in every condition (replicate columns name.number grouped by
+#name) with its GRAVY score, and the mean missingness per GRAVY bin.
+#Shared by Missingness.py, which writes both tables, and plots/HM_missingness.py, which
+#plots the binned table straight from a peptide intensity CSV.
+
+import re
+
+from Functions.detection_matrix import DetectionMatrix
+from Functions.gravy_binning import GravyBinIndex
+from Functions.replicate_collapse import group_replicates
+
+
+def calculate_missingness(df):
+    """Missing rate per peptide x condition plus GravyScore; rows sharing an index label
+    (a GravySequence at several charges) are pooled into one peptide."""
+    # Ensure GRAVY score is present
+    if "GravyScore" not in df.columns:
+        raise ValueError("Missing 'GravyScore' column.")
+
+    gravy = df["GravyScore"]
+
+    # Identify replicate columns (e.g., F_1.1, R1_0.2)
+    rep_cols = [c for c in df.columns if re.match(r".*\.\d+$", c)]
+    if not rep_cols:
+        raise ValueError("No replicate columns matched pattern 'name.number'.")
+
+    # Map replicates to method/sample group
+    groups = dict(sorted(group_replicates(rep_cols).items()))
+
+    # Pack presence/absence (missing or 0 = not detected) into bits, one row per peptide
+    detection = DetectionMatrix.from_frame(df, rep_cols)
+
+    # Compute missingness rate per peptide × method (popcount of each method's bits)
+    rates = detection.missing_rates(groups, pool_labels=True)
+    rates.index.name = "peptide"
+
+    # Merge back GRAVY score
+    rates = rates.merge(gravy, left_index=True, right_index=True)
+
+    return rates
+
+
+def bin_missingness(df, bins=20):
+    """Mean missingness per GRAVY bin (pd.cut interval labels) of a calculate_missingness table."""
+    # Drop rows without GRAVY scores
+    df = df.dropna(subset=['GravyScore'])
+
+    # Bin GRAVY scores (bins = number of bins over this file's range, or a shared GravyBinIndex)
+    bin_index = bins if isinstance(bins, GravyBinIndex) else GravyBinIndex.from_scores(df['GravyScore'], num_bins=bins)
+    df['GravyBin'] = bin_index.categorical(df['GravyScore'], bin_index.cut_labels())
+
+    # Keep only numeric columns (sample groups)
+    sample_cols = df.select_dtypes(include='number').columns.difference(['GravyScore'])
+
+    # Group and compute mean missingness
+    summary = df.groupby('GravyBin', observed=True)[sample_cols].mean().reset_index()
+    return summary
@@ -0,0 +1,165 @@
+#Persistent per-peptide property store (SQLite), shared by every experiment and script.
+#Keyed by the sequence string exactly as it appears in the matrix (modified or stripped);
+#holds the stripped form, length, charge-independent monoisotopic mass and unrounded GRAVY.
+
+import os
+import re
+import sqlite3
+
+import numpy as np
+import pandas as pd
+
+from Functions.gravy import COMPENSATED_SUM, gravy_scores, round_gravy
+
+DEFAULT_STORE = os.environ.get("PEPTIDE_STORE",
+                               os.path.join(os.path.expanduser("~"), ".peptide_store.sqlite"))
+
+PROPERTY_COLUMNS = ["stripped", "length", "mass", "gravy"]
+
+# Bumped when a stored property is computed differently; a store written by another version
+# (or, as GRAVY follows sum(), by a Python on the other side of 3.12) is emptied and refilled
+STORE_VERSION = 2
+
+# Monoisotopic residue masses
+RESIDUE_MASS = {
+    'G': 57.021464, 'A': 71.037114, 'S': 87.032028, 'P': 97.052764, 'V': 99.068414,
+    'T': 101.047679, 'C': 103.009185, 'L': 113.084064, 'I': 113.084064, 'N': 114.042927,
+    'D': 115.026943, 'Q': 128.058578, 'K': 128.094963, 'E': 129.042593, 'M': 131.040485,
+    'H': 137.058912, 'F': 147.068414, 'R': 156.101111, 'Y': 163.06332, 'W': 186.079313
+}
+WATER_MASS = 18.010565
+
+# Monoisotopic mass shifts of the UniMod entries DIA-NN reports
+UNIMOD_MASS = {
+    1: 42.010565,    # Acetyl
+    4: 57.021464,    # Carbamidomethyl
+    5: 43.005814,    # Carbamyl
+    7: 0.984016,     # Deamidated
+    21: 79.966331,   # Phospho
+    27: -18.010565,  # Glu->pyro-Glu
+    28: -17.026549,  # Gln->pyro-Glu
+    35: 15.994915,   # Oxidation
+    121: 114.042927  # GlyGly
+}
+
+_MODIFICATION = re.compile(r"\(UniMod:(\d+)\)")
+_SQL_CHUNK = 900
+
+# U is the repo's shorthand for carbamidomethylated C (see GravyHelper.replace_modification)
+_RESIDUE_TABLE = np.full(256, np.nan)
+for _aa, _mass in RESIDUE_MASS.items():
+    _RESIDUE_TABLE[ord(_aa)] = _mass
+_RESIDUE_TABLE[ord('U')] = RESIDUE_MASS['C'] + UNIMOD_MASS[4]
+
+
+def peptide_properties(sequences):
+    """Compute stripped form, length, mass and GRAVY for a column of sequences."""
+    sequences = [seq if isinstance(seq, str) else "" for seq in sequences]
+    joined = "\n".join(sequences)
+
+    # Strip modifications once over the joined column; unknown UniMod ids make the mass NaN
+    offsets = np.concatenate(([0], np.cumsum([len(seq) + 1 for seq in sequences])[:-1]))
+    mod_positions, mod_mass = [], []
+    for match in _MODIFICATION.finditer(joined):
+        mod_positions.append(match.start())
+        mod_mass.append(UNIMOD_MASS.get(int(match.group(1)), np.nan))
+    stripped = _MODIFICATION.sub("", joined).split("\n")
+
+    lengths = np.fromiter(map(len, stripped), dtype=np.int64, count=len(stripped))
+    encoded = np.frombuffer("".join(stripped).encode("ascii", errors="replace"), dtype=np.uint8)
+    mass = np.full(len(stripped), np.nan)
+    non_empty = lengths > 0
+    if non_empty.any():
+        starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+        mass[non_empty] = np.add.reduceat(_RESIDUE_TABLE[encoded], starts[non_empty]) + WATER_MASS
+    if mod_positions:
+        owner = np.searchsorted(offsets, mod_positions, side="right") - 1
+        mass += np.bincount(owner, weights=mod_mass, minlength=len(stripped))
+
+    return pd.DataFrame({
+        "stripped": [seq.replace("U", "C") for seq in stripped],
+        "length": lengths,
+        "mass": mass,
+        "gravy": gravy_scores(sequences, decimals=None),
+    }, index=pd.Index(sequences, name="sequence"))
+
+
+class PeptideStore:
+    """Key-value store of peptide properties with bulk get/put.
+
+    Use properties() or gravy() from scripts: cached rows are read back, only unseen
+    sequences are computed and then written to the store for the next experiment.
+    """
+
+    def __init__(self, path=DEFAULT_STORE):
+        self.path = path
+        self.connection = sqlite3.connect(path, timeout=60)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS peptides ("
+            "sequence TEXT PRIMARY KEY, stripped TEXT, length INTEGER, mass REAL, gravy REAL"
+            ") WITHOUT ROWID"
+        )
+        version = 2 * STORE_VERSION + COMPENSATED_SUM
+        if self.connection.execute("PRAGMA user_version").fetchone()[0] != version:
+            self.connection.execute("DELETE FROM peptides")
+            self.connection.execute(f"PRAGMA user_version = {version}")
+        self.connection.commit()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.connection.close()
+
+    def get_many(self, sequences):
+        """Return the stored properties of the given sequences (unknown ones are left out)."""
+        keys = list(dict.fromkeys(seq for seq in sequences if isinstance(seq, str)))
+        rows = []
+        for i in range(0, len(keys), _SQL_CHUNK):
+            chunk = keys[i:i + _SQL_CHUNK]
+            placeholders = ",".join("?" * len(chunk))
+            rows.extend(self.connection.execute(
+                f"SELECT sequence, stripped, length, mass, gravy FROM peptides WHERE sequence IN ({placeholders})",
+                chunk
+            ))
+        found = pd.DataFrame(rows, columns=["sequence"] + PROPERTY_COLUMNS)
+        found[["mass", "gravy"]] = found[["mass", "gravy"]].astype(float)
+        return found.set_index("sequence")
+
+    def put_many(self, properties):
+        """Store a DataFrame of properties indexed by sequence (as from peptide_properties)."""
+        properties = properties[~properties.index.duplicated()]
+        rows = zip(
+            properties.index.tolist(),
+            properties["stripped"].tolist(),
+            properties["length"].astype(int).tolist(),
+            [None if np.isnan(value) else value for value in properties["mass"].tolist()],
+            [None if np.isnan(value) else value for value in properties["gravy"].tolist()],
+        )
+        with self.connection:
+            self.connection.executemany("INSERT OR REPLACE INTO peptides VALUES (?, ?, ?, ?, ?)", rows)
+
+    def properties(self, sequences):
+        """Properties for every sequence, in input order; computes and stores the missing ones."""
+        sequences = pd.Series(sequences, dtype=object).reset_index(drop=True)
+        known = self.get_many(sequences)
+
+        unseen = pd.unique(sequences[sequences.notna() & ~sequences.isin(known.index)])
+        if len(unseen):
+            computed = peptide_properties(unseen)
+            self.put_many(computed)
+            known = pd.concat([known, computed])
+
+        return known.reindex(sequences.tolist())
+
+    def gravy(self, sequences, decimals=2):
+        """GRAVY for a column of sequences, identical to gravy_scores(sequences, decimals)."""
+        sequences = pd.Series(sequences, dtype=object)
+        scores = self.properties(sequences)["gravy"].to_numpy(dtype=float)
+        if decimals is None:
+            return scores
+        return round_gravy(scores, decimals)
@@ -0,0 +1,135 @@
+#Bridge-sample normalization of several plates onto one reference plate.
+#Every plate declares, per surface (F, R, ...), the condition that was measured as a bridge
+#(e.g. F_6 on P1 and F_5 on P2). The factor of a plate and surface brings its bridge to the
+#level of the reference plate's bridge; all sample columns of that surface are multiplied
+#by it with one broadcast over the (float32) intensity matrix, in place.
+
+import csv
+import re
+
+import numpy as np
+import pandas as pd
+
+from Functions.processed_merge import KEY_COLUMN, is_sample_column
+from Functions.replicate_collapse import replicate_condition
+
+# mean: mean of all bridge values (0 included); median_no_zeros: median of the non-zero
+# bridge values; median_of_ratios: median over the peptides measured on both plates of
+# reference bridge / plate bridge (per-peptide means of the non-zero replicates)
+NORMALIZATION_METHODS = ("mean", "median_no_zeros", "median_of_ratios")
+
+
+def sample_surface(sample):
+    # F_5.1 -> F, R2_0.3 -> R
+    match = re.match(r"[A-Za-z]+", sample)
+    return match.group(0) if match else None
+
+
+def bridge_columns(columns, condition):
+    """Replicate columns of one condition (F_5 -> F_5.1, F_5.2, ...)."""
+    return [col for col in columns if col == condition or replicate_condition(col) == condition]
+
+
+def bridge_factors(plates, bridges, reference, method="mean"):
+    """Scaling factor of every plate and surface, as a plates x surfaces DataFrame.
+
+    plates maps plate name -> processed table, bridges maps plate name -> {surface: bridge
+    condition}. The reference plate gets factor 1; a surface without a bridge on a plate
+    (or on the reference) gets NaN.
+    """
+    if method not in NORMALIZATION_METHODS:
+        raise ValueError(f"Unknown normalization method: {method}")
+    if reference not in plates:
+        raise ValueError(f"Reference plate {reference} is not among the plates")
+
+    surfaces = list(dict.fromkeys(surface for bridge in bridges.values() for surface in bridge))
+    factors = pd.DataFrame(np.nan, index=pd.Index(list(plates), name="plate"), columns=surfaces)
+    reference_bridges = bridges.get(reference, {})
+
+    for surface in surfaces:
+        if surface not in reference_bridges:
+            continue
+        reference_block = _bridge_block(plates[reference], reference_bridges[surface])
+        if method == "median_of_ratios":
+            reference_level = _peptide_levels(plates[reference], reference_block)
+        else:
+            reference_level = _bridge_level(reference_block.to_numpy(dtype=float), method)
+
+        for plate, df in plates.items():
+            if plate == reference:
+                factors.loc[plate, surface] = 1.0
+                continue
+            if surface not in bridges.get(plate, {}):
+                continue
+            block = _bridge_block(df, bridges[plate][surface])
+            if method == "median_of_ratios":
+                ratios = (reference_level / _peptide_levels(df, block)).dropna()
+                factors.loc[plate, surface] = ratios.median() if len(ratios) else np.nan
+            else:
+                factors.loc[plate, surface] = reference_level / _bridge_level(block.to_numpy(dtype=float), method)
+    return factors
+
+
+def plate_matrix(df, columns=None, dtype=np.float32):
+    """(matrix, columns): the sample columns of df as one contiguous array to scale in place."""
+    columns = [col for col in df.columns if is_sample_column(col)] if columns is None else list(columns)
+    return np.ascontiguousarray(df[columns].to_numpy(dtype=dtype)), columns
+
+
+def apply_bridge_factors(matrix, columns, plate_factors, surface_of=sample_surface):
+    """Multiply the columns of matrix by the factor of their surface, in place.
+
+    plate_factors maps surface -> factor (one row of bridge_factors); columns whose surface
+    has no factor (or a NaN one) are left unchanged.
+    """
+    column_factors = np.ones(len(columns), dtype=matrix.dtype)
+    for i, col in enumerate(columns):
+        factor = plate_factors.get(surface_of(col))
+        if factor is not None and not np.isnan(factor):
+            column_factors[i] = factor
+    np.multiply(matrix, column_factors, out=matrix)
+    return matrix
+
+
+def write_bridge_factors(factors, path):
+    """Save factors as plate,surface,factor rows (the format read_bridge_factors reads)."""
+    with open(path, "w", newline="") as file:
+        writer = csv.writer(file)
+        writer.writerow(["plate", "surface", "factor"])
+        for plate, row in factors.iterrows():
+            for surface, factor in row.items():
+                if not np.isnan(factor):
+                    writer.writerow([plate, surface, repr(float(factor))])
+
+
+def read_bridge_factors(path):
+    """{plate: {surface: factor}} from a file written by write_bridge_factors."""
+    factors = {}
+    with open(path, "r", newline="") as file:
+        for row in csv.DictReader(file):
+            factors.setdefault(row["plate"], {})[row["surface"]] = float(row["factor"])
+    return factors
+
+
+def _bridge_block(df, condition):
+    columns = bridge_columns(df.columns, condition)
+    if not columns:
+        raise ValueError(f"No replicate columns for bridge condition {condition}")
+    return df[columns]
+
+
+def _bridge_level(values, method):
+    # All bridge values of one plate, flattened like the original per-pair scripts
+    values = values.ravel()
+    if method == "mean":
+        return values.mean()
+    values = values[values != 0]
+    return np.nanmedian(values) if np.any(~np.isnan(values)) else np.nan
+
+
+def _peptide_levels(df, block):
+    # Mean of the non-zero bridge replicates of every peptide, one row per peptide
+    levels = block.mask(block == 0).mean(axis=1)
+    if KEY_COLUMN in df.columns:
+        levels = levels.groupby(df[KEY_COLUMN].to_numpy(), sort=False).mean()
+    return levels
@@ -0,0 +1,166 @@
+#Columnar cache for DIA-NN report.pr_matrix.tsv files.
+#The TSV is parsed once and every column is stored as its own .npy file (strings as
+#factorized codes + unique values) with a meta.json sidecar. Later reads load only the
+#requested columns and skip the TSV entirely. GRAVY bin codes of a GravyBinIndex are kept
+#in the same entry as an int16 .npy per set of bin edges.
+
+import hashlib
+import json
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+CACHE_DIR_NAME = ".pr_matrix_cache"
+CACHE_VERSION = 1
+
+
+def read_pr_matrix(pr_file, usecols=None, cache_dir=None):
+    """Read a pr_matrix TSV like pd.read_csv(sep="\\t"), but through the columnar cache.
+
+    usecols is None (all columns), a list of column names or a callable taking a
+    column name, as in pandas. The cache lives in cache_dir (default: a
+    .pr_matrix_cache folder next to the TSV) and is keyed by path, mtime and size.
+    """
+    entry_dir = _cache_entry_dir(pr_file, cache_dir)
+    meta = _load_meta(entry_dir)
+    if meta is None:
+        meta = _build_cache(pr_file, entry_dir)
+
+    columns = _select_columns(meta["columns"], usecols)
+    data = {}
+    for column in columns:
+        data[column["name"]] = _load_column(entry_dir, column)
+    return pd.DataFrame(data, index=pd.RangeIndex(meta["n_rows"]))
+
+
+def read_pr_matrix_columns(pr_file, cache_dir=None):
+    """Return the column names of a pr_matrix without loading any data."""
+    entry_dir = _cache_entry_dir(pr_file, cache_dir)
+    meta = _load_meta(entry_dir)
+    if meta is None:
+        meta = _build_cache(pr_file, entry_dir)
+    return [column["name"] for column in meta["columns"]]
+
+
+def read_bin_codes(pr_file, bin_index, scores, cache_dir=None):
+    """int16 bin codes of the rows of a pr_matrix (bin_index.codes(scores)), kept in its cache.
+
+    scores must be one value per TSV row, as read through read_pr_matrix. The codes are
+    stored next to the cached columns, keyed by the bin edges, and dropped with them when
+    the TSV changes.
+    """
+    entry_dir = _cache_entry_dir(pr_file, cache_dir)
+    edges_key = hashlib.sha1(np.asarray(bin_index.edges, dtype=float).tobytes()
+                             + str(bin_index.right).encode("utf-8")).hexdigest()[:12]
+    codes_file = os.path.join(entry_dir, f"bins-{edges_key}.npy")
+    if os.path.isfile(codes_file):
+        codes = np.load(codes_file)
+        if len(codes) == len(scores):
+            return codes
+
+    codes = bin_index.codes(scores)
+    if os.path.isdir(entry_dir):
+        tmp_file = f"{codes_file}.tmp-{os.getpid()}.npy"
+        np.save(tmp_file, codes)
+        os.replace(tmp_file, codes_file)
+    return codes
+
+
+def _cache_entry_dir(pr_file, cache_dir):
+    pr_file = os.path.abspath(pr_file)
+    stat = os.stat(pr_file)
+    if cache_dir is None:
+        cache_dir = os.path.join(os.path.dirname(pr_file), CACHE_DIR_NAME)
+
+    # One folder per source file; the stat part changes whenever the TSV does
+    path_key = hashlib.sha1(pr_file.encode("utf-8")).hexdigest()[:12]
+    stat_key = hashlib.sha1(f"{stat.st_mtime_ns}|{stat.st_size}".encode("utf-8")).hexdigest()[:12]
+    return os.path.join(cache_dir, f"{path_key}-{stat_key}")
+
+
+def _load_meta(entry_dir):
+    meta_file = os.path.join(entry_dir, "meta.json")
+    if not os.path.isfile(meta_file):
+        return None
+    with open(meta_file, "r", encoding="utf-8") as file:
+        meta = json.load(file)
+    if meta.get("version") != CACHE_VERSION:
+        return None
+    return meta
+
+
+def _build_cache(pr_file, entry_dir):
+    df = pd.read_csv(pr_file, sep="\t")
+
+    cache_dir = os.path.dirname(entry_dir)
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp_dir = f"{entry_dir}.tmp-{os.getpid()}"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    columns = []
+    for i, (name, values) in enumerate(df.items()):
+        column = {"name": name, "file": f"c{i:05d}"}
+        if pd.api.types.is_numeric_dtype(values.dtype):
+            column["kind"] = "numeric"
+            np.save(os.path.join(tmp_dir, column["file"] + ".npy"), values.to_numpy())
+        else:
+            # Strings are stored factorized; code -1 marks a missing value
+            column["kind"] = "string"
+            codes, uniques = pd.factorize(values)
+            uniques = np.asarray(uniques, dtype=str) if len(uniques) else np.array([], dtype="U1")
+            np.save(os.path.join(tmp_dir, column["file"] + ".codes.npy"), codes.astype(np.int32))
+            np.save(os.path.join(tmp_dir, column["file"] + ".uniques.npy"), uniques)
+        columns.append(column)
+
+    meta = {
+        "version": CACHE_VERSION,
+        "source": os.path.abspath(pr_file),
+        "n_rows": len(df),
+        "columns": columns,
+    }
+    with open(os.path.join(tmp_dir, "meta.json"), "w", encoding="utf-8") as file:
+        json.dump(meta, file)
+
+    # Drop caches of older versions of the same file, then publish the new one
+    path_key = os.path.basename(entry_dir).split("-")[0]
+    for name in os.listdir(cache_dir):
+        old_dir = os.path.join(cache_dir, name)
+        if name.startswith(path_key + "-") and old_dir != tmp_dir and ".tmp-" not in name:
+            shutil.rmtree(old_dir, ignore_errors=True)
+    try:
+        os.replace(tmp_dir, entry_dir)
+    except OSError:
+        # Another process published the same entry first
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    return meta
+
+
+def _select_columns(columns, usecols):
+    if usecols is None:
+        return columns
+    if callable(usecols):
+        return [column for column in columns if usecols(column["name"])]
+
+    by_name = {column["name"]: column for column in columns}
+    missing = [name for name in usecols if name not in by_name]
+    if missing:
+        raise ValueError(f"Usecols do not match columns, columns expected but not found: {missing}")
+    return [by_name[name] for name in usecols]
+
+
+def _load_column(entry_dir, column):
+    base = os.path.join(entry_dir, column["file"])
+    if column["kind"] == "numeric":
+        return np.load(base + ".npy", mmap_mode="r")
+
+    codes = np.load(base + ".codes.npy")
+    uniques = np.load(base + ".uniques.npy").astype(object)
+    values = np.empty(len(codes), dtype=object)
+    present = codes >= 0
+    values[present] = uniques[codes[present]]
+    values[~present] = np.nan
+    return values
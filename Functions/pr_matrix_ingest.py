@@ -0,0 +1,109 @@
+#Parallel ingestion of many report.pr_matrix.tsv files (one per sub-experiment folder).
+#Each file is read, gets a GRAVY column and has its sample columns renamed in a worker
+#process; results come back in a deterministic (sorted path) order.
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+import pandas as pd
+from tqdm import tqdm
+
+from Functions.peptide_store import PeptideStore
+from Functions.pr_matrix_cache import read_pr_matrix, read_pr_matrix_columns
+
+PR_MATRIX_FILENAMES = ("report.pr_matrix.tsv",)
+
+
+def find_pr_matrix_files(root_folder, filenames=PR_MATRIX_FILENAMES):
+    """All pr_matrix files below root_folder, sorted so runs are reproducible."""
+    pr_files = []
+    for dirpath, _, files in os.walk(root_folder):
+        for filename in files:
+            if filename in filenames:
+                pr_files.append(os.path.join(dirpath, filename))
+    return sorted(pr_files)
+
+
+def load_pr_matrix(pr_file, sample_name=None, sequence_column="Stripped.Sequence"):
+    """Read one pr_matrix and add GRAVY next to the sequence column.
+
+    With a sample_name function (raw column path -> clean name, or None to drop it) only
+    sequence, GRAVY, Precursor.Charge and the renamed sample columns are kept. Without it
+    all columns are kept. The frame has one row per TSV row and the file path in
+    attrs["pr_file"] (for read_bin_codes). Returns None if the file has no usable columns.
+    """
+    columns = read_pr_matrix_columns(pr_file)
+    if sequence_column not in columns:
+        return None
+
+    if sample_name is None:
+        df = read_pr_matrix(pr_file)
+        sample_map = {}
+    else:
+        sample_map = {col: sample_name(col) for col in columns if col.endswith(".raw")}
+        sample_map = {k: v for k, v in sample_map.items() if v is not None}
+        if not sample_map:
+            return None
+        df = read_pr_matrix(pr_file, usecols=[sequence_column, "Precursor.Charge"] + list(sample_map))
+
+    with PeptideStore() as store:
+        gravy = store.gravy(df[sequence_column], decimals=None)
+
+    # Build the output frame once instead of inserting, reordering and slicing copies
+    data = {sequence_column: df[sequence_column], "GRAVY": gravy}
+    if sample_map:
+        data["Precursor.Charge"] = df["Precursor.Charge"]
+        for col, name in sample_map.items():
+            data[name] = df[col]
+    else:
+        for col in df.columns:
+            if col not in data:
+                data[col] = df[col]
+    df = pd.DataFrame(data)
+    df.attrs["pr_file"] = pr_file
+    return df
+
+
+def ingest_pr_matrices(pr_files, sample_name=None, sequence_column="Stripped.Sequence", max_workers=None):
+    """Load many pr_matrix files in a process pool.
+
+    Returns {subfolder name: frame} in the order of pr_files; duplicate subfolder names
+    get a _1, _2, ... suffix. max_workers=1 runs everything in-process.
+    sample_name must be a module-level function so it can be sent to the workers.
+    """
+    worker = partial(load_pr_matrix, sample_name=sample_name, sequence_column=sequence_column)
+
+    if max_workers == 1 or len(pr_files) <= 1:
+        results = [_collect(partial(worker, pr_file), pr_file) for pr_file in tqdm(pr_files, desc="Processing .tsv files")]
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            futures = [executor.submit(worker, pr_file) for pr_file in pr_files]
+            # Collected in submission order no matter which worker finishes first
+            results = [_collect(future.result, pr_file) for future, pr_file in
+                       tqdm(zip(futures, pr_files), total=len(pr_files), desc="Processing .tsv files")]
+
+    ingested = {}
+    for pr_file, result in zip(pr_files, results):
+        if result is None:
+            continue
+        name = os.path.basename(os.path.dirname(pr_file))
+        if name in ingested:
+            suffix = 1
+            while f"{name}_{suffix}" in ingested:
+                suffix += 1
+            name = f"{name}_{suffix}"
+        ingested[name] = result
+    return ingested
+
+
+def _collect(get_result, pr_file):
+    # One bad file is reported and skipped instead of aborting the whole folder
+    try:
+        result = get_result()
+    except Exception as e:
+        print(f"Error processing {pr_file}: {e}")
+        return None
+    if result is None:
+        print(f"Skipping {pr_file} — sequence or sample columns not found.")
+    return result
@@ -0,0 +1,147 @@
+#Streaming (chunked) version of the 1-process-raw-tsv stage for very wide pr_matrix files.
+#Rows are read in blocks with float32 intensities and categorical protein/gene columns;
+#each block is renamed, scaled, given GRAVY scores, sorted and written to a temporary run
+#file. The runs are then k-way merged by GravyScore into the final processed CSV (in several
+#passes of at most MERGE_FAN_IN open files), so peak memory depends on the chunk size, not on
+#the file size.
+
+import csv
+import heapq
+import math
+import os
+import shutil
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from Functions.peptide_store import PeptideStore
+
+# Surface scaling applied to the sample intensities, by sample name prefix
+SCALING_FACTORS = {"F": 1.4091, "R": 1.0750}
+
+PROTEIN_COLUMNS = ("Protein.Group", "Protein.Ids", "Protein.Names", "Genes", "First.Protein.Description")
+
+DEFAULT_CHUNK_SIZE = 50000
+
+# Most run files open at once in one merge pass, well below the usual open-file limits
+MERGE_FAN_IN = 64
+
+
+def read_pr_matrix_header(pr_file):
+    with open(pr_file, "r", newline="") as file:
+        return file.readline().rstrip("\r\n").split("\t")
+
+
+def pr_matrix_dtypes(columns):
+    """Explicit dtypes: float32 for .raw intensity columns, category for protein/gene columns."""
+    dtypes = {}
+    for col in columns:
+        if col.endswith(".raw"):
+            dtypes[col] = np.float32
+        elif col in PROTEIN_COLUMNS:
+            dtypes[col] = "category"
+    return dtypes
+
+
+def iter_pr_matrix_chunks(pr_file, chunksize=DEFAULT_CHUNK_SIZE, usecols=None):
+    columns = read_pr_matrix_header(pr_file)
+    if usecols is not None:
+        columns = [col for col in columns if col in set(usecols)]
+    return pd.read_csv(pr_file, sep="\t", usecols=columns, dtype=pr_matrix_dtypes(columns), chunksize=chunksize)
+
+
+def scaling_factor(sample_name, scaling=SCALING_FACTORS):
+    for prefix, factor in scaling.items():
+        if sample_name.startswith(prefix):
+            return factor
+    return 1.0
+
+
+def process_pr_matrix_streaming(pr_file, output_file, sample_map, scaling=SCALING_FACTORS,
+                                chunksize=DEFAULT_CHUNK_SIZE):
+    """Write the processed (renamed, scaled, GRAVY-sorted) table of pr_file to output_file.
+
+    sample_map maps .raw column -> sample name, like extract_clean_sample_name. Columns that
+    map to the same name keep the position of the first one and the values of the last one,
+    as in the in-memory version.
+    """
+    columns = read_pr_matrix_header(pr_file)
+    if "Modified.Sequence" in columns:
+        sequence_column = "Modified.Sequence"
+    elif "Stripped.Sequence" in columns:
+        sequence_column = "Stripped.Sequence"
+    else:
+        raise ValueError("No Modified.Sequence nor Stripped.Sequence column in file.")
+
+    sample_columns = {}
+    for col, name in sample_map.items():
+        sample_columns[name] = col
+    header = [sequence_column, "GravySequence", "GravyScore", "Precursor.Charge"] + list(sample_columns)
+    usecols = [sequence_column, "Precursor.Charge"] + list(sample_columns.values())
+
+    run_dir = tempfile.mkdtemp(prefix="processed-runs-", dir=os.path.dirname(os.path.abspath(output_file)))
+    try:
+        run_files = []
+        with PeptideStore() as store:
+            for chunk in iter_pr_matrix_chunks(pr_file, chunksize, usecols):
+                run_file = os.path.join(run_dir, f"run{len(run_files):05d}.csv")
+                _process_chunk(chunk, sequence_column, sample_columns, scaling, store).to_csv(
+                    run_file, index=False, header=False, float_format="%.7g")
+                run_files.append(run_file)
+        _merge_runs(run_files, output_file, header, key_index=header.index("GravyScore"))
+    finally:
+        shutil.rmtree(run_dir, ignore_errors=True)
+
+    return output_file
+
+
+def _process_chunk(chunk, sequence_column, sample_columns, scaling, store):
+    sequences = chunk[sequence_column]
+    data = {
+        sequence_column: sequences,
+        "GravySequence": sequences.str.replace("C(UniMod:4)", "U", regex=False),
+        "GravyScore": store.gravy(sequences),
+        "Precursor.Charge": chunk["Precursor.Charge"],
+    }
+    for name, col in sample_columns.items():
+        data[name] = chunk[col].fillna(0) * np.float32(scaling_factor(name, scaling))
+
+    # Stable sort, so equal scores keep their file order within the run
+    processed = pd.DataFrame(data)
+    return processed.sort_values("GravyScore", kind="mergesort")
+
+
+def _merge_runs(run_files, output_file, header, key_index):
+    # Merge groups of consecutive runs into longer runs until one pass can take them all;
+    # consecutive groups keep ties in file order
+    merge_pass = 0
+    while len(run_files) > MERGE_FAN_IN:
+        merge_pass += 1
+        merged_runs = []
+        for i in range(0, len(run_files), MERGE_FAN_IN):
+            group = run_files[i:i + MERGE_FAN_IN]
+            merged_run = os.path.join(os.path.dirname(group[0]), f"pass{merge_pass}-run{len(merged_runs):05d}.csv")
+            _merge_files(group, merged_run, None, key_index)
+            for run_file in group:
+                os.remove(run_file)
+            merged_runs.append(merged_run)
+        run_files = merged_runs
+    _merge_files(run_files, output_file, header, key_index)
+
+
+def _merge_files(run_files, output_file, header, key_index):
+    files = [open(run_file, "r", newline="") for run_file in run_files]
+    try:
+        readers = [csv.reader(file) for file in files]
+        # heapq.merge is stable across runs, so ties stay in file order like a full sort;
+        # missing scores (empty fields) sort last, like sort_values does
+        merged = heapq.merge(*readers, key=lambda row: float(row[key_index]) if row[key_index] else math.inf)
+        with open(output_file, "w", newline="") as csvfile:
+            writer = csv.writer(csvfile)
+            if header is not None:
+                writer.writerow(header)
+            writer.writerows(merged)
+    finally:
+        for file in files:
+            file.close()
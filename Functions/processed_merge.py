@@ -0,0 +1,124 @@
+#Merges processed (1-process-raw-tsv) tables of several plates into one table on GravySequence.
+#All files are outer-joined with one indexed concat; 0 intensities become NaN in one pass.
+#merge_processed_files_streaming does the same as a k-way merge of the GRAVY-sorted files,
+#row by row, so any number of plates can be merged without loading them into memory.
+
+import csv
+import heapq
+import itertools
+import math
+import re
+
+import pandas as pd
+
+KEY_COLUMN = "GravySequence"
+META_COLUMNS = ["GravySequence", "GravyScore", "Precursor.Charge"]
+
+
+def is_sample_column(col):
+    # Sample columns are the ones with a number in their name (F_1.1, R2_0.3, ...)
+    return re.search(r"\d", col) is not None
+
+
+def merge_processed_tables(tables):
+    """Outer-join processed tables on GravySequence.
+
+    Rows keep the order in which peptides are first seen. GravyScore and Precursor.Charge
+    come from the first row seen for a peptide; sample values from the last row seen (a
+    peptide measured at several charges, or a sample column present in several files).
+    Sample values of 0 become NaN.
+    """
+    meta_parts = []
+    sample_parts = []
+    for table in tables:
+        meta_parts.append(table[META_COLUMNS])
+        sample_cols = [col for col in table.columns if is_sample_column(col)]
+        samples = table[[KEY_COLUMN] + sample_cols].drop_duplicates(KEY_COLUMN, keep="last")
+        sample_parts.append(samples.set_index(KEY_COLUMN))
+
+    meta = pd.concat(meta_parts, ignore_index=True).drop_duplicates(KEY_COLUMN, keep="first")
+    meta = meta.set_index(KEY_COLUMN)
+
+    samples = pd.concat(sample_parts, axis=1, join="outer", sort=False)
+    if samples.columns.duplicated().any():
+        # The same sample column in several files: the last file with the peptide wins
+        # (processed files are 0-filled, so NaN here only means "peptide not in that file")
+        samples = samples.T.groupby(level=0, sort=False).last().T
+
+    merged = meta.join(samples, how="left").reset_index()
+
+    # Replace any 0.0 values in the sample columns with NaN
+    sample_cols = [col for col in merged.columns if is_sample_column(col)]
+    merged[sample_cols] = merged[sample_cols].mask(merged[sample_cols] == 0)
+    return merged
+
+
+def merge_processed_files(pr_files):
+    return merge_processed_tables(pd.read_csv(pr_file, sep=",") for pr_file in pr_files)
+
+
+def merge_processed_files_streaming(pr_files, output_file):
+    """Merge processed files that are sorted by GravyScore (as 1-process-raw-tsv writes them).
+
+    Rows are merged on (GravyScore, GravySequence), so the output is sorted by that key and
+    each peptide appears once, with the same first/last rules and 0 -> empty as
+    merge_processed_tables. Only the rows sharing one GravyScore are held in memory.
+    """
+    headers = [_read_header(pr_file) for pr_file in pr_files]
+    sample_cols = list(dict.fromkeys(col for header in headers for col in header if is_sample_column(col)))
+    out_header = META_COLUMNS + sample_cols
+    out_position = {col: i for i, col in enumerate(out_header)}
+
+    files = [open(pr_file, "r", newline="") for pr_file in pr_files]
+    try:
+        streams = [_iter_sorted_rows(file, pr_file, out_position) for file, pr_file in zip(files, pr_files)]
+        # heapq.merge is stable, so rows with the same score come out in file order
+        merged = heapq.merge(*streams, key=lambda item: item[0])
+        with open(output_file, "w", newline="") as csvfile:
+            writer = csv.writer(csvfile)
+            writer.writerow(out_header)
+            for _, group in itertools.groupby(merged, key=lambda item: item[0]):
+                writer.writerows(_collapse_group(group, len(out_header)))
+    finally:
+        for file in files:
+            file.close()
+
+    return output_file
+
+
+def _read_header(pr_file):
+    with open(pr_file, "r", newline="") as file:
+        return next(csv.reader(file))
+
+
+def _iter_sorted_rows(file, pr_file, out_position):
+    reader = csv.reader(file)
+    header = next(reader)
+    key_index = header.index(KEY_COLUMN)
+    score_index = header.index("GravyScore")
+    charge_index = header.index("Precursor.Charge")
+    samples = [(i, out_position[col]) for i, col in enumerate(header) if is_sample_column(col)]
+
+    previous = -math.inf
+    for row in reader:
+        score = float(row[score_index]) if row[score_index] else math.nan
+        # Missing scores sort last, like sort_values does
+        key = math.inf if math.isnan(score) else score
+        if key < previous:
+            raise ValueError(f"{pr_file} is not sorted by GravyScore")
+        previous = key
+        values = [(position, "" if row[i] and float(row[i]) == 0 else row[i]) for i, position in samples]
+        yield key, row[key_index], row[score_index], row[charge_index], values
+
+
+def _collapse_group(group, width):
+    # All rows with one GravyScore: one output row per GravySequence, sorted by sequence
+    rows = {}
+    for _, sequence, score, charge, values in group:
+        out_row = rows.get(sequence)
+        if out_row is None:
+            out_row = [sequence, score, charge] + [""] * (width - 3)
+            rows[sequence] = out_row
+        for position, value in values:
+            out_row[position] = value
+    return [rows[sequence] for sequence in sorted(rows)]
@@ -0,0 +1,124 @@
+#Collapses the replicate columns of a wide intensity table (F_1.1, F_1.2, ... -> F_1).
+#The replicate block is gathered once into a peptide x condition x replicate array and the
+#mean, median, quartiles and detection counts of every condition are computed in one go.
+#A replicate counts as detected when its value is neither missing nor 0 (with nan_detected,
+#as in the 3-avg script, when it is not 0: a missing value counts as detected; with
+#zero_detected, as in Combined_shared, when it is not missing: 0 counts as detected).
+
+import numpy as np
+import pandas as pd
+
+# Replicates needed for a peptide to count as measured in a condition
+MIN_DETECTED = 3
+
+
+def replicate_condition(col):
+    # F_1.2 -> F_1
+    return col.rsplit(".", 1)[0]
+
+
+def group_replicates(columns, condition_of=replicate_condition):
+    """{condition: [replicate columns]} in order of first appearance."""
+    groups = {}
+    for col in columns:
+        groups.setdefault(condition_of(col), []).append(col)
+    return groups
+
+
+def replicate_cube(df, groups):
+    """Gather the replicate columns into a float array of shape (peptides, conditions, replicates).
+
+    Conditions with fewer replicates than the largest one are padded with NaN. A column may
+    belong to more than one condition. Returns (cube, replicate counts per condition).
+    """
+    columns = list(dict.fromkeys(col for cols in groups.values() for col in cols))
+    position = {col: i for i, col in enumerate(columns)}
+    n_replicates = np.array([len(cols) for cols in groups.values()], dtype=np.int64)
+
+    index = np.zeros((len(groups), n_replicates.max(initial=0)), dtype=np.int64)
+    padding = np.arange(index.shape[1]) >= n_replicates[:, None]
+    for i, cols in enumerate(groups.values()):
+        index[i, :len(cols)] = [position[col] for col in cols]
+
+    values = df[columns].to_numpy(dtype=float)
+    cube = values[:, index]
+    cube[:, padding] = np.nan
+    return cube, n_replicates
+
+
+def collapse_replicates(df, groups, min_detected=MIN_DETECTED, zero_as_missing=False, nan_detected=False,
+                        zero_detected=False):
+    """Per-condition statistics of the replicate columns of df, all conditions at once.
+
+    Returns a dict of peptide x condition DataFrames (index of df, one column per condition):
+    mean, median, q1, q3, detected (number of detected replicates), percent_detected and
+    passes (detected >= min_detected). Missing values are skipped; zeros take part in the
+    statistics unless zero_as_missing is set. nan_detected counts missing values as detected
+    (only 0 is not), the `!= 0` rule of 3-avg-replicas; zero_detected counts zeros as
+    detected (only missing values are not), the `notna()` rule of Combined_shared.
+    """
+    cube, n_replicates = replicate_cube(df, groups)
+    if nan_detected:
+        # Padding of conditions with fewer replicates is not a replicate
+        real = np.arange(cube.shape[2]) < n_replicates[:, None]
+        detected = ((cube != 0) & real).sum(axis=2)
+    elif zero_detected:
+        detected = (~np.isnan(cube)).sum(axis=2)
+    else:
+        detected = (~np.isnan(cube) & (cube != 0)).sum(axis=2)
+    if zero_as_missing:
+        cube[cube == 0] = np.nan
+
+    valid = ~np.isnan(cube)
+    counts = valid.sum(axis=2)
+    with np.errstate(invalid="ignore"):
+        mean = np.where(valid, cube, 0.0).sum(axis=2) / counts
+
+    # NaNs sort last, so the valid values of each cell are ordered[..., :count]
+    ordered = np.sort(cube, axis=2)
+    low = _take_sorted(ordered, (counts - 1) // 2)
+    high = _take_sorted(ordered, counts // 2)
+    median = (low + high) / 2
+    median[counts == 0] = np.nan
+
+    stats = {
+        "mean": mean,
+        "median": median,
+        "q1": _sorted_quantile(ordered, counts, 0.25),
+        "q3": _sorted_quantile(ordered, counts, 0.75),
+        "detected": detected,
+        "percent_detected": detected / n_replicates * 100,
+        "passes": detected >= min_detected,
+    }
+    conditions = pd.Index(list(groups))
+    return {name: pd.DataFrame(values, index=df.index, columns=conditions) for name, values in stats.items()}
+
+
+def mask_undetected(df, groups, min_detected=MIN_DETECTED, zero_detected=False):
+    """Copy of the replicate columns with every condition below min_detected set to NaN.
+
+    zero_detected counts zeros as detected replicates (see collapse_replicates).
+    """
+    passes = collapse_replicates(df, groups, min_detected, zero_detected=zero_detected)["passes"].to_numpy()
+    columns = [col for cols in groups.values() for col in cols]
+    condition_index = [i for i, cols in enumerate(groups.values()) for _ in cols]
+    return df[columns].where(passes[:, condition_index])
+
+
+def _take_sorted(ordered, positions):
+    positions = np.clip(positions, 0, max(ordered.shape[2] - 1, 0))
+    return np.take_along_axis(ordered, positions[..., None], axis=2)[..., 0]
+
+
+def _sorted_quantile(ordered, counts, q):
+    # Linear interpolation between the closest ranks, computed like numpy/pandas quantile
+    virtual = q * (counts - 1)
+    below = np.floor(virtual).astype(np.int64)
+    above = np.ceil(virtual).astype(np.int64)
+    gamma = virtual - below
+    a = _take_sorted(ordered, below)
+    b = _take_sorted(ordered, above)
+    diff = b - a
+    result = np.where(gamma >= 0.5, b - diff * (1 - gamma), a + diff * gamma)
+    result[counts == 0] = np.nan
+    return result
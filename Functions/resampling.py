@@ -0,0 +1,151 @@
+#Permutation tests and bootstrap confidence intervals, evaluated for all resamples at once.
+#The permutations / bootstrap draws are one integer index matrix (resamples x values) from a
+#seeded numpy Generator; the statistic is computed along the last axis of the gathered
+#matrix, so 10,000 resamples are a few array operations. chunk_size caps how many resamples
+#(rows of the index matrix) are held in memory at a time.
+
+import numpy as np
+
+N_RESAMPLES = 10000
+
+# Resamples evaluated per step (None = all at once)
+CHUNK_SIZE = 1000
+
+SEED = 0
+
+CONFIDENCE = 0.95
+
+
+def mean_difference(x, y, axis=-1):
+    return np.mean(x, axis=axis) - np.mean(y, axis=axis)
+
+
+def permutation_indices(rng, n, n_resamples):
+    """(n_resamples, n) matrix, every row a random permutation of range(n)."""
+    return rng.permuted(np.broadcast_to(np.arange(n), (n_resamples, n)), axis=1)
+
+
+def bootstrap_indices(rng, n, n_resamples):
+    """(n_resamples, n) matrix of draws with replacement from range(n)."""
+    return rng.integers(0, n, size=(n_resamples, n))
+
+
+def permutation_test(x, y, statistic=mean_difference, n_resamples=N_RESAMPLES, seed=SEED,
+                     chunk_size=CHUNK_SIZE, alternative="two-sided"):
+    """(observed statistic, permutation p-value) of two independent samples.
+
+    statistic(x, y, axis=-1) must reduce the last axis. The p-value counts the permuted
+    statistics at least as extreme as the observed one, plus the observed one itself.
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    observed = statistic(x, y, axis=-1)
+    pooled = np.concatenate([x, y])
+    rng = np.random.default_rng(seed)
+
+    extreme = 0
+    for size in _chunks(n_resamples, chunk_size):
+        resampled = pooled[permutation_indices(rng, len(pooled), size)]
+        null = statistic(resampled[:, :len(x)], resampled[:, len(x):], axis=-1)
+        if alternative == "two-sided":
+            extreme += np.count_nonzero(np.abs(null) >= np.abs(observed))
+        elif alternative == "greater":
+            extreme += np.count_nonzero(null >= observed)
+        elif alternative == "less":
+            extreme += np.count_nonzero(null <= observed)
+        else:
+            raise ValueError(f"Unknown alternative: {alternative}")
+    return observed, (extreme + 1) / (n_resamples + 1)
+
+
+def bootstrap_ci(values, statistic=np.mean, n_resamples=N_RESAMPLES, confidence=CONFIDENCE,
+                 seed=SEED, chunk_size=CHUNK_SIZE):
+    """(estimate, low, high): statistic(values, axis=-1) with its percentile bootstrap interval."""
+    values = np.asarray(values, dtype=float)
+    rng = np.random.default_rng(seed)
+    replicates = np.concatenate([statistic(values[bootstrap_indices(rng, len(values), size)], axis=-1)
+                                 for size in _chunks(n_resamples, chunk_size)])
+    return (statistic(values, axis=-1),) + _percentile_interval(replicates, confidence)
+
+
+def bootstrap_difference_ci(x, y, statistic=mean_difference, n_resamples=N_RESAMPLES,
+                            confidence=CONFIDENCE, seed=SEED, chunk_size=CHUNK_SIZE):
+    """(estimate, low, high) of a two-sample statistic, resampling both samples independently."""
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    rng = np.random.default_rng(seed)
+    replicates = np.concatenate([
+        statistic(x[bootstrap_indices(rng, len(x), size)], y[bootstrap_indices(rng, len(y), size)], axis=-1)
+        for size in _chunks(n_resamples, chunk_size)])
+    return (statistic(x, y, axis=-1),) + _percentile_interval(replicates, confidence)
+
+
+def grouped_bootstrap_mean_ci(values, codes, num_groups, n_resamples=N_RESAMPLES,
+                              confidence=CONFIDENCE, seed=SEED, chunk_size=CHUNK_SIZE):
+    """(mean, low, high) arrays per group (e.g. GRAVY bin codes), all groups in one draw.
+
+    Every resample redraws the values of each group from that group only; missing values
+    and rows with code -1 are left out. Groups without values get NaN.
+    """
+    values = np.asarray(values, dtype=float)
+    codes = np.asarray(codes)
+    keep = (codes >= 0) & ~np.isnan(values)
+    order = np.flatnonzero(keep)[np.argsort(codes[keep], kind="stable")]
+    ordered = values[order]
+    sizes = np.bincount(codes[order], minlength=num_groups)
+    starts = np.concatenate(([0], np.cumsum(sizes)[:-1]))
+
+    # Position j is redrawn uniformly from the rows of its own group
+    group_of = np.repeat(np.arange(num_groups), sizes)
+    row_start = starts[group_of]
+    row_size = sizes[group_of]
+
+    rng = np.random.default_rng(seed)
+    means = []
+    for size in _chunks(n_resamples, chunk_size):
+        draws = row_start + (rng.random((size, len(ordered))) * row_size).astype(np.int64)
+        means.append(_segment_means(ordered[draws], starts, sizes))
+    means = np.concatenate(means)
+
+    low = np.full(num_groups, np.nan)
+    high = np.full(num_groups, np.nan)
+    non_empty = sizes > 0
+    low[non_empty], high[non_empty] = _percentile_interval(means[:, non_empty], confidence)
+    return _segment_means(ordered[None, :], starts, sizes)[0], low, high
+
+
+def column_bootstrap_ci(matrix, statistic, n_resamples=N_RESAMPLES, confidence=CONFIDENCE,
+                        seed=SEED, chunk_size=CHUNK_SIZE):
+    """(estimate, low, high) per row of a statistic of a rows x replicates matrix.
+
+    The replicate columns are resampled; statistic(resampled) gets an array of shape
+    (resamples, rows, replicates) and returns (resamples, rows).
+    """
+    matrix = np.asarray(matrix, dtype=float)
+    rng = np.random.default_rng(seed)
+    replicates = np.concatenate([
+        statistic(np.moveaxis(matrix[:, bootstrap_indices(rng, matrix.shape[1], size)], 1, 0))
+        for size in _chunks(n_resamples, chunk_size)])
+    return (statistic(matrix[None])[0],) + _percentile_interval(replicates, confidence)
+
+
+def _chunks(n_resamples, chunk_size):
+    chunk_size = chunk_size or n_resamples
+    for start in range(0, n_resamples, chunk_size):
+        yield min(chunk_size, n_resamples - start)
+
+
+def _percentile_interval(replicates, confidence):
+    tail = (1 - confidence) / 2 * 100
+    low, high = np.percentile(replicates, [tail, 100 - tail], axis=0)
+    return low, high
+
+
+def _segment_means(values, starts, sizes):
+    # Mean of every group along the last axis; empty groups are NaN
+    sums = np.zeros(values.shape[:-1] + (len(sizes),))
+    non_empty = sizes > 0
+    if non_empty.any():
+        sums[..., non_empty] = np.add.reduceat(values, starts[non_empty], axis=-1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return sums / sizes
@@ -0,0 +1,202 @@
+#Small task graph for analysis scripts that compute several outputs from the same inputs.
+#Tasks run in a thread pool as soon as their dependencies are done. With a cache folder each
+#result is pickled under a key built from the task, its code and the keys of its inputs, so
+#re-running the graph only recomputes tasks whose inputs (or code) changed. The code of a task
+#is its function plus every function and class of the analysis code (anything outside the
+#Python and site-packages folders) that it refers to by a global name, followed recursively.
+
+import hashlib
+import os
+import pickle
+import sys
+import sysconfig
+import types
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+
+def file_hash(path, chunk_size=1 << 20):
+    """sha256 of a file's contents, to use as the key of a task that loads it."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class TaskGraph:
+    """Named tasks with dependencies; run(targets) returns {target: result}.
+
+    add(name, func, deps, key): func is called with the results of deps, in order. key is any
+    extra input that should invalidate the cache (a file hash, a setting). Tasks with
+    cache=False (e.g. loading an input) are never stored and only run when a task that
+    needs them is not cached.
+    """
+
+    def __init__(self, cache_dir=None, max_workers=None):
+        self.cache_dir = cache_dir
+        self.max_workers = max_workers
+        self.tasks = {}
+
+    def add(self, name, func, deps=(), key="", cache=True):
+        self.tasks[name] = (func, tuple(deps), str(key), cache)
+
+    def run(self, targets=None):
+        targets = list(self.tasks) if targets is None else list(targets)
+        keys = {}
+        for name in self._dependency_order(targets):
+            func, deps, key, _ = self.tasks[name]
+            digest = hashlib.sha256(name.encode())
+            digest.update(key.encode())
+            digest.update(_code_fingerprint(func))
+            for dep in deps:
+                digest.update(keys[dep].encode())
+            keys[name] = digest.hexdigest()[:16]
+
+        # Load what is cached; everything else (and what it depends on) has to run
+        results = {}
+        pending = set()
+
+        def require(name):
+            if name in results or name in pending:
+                return
+            cached = self._load(name, keys[name])
+            if cached is not None:
+                results[name] = cached[0]
+                return
+            pending.add(name)
+            for dep in self.tasks[name][1]:
+                require(dep)
+
+        for name in targets:
+            require(name)
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            running = {}
+            while pending or running:
+                ready = [name for name in pending if all(dep in results for dep in self.tasks[name][1])]
+                if not ready and not running:
+                    raise ValueError(f"Tasks with unresolved dependencies: {sorted(pending)}")
+                for name in ready:
+                    pending.remove(name)
+                    func, deps, _, _ = self.tasks[name]
+                    running[executor.submit(func, *[results[dep] for dep in deps])] = name
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    results[name] = future.result()
+                    self._store(name, keys[name], results[name])
+
+        return {name: results[name] for name in targets}
+
+    def _dependency_order(self, targets):
+        order = []
+        seen = set()
+
+        def visit(name):
+            if name in seen:
+                return
+            if name not in self.tasks:
+                raise KeyError(f"Unknown task: {name}")
+            seen.add(name)
+            for dep in self.tasks[name][1]:
+                visit(dep)
+            order.append(name)
+
+        for name in targets:
+            visit(name)
+        return order
+
+    def _cache_file(self, name, key):
+        return os.path.join(self.cache_dir, f"{name}-{key}.pkl")
+
+    def _load(self, name, key):
+        if self.cache_dir is None or not self.tasks[name][3]:
+            return None
+        try:
+            with open(self._cache_file(name, key), "rb") as file:
+                return (pickle.load(file),)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            return None
+
+    def _store(self, name, key, result):
+        if self.cache_dir is None or not self.tasks[name][3]:
+            return
+        os.makedirs(self.cache_dir, exist_ok=True)
+        # Drop results of older inputs of this task, then write atomically
+        for filename in os.listdir(self.cache_dir):
+            if filename.startswith(f"{name}-") and filename.endswith(".pkl"):
+                os.remove(os.path.join(self.cache_dir, filename))
+        path = self._cache_file(name, key)
+        with open(path + ".tmp", "wb") as file:
+            pickle.dump(result, file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(path + ".tmp", path)
+
+
+def _code_fingerprint(func):
+    # Editing a task function, or a function or class of the analysis code it uses (helpers
+    # called from a lambda included), invalidates its cached results
+    func = getattr(func, "func", func)
+    return b"\0".join(_fingerprints(func, set()))
+
+
+def _fingerprints(obj, seen):
+    if id(obj) in seen:
+        return []
+    seen.add(id(obj))
+    if isinstance(obj, type):
+        parts = [obj.__qualname__.encode()]
+        for value in vars(obj).values():
+            value = getattr(value, "__func__", value)  # staticmethod, classmethod
+            if isinstance(value, types.FunctionType):
+                parts += _fingerprints(value, seen)
+        return parts
+
+    code = getattr(obj, "__code__", None)
+    if code is None:
+        return [getattr(obj, "__qualname__", repr(obj)).encode()]
+    parts = [_code_bytes(code)]
+    global_values = getattr(obj, "__globals__", {})
+    for name in sorted(_global_names(code)):
+        value = global_values.get(name)
+        if _is_analysis_code(value):
+            parts += _fingerprints(value, seen)
+    return parts
+
+
+def _global_names(code):
+    names = set(code.co_names)
+    for const in code.co_consts:
+        if isinstance(const, types.CodeType):
+            names |= _global_names(const)
+    return names
+
+
+def _library_paths():
+    paths = sysconfig.get_paths()
+    return tuple(os.path.normcase(os.path.abspath(paths[key]))
+                 for key in ("stdlib", "platstdlib", "purelib", "platlib") if key in paths)
+
+
+_LIBRARY_PATHS = _library_paths()
+
+
+def _is_analysis_code(value):
+    # Functions and classes defined in the project's own files (not Python, numpy, pandas, ...)
+    if isinstance(value, types.FunctionType):
+        filename = value.__code__.co_filename
+    elif isinstance(value, type):
+        filename = getattr(sys.modules.get(value.__module__), "__file__", None)
+    else:
+        return False
+    if not filename or filename.startswith("<"):
+        # Defined interactively or by exec: part of the analysis, not of a library
+        return isinstance(value, types.FunctionType)
+    return not os.path.normcase(os.path.abspath(filename)).startswith(_LIBRARY_PATHS)
+
+
+def _code_bytes(code):
+    # Nested code objects (lambdas, comprehensions) are fingerprinted too, not by their repr
+    parts = [code.co_code]
+    for const in code.co_consts:
+        parts.append(_code_bytes(const) if isinstance(const, types.CodeType) else repr(const).encode())
+    return b"\0".join(parts)
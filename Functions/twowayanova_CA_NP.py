@@ -3,11 +3,11 @@ import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
 import seaborn as sns
-import statsmodels.api as sm
-from statsmodels.formula.api import ols
 from tkinter import Tk
 from tkinter.filedialog import askopenfilename
 
+from Functions.factorial_anova import anova_table as factorial_anova_table
+
 # 📂 Ask user to select the Excel file
 Tk().withdraw()
 file_path = askopenfilename(title="Select the Excel file", filetypes=[("Excel files", "*.xlsx")])
@@ -32,8 +32,7 @@ df_melted["Nanostructure"] = df_melted["Condition"].str.extract(r'(\d+)').astype
 df_melted["Surface_Type"] = df_melted["Condition"].apply(lambda x: "F" if x.startswith("F_") else "R")
 
 # 🎯 Fit Two-Way ANOVA model
-anova_model = ols('Measurement ~ C(Surface_Type) + C(Nanostructure) + C(Surface_Type):C(Nanostructure)', data=df_melted).fit()
-anova_table = sm.stats.anova_lm(anova_model, typ=2)
+anova_table = factorial_anova_table(df_melted, "Measurement", ["Surface_Type", "Nanostructure"])
 
 # 🎨 Visualizing p-values with a Heatmap
 anova_pvals = anova_table["PR(>F)"].to_frame().rename(columns={"PR(>F)": "p-value"})
@@ -1,6 +1,6 @@
 # Loads Precursor Abundance data from an Excel file.
 # Extracts factors (Position, Load, ACN/NoACN) from sheet names.
-# Computes Sum and Mean Precursor Abundance by GRAVY bins (0.05 step).
+# Computes Sum and Mean Precursor Abundance by GRAVY bins (0.05 step, same bins for all sheets).
 # Runs Three-Way ANOVA and Tukey HSD for ACN vs NoACN.
 # Generates Boxplots for visual comparison.
 
@@ -9,10 +9,10 @@ import numpy as np
 import seaborn as sns
 import matplotlib.pyplot as plt
 import tkinter as tk
+import os
 from tkinter import filedialog
-import statsmodels.api as sm
-import statsmodels.formula.api as smf
-from statsmodels.stats.multicomp import pairwise_tukeyhsd
+from Functions.factorial_anova import anova_table, tukey_hsd
+from Functions.gravy_binning import GravyBinIndex
 
 # === Step 1: Load Data ===
 root = tk.Tk()
@@ -23,14 +23,16 @@ xls = pd.ExcelFile(file_path)
 
 # === Step 2: Extract Precursor Abundance & Conditions ===
 bin_size = 0.05
-gravy_bin_data = []
+gravy_bin_tables = []
 
-for sheet in xls.sheet_names:
-    df_sheet = pd.read_excel(xls, sheet_name=sheet)
+sheets = {sheet: pd.read_excel(xls, sheet_name=sheet) for sheet in xls.sheet_names}
+sheets = {sheet: df_sheet for sheet, df_sheet in sheets.items() if "GRAVY_without_mod" in df_sheet.columns}
 
-    if "GRAVY_without_mod" not in df_sheet.columns:
-        continue
+# One set of GRAVY bins (bin_size steps) for all sheets, shared with other scripts on this folder
+bin_index = GravyBinIndex.shared(os.path.dirname(file_path), *(df_sheet["GRAVY_without_mod"] for df_sheet in sheets.values()),
+                                step=bin_size)
 
+for sheet, df_sheet in sheets.items():
     # Parse conditions from sheet name
     parts = sheet.split("_")
     position = parts[0]  # 3.2, 3.5, 5.5
@@ -42,7 +44,8 @@ for sheet in xls.sheet_names:
     df_sheet["Total_Abundance"] = df_sheet[abundance_columns].sum(axis=1, skipna=True)
 
     # Bin GRAVY scores
-    df_sheet["GRAVY_Bin"] = (df_sheet["GRAVY_without_mod"] / bin_size).round() * bin_size
+    bin_codes = bin_index.codes(df_sheet["GRAVY_without_mod"])
+    df_sheet["GRAVY_Bin"] = np.where(bin_codes >= 0, bin_index.starts[bin_codes].round(2), np.nan)
 
     # Compute Sum and Mean abundance per GRAVY bin
     bin_summary = df_sheet.groupby("GRAVY_Bin").agg(
@@ -50,30 +53,19 @@ for sheet in xls.sheet_names:
         Mean_Abundance=("Total_Abundance", "mean")
     ).reset_index()
 
-    for _, row in bin_summary.iterrows():
-        gravy_bin_data.append({
-            "GRAVY_Bin": row["GRAVY_Bin"],
-            "Position": position,
-            "Load": load,
-            "ACN_Status": acn_status,
-            "Sum_Abundance": row["Sum_Abundance"],
-            "Mean_Abundance": row["Mean_Abundance"],
-        })
+    gravy_bin_tables.append(bin_summary.assign(Position=position, Load=load, ACN_Status=acn_status))
 
-df_gravy_bins = pd.DataFrame(gravy_bin_data)
+df_gravy_bins = pd.concat(gravy_bin_tables, ignore_index=True)[
+    ["GRAVY_Bin", "Position", "Load", "ACN_Status", "Sum_Abundance", "Mean_Abundance"]]
 
 # === Step 3: ANOVA on Precursor Abundance ===
-anova_model = smf.ols("Mean_Abundance ~ C(ACN_Status) * C(Position) * C(Load)", data=df_gravy_bins).fit()
-anova_results = sm.stats.anova_lm(anova_model, typ=2)
+anova_results = anova_table(df_gravy_bins, "Mean_Abundance", ["ACN_Status", "Position", "Load"])
 print("\n=== ANOVA Results ===\n", anova_results)
 
-# === Step 4: Tukey HSD for ACN vs NoACN per Position ===
-for position in df_gravy_bins["Position"].unique():
-    subset = df_gravy_bins[df_gravy_bins["Position"] == position]
-
-    if subset["ACN_Status"].nunique() > 1:
-        tukey = pairwise_tukeyhsd(subset["Mean_Abundance"], subset["ACN_Status"])
-        print(f"\n=== Tukey HSD (Position {position}) ===\n", tukey.summary())
+# === Step 4: Tukey HSD for ACN vs NoACN per Position (all positions in one call) ===
+tukey_results = tukey_hsd(df_gravy_bins, "Mean_Abundance", "ACN_Status", by="Position")
+for position, tukey in tukey_results.groupby("Position", sort=False):
+    print(f"\n=== Tukey HSD (Position {position}) ===\n", tukey.drop(columns="Position").to_string(index=False))
 
 # === Step 5: Visualize Data ===
 fig, axes = plt.subplots(1, 2, figsize=(14, 6))
@@ -1,11 +1,11 @@
 import pandas as pd
-import numpy as np
 import matplotlib.pyplot as plt
 import seaborn as sns
 import tkinter as tk
 from tkinter import filedialog
 import os
 from matplotlib.colors import SymLogNorm
+from Functions.gravy_binning import GravyBinIndex
 
 # -------------------------------
 # 1. Tkinter helpers
@@ -45,23 +45,18 @@ for fp in file_paths:
     dfs.append(df)
 
 # -------------------------------
-# 3. Global binning (min/max across all CSVs)
+# 3. Global binning (min/max across all CSVs, kept in their folder)
 # -------------------------------
-global_min = min(df.index.min() for df in dfs)
-global_max = max(df.index.max() for df in dfs)
-
 num_bins = 50  # Adjust as needed
-bin_edges = np.linspace(global_min, global_max, num_bins + 1)
-bin_labels = [f"{round(edge, 1)}" for edge in bin_edges[:-1]]
+bin_index = GravyBinIndex.shared(os.path.dirname(file_paths[0]), *(df.index for df in dfs), num_bins=num_bins)
+bin_labels = bin_index.start_labels(1)
 
 # -------------------------------
 # 4. Bin each DataFrame & aggregate (keep all numeric columns)
 # -------------------------------
 binned_dfs = []
 for df in dfs:
-    df["GravyScore_bin"] = pd.cut(
-        df.index, bins=bin_edges, labels=bin_labels, include_lowest=True
-    )
+    df["GravyScore_bin"] = bin_index.categorical(df.index, bin_labels)
     # Group by bin and average all numeric columns
     df_grouped = df.groupby("GravyScore_bin", observed=True).sum(numeric_only=True)
     binned_dfs.append(df_grouped)
@@ -1,5 +1,4 @@
 import pandas as pd
-import numpy as np
 import matplotlib.pyplot as plt
 import seaborn as sns
 import tkinter as tk
@@ -7,6 +6,7 @@ from tkinter import filedialog
 import os
 import re
 from matplotlib.colors import SymLogNorm
+from Functions.gravy_binning import GravyBinIndex
 
 
 # Function to load multiple files using Tkinter
@@ -88,17 +88,14 @@ for file in file_paths:
     df_processed = process_replicates(df)  # Apply replicate summing
     dfs.append(df_processed)
 
-# Find global min & max across all datasets
-global_min = min(df.index.min() for df in dfs)
-global_max = max(df.index.max() for df in dfs)
-
-# Define bins that work for all datasets
+# Define bins that work for all datasets (global min & max across all datasets, kept in their folder)
 num_bins = 50  # Adjust bin size if needed
-bin_edges = np.linspace(global_min, global_max, num_bins + 1)
+bin_index = GravyBinIndex.shared(os.path.dirname(file_paths[0]), *(df.index for df in dfs), num_bins=num_bins)
+bin_labels = bin_index.start_labels(1)
 
 # Apply binning to all datasets
 for i, df in enumerate(dfs):
-    df["GravyScore_bin"] = pd.cut(df.index, bins=bin_edges, labels=[f"{round(edge, 1)}" for edge in bin_edges[:-1]])
+    df["GravyScore_bin"] = bin_index.categorical(df.index, bin_labels)
     dfs[i] = df.groupby("GravyScore_bin", observed=True).sum()
 
 # Merge all datasets based on bins
@@ -1,9 +1,10 @@
 import pandas as pd
-import scipy.stats as stats
 import tkinter as tk
 from tkinter import filedialog, messagebox
 import re
 
+from Functions.hypothesis_tests import column_samples, pairwise_tests
+
 def select_file():
     """Open file dialog to select the raw dataset."""
     root = tk.Tk()
@@ -61,35 +62,27 @@ def analyze_data(file_path):
         df_means = df_numeric.groupby(df_raw.index.map(extract_condition)).mean()
 
         # Identify "Evo" and other conditions
-        if "Evo" in df_means.index:
-            evo_values = df_means.loc["Evo"]
-        else:
+        if "Evo" not in df_means.index:
             messagebox.showerror("Error", "Evo not found in dataset. Please check your dataset.")
             return
 
-        # Store test results
-        test_results_list = []
-
-        # Loop through all other conditions and compare with Evo
-        for condition in df_means.index:
-            if condition != "Evo":
-                condition_values = df_means.loc[condition]
+        # Compare every other condition with Evo: KS and Mann-Whitney U for all pairs in one call
+        conditions = [condition for condition in df_means.index if condition != "Evo"]
+        samples = column_samples(df_means.T)
+        tests = pairwise_tests(samples, [("Evo", condition) for condition in conditions], tests=("ks", "mannwhitney"))
 
-                # Kolmogorov-Smirnov Test
-                ks_stat, ks_pvalue = stats.ks_2samp(evo_values, condition_values)
-
-                # Mann-Whitney U Test
-                mw_stat, mw_pvalue = stats.mannwhitneyu(evo_values, condition_values, alternative="two-sided")
-
-                # Append results
-                test_results_list.append({
-                    "Comparison": f"Evo vs. {condition}",
-                    "KS Statistic": ks_stat,
-                    "KS p-value": ks_pvalue,
-                    "MW Statistic": mw_stat,
-                    "MW p-value": mw_pvalue,
-                    "Conclusion": "Significant difference (p < 0.05)" if ks_pvalue < 0.05 or mw_pvalue < 0.05 else "No significant difference"
-                })
+        test_results_list = []
+        for condition, row in zip(conditions, tests.itertuples(index=False)):
+            test_results_list.append({
+                "Comparison": f"Evo vs. {condition}",
+                "KS Statistic": row.ks_stat,
+                "KS p-value": row.ks_p,
+                "MW Statistic": row.mannwhitney_stat,
+                "MW p-value": row.mannwhitney_p,
+                "Conclusion": "Significant difference (p < 0.05)" if row.ks_p < 0.05 or row.mannwhitney_p < 0.05 else "No significant difference",
+                "KS q-value (BH)": row.ks_q,
+                "MW q-value (BH)": row.mannwhitney_q
+            })
 
         # Convert results to a DataFrame
         pairwise_test_results = pd.DataFrame(test_results_list)
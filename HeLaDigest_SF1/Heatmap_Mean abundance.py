@@ -27,7 +27,7 @@ df = pd.read_excel(file_path, sheet_name="Mean_Abundance")
 # --- Parse QC and sample data ---
 abundance_long = df.melt(id_vars="GRAVY_bin", var_name="Condition", value_name="Abundance")
 abundance_long = abundance_long[abundance_long["Abundance"].notna()]
-abundance_long = abundance_long[~abundance_long["Condition"].str.contains("SEM")]
+abundance_long = abundance_long[~abundance_long["Condition"].str.contains("SEM|_CI_")]
 
 # Extract sample metadata safely
 def parse_meta(row):
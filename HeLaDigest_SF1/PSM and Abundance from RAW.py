@@ -1,21 +1,13 @@
 import pandas as pd
-import numpy as np
 import os
 from tkinter import Tk, filedialog
-from tqdm import tqdm
+from Functions.pr_matrix_cache import read_bin_codes
+from Functions.pr_matrix_ingest import find_pr_matrix_files, ingest_pr_matrices
+from Functions.gravy_binning import GravyBinIndex
+from Functions.resampling import column_bootstrap_ci, grouped_bootstrap_mean_ci
 
-# Kyte & Doolittle hydropathy index
-hydropathy_index = {
-    'A': 1.8, 'R': -4.5, 'N': -3.5, 'D': -3.5, 'C': 2.5,
-    'Q': -3.5, 'E': -3.5, 'G': -0.4, 'H': -3.2, 'I': 4.5,
-    'L': 3.8, 'K': -3.9, 'M': 1.9, 'F': 2.8, 'P': -1.6,
-    'S': -0.8, 'T': -0.7, 'W': -0.9, 'Y': -1.3, 'V': 4.2
-}
-
-
-def calculate_gravy(sequence):
-    values = [hydropathy_index.get(aa, 0) for aa in sequence]
-    return sum(values) / len(values) if values else np.nan
+# Worker processes for reading the pr_matrix files (None = all cores)
+MAX_WORKERS = None
 
 def extract_clean_sample_name(col_path):
     base = os.path.basename(col_path).replace(".raw", "")
@@ -27,21 +19,6 @@ def extract_clean_sample_name(col_path):
     surface = parts[-4].replace("F", "") if parts[-4].startswith("F") else parts[-4]
     return f"{surface}_{parts[-3]}_{parts[-2]}_{parts[-1][-1]}"
 
-def load_pr_matrix_files(folder):
-    pr_files = []
-    for root, _, files in os.walk(folder):
-        for file in files:
-            if file == "report.pr_matrix.tsv":
-                pr_files.append(os.path.join(root, file))
-    return pr_files
-
-def bin_gravy_column(gravy_values, bin_size=0.05):
-    min_bin = np.floor(min(gravy_values) * 20) / 20
-    max_bin = np.ceil(max(gravy_values) * 20) / 20
-    bins = np.arange(min_bin, max_bin + bin_size, bin_size)
-    labels = [f"{round(bins[i], 3)} to {round(bins[i+1], 3)}" for i in range(len(bins) - 1)]
-    return bins, labels
-
 def main():
     root = Tk()
     root.withdraw()
@@ -50,7 +27,7 @@ def main():
         print("❌ No folder selected.")
         return
 
-    pr_files = load_pr_matrix_files(selected_dir)
+    pr_files = find_pr_matrix_files(selected_dir)
 
     raw_abundance_dict = {}
     gravy_sorted_abundance_dict = {}
@@ -58,31 +35,20 @@ def main():
     psm_percent_dict = {}
     all_gravy = []
 
-    for pr_file in tqdm(pr_files, desc="Processing .tsv files"):
-        df = pd.read_csv(pr_file, sep="\t")
-        if 'Stripped.Sequence' not in df.columns:
-            continue
-        df["GRAVY"] = df["Stripped.Sequence"].apply(calculate_gravy)
+    # Read, add GRAVY and rename samples for every file in parallel
+    ingested = ingest_pr_matrices(pr_files, sample_name=extract_clean_sample_name, max_workers=MAX_WORKERS)
+    for base_name, df in ingested.items():
         all_gravy.extend(df["GRAVY"].dropna().tolist())
+        raw_abundance_dict[base_name] = df
 
-        raw_cols = [col for col in df.columns if col.endswith(".raw")]
-        sample_map = {col: extract_clean_sample_name(col) for col in raw_cols}
-        sample_map = {k: v for k, v in sample_map.items() if v is not None}
-        if not sample_map:
-            continue
-
-        df.rename(columns=sample_map, inplace=True)
-        samples = list(sample_map.values())
-        df["PSM_Like_Count"] = df[samples].notna().sum(axis=1)
-        base_name = os.path.basename(os.path.dirname(pr_file))
-        raw_abundance_dict[base_name] = df[["Stripped.Sequence", "GRAVY", "Precursor.Charge"] + samples]
-
-    # Bin GRAVY globally
-    gravy_bins, gravy_labels = bin_gravy_column(all_gravy)
+    # Bin GRAVY globally on the folder's shared bins (codes cached with each pr_matrix)
+    bin_index = GravyBinIndex.shared(selected_dir, all_gravy, step=0.05)
+    gravy_labels = bin_index.range_labels()
 
     # Gravy Binned Abundance and PSM Calculation
     for name, df in raw_abundance_dict.items():
-        df["GRAVY_bin"] = pd.cut(df["GRAVY"], bins=gravy_bins, labels=gravy_labels, include_lowest=True)
+        bin_codes = read_bin_codes(df.attrs["pr_file"], bin_index, df["GRAVY"])
+        df["GRAVY_bin"] = pd.Categorical.from_codes(bin_codes, categories=gravy_labels, ordered=True)
         data_cols = df.columns[3:-1]
         non_empty_cols = df[data_cols].columns[df[data_cols].notna().any()]
         df = df[["GRAVY_bin"] + list(non_empty_cols)]
@@ -105,11 +71,8 @@ def main():
     for name, df in raw_abundance_dict.items():
         print(f"\n▶ Starting {name}")
 
-        # Recalculate GRAVY
-        df["GRAVY"] = df["Stripped.Sequence"].apply(calculate_gravy)
-
         # Use global GRAVY bin consistently
-        df["GRAVY_bin"] = pd.cut(df["GRAVY"], bins=gravy_bins, labels=gravy_labels, include_lowest=True).astype(str)
+        df["GRAVY_bin"] = df["GRAVY_bin"].astype(str)
 
         # Drop index if needed
         df = df.reset_index(drop=True)
@@ -122,10 +85,13 @@ def main():
         df_filtered = df[["GRAVY_bin"] + list(valid_cols)]
         assert df_filtered.columns.duplicated().sum() == 0, "Duplicate column detected!"
 
-        # Safe groupby
-        grouped_abund = df_filtered.groupby("GRAVY_bin", observed=True)
-        mean_abund = grouped_abund[valid_cols].apply(lambda x: x.fillna(0).mean(), axis=1)
-        sem_abund = grouped_abund[valid_cols].std(ddof=1).fillna(0) / np.sqrt(grouped_abund[valid_cols].count())
+        # Safe groupby (missing abundances count as 0)
+        abundances = df_filtered[valid_cols].fillna(0)
+        mean_abund = abundances.groupby(df_filtered["GRAVY_bin"], observed=True).mean()
+
+        # Bootstrap CI of each bin's mean abundance, resampling the peptides of the bin
+        bin_codes = pd.Categorical(df_filtered["GRAVY_bin"], categories=mean_abund.index).codes
+        _, ci_low, ci_high = grouped_bootstrap_mean_ci(abundances.mean(axis=1).to_numpy(), bin_codes, len(mean_abund))
 
         # Safe zero count
         temp = df_filtered.assign(GRAVY_bin_label=df_filtered["GRAVY_bin"])
@@ -134,7 +100,8 @@ def main():
         summary_abund = pd.DataFrame({
             "GRAVY_bin": mean_abund.index,
             f"{name}_Mean": mean_abund.mean(axis=1).values,
-            f"{name}_SEM": sem_abund.mean(axis=1).values,
+            f"{name}_CI_low": ci_low,
+            f"{name}_CI_high": ci_high,
             f"{name}_ZeroCount": zero_count_abund.values
         })
         mean_abundance_records.append(summary_abund)
@@ -150,9 +117,11 @@ def main():
             grand_total_counts = total_counts_per_bin.sum()
 
             mean_psm_global = (total_counts_per_bin / grand_total_counts) * 100
-            sem_psm_global = (df_counts.div(df_counts.sum(axis=0), axis=1)
-                              .std(axis=1, ddof=1)
-                              .div(np.sqrt(df_counts.shape[1])) * 100)
+
+            # Bootstrap CI of the global %PSM, resampling the replicates
+            _, psm_ci_low, psm_ci_high = column_bootstrap_ci(
+                df_counts.to_numpy(dtype=float),
+                lambda counts: counts.sum(axis=-1) / counts.sum(axis=(-2, -1))[..., None] * 100)
 
             zero_count_psm_global = df_counts.isna().sum(axis=1)
 
@@ -160,7 +129,8 @@ def main():
             summary_psm_global = pd.DataFrame({
                 "GRAVY_bin": df_counts.index,
                 f"{name}_Global_%PSM_Mean": mean_psm_global.values,
-                f"{name}_Global_%PSM_SEM": sem_psm_global.values,
+                f"{name}_Global_%PSM_CI_low": psm_ci_low,
+                f"{name}_Global_%PSM_CI_high": psm_ci_high,
                 f"{name}_Global_%PSM_ZeroCount": zero_count_psm_global.values
             })
 
@@ -3,18 +3,7 @@ import numpy as np
 import os
 from tqdm import tqdm
 from tkinter import Tk, filedialog
-
-# Kyte & Doolittle hydropathy index
-hydropathy_index = {
-    'A': 1.8, 'R': -4.5, 'N': -3.5, 'D': -3.5, 'C': 2.5,
-    'Q': -3.5, 'E': -3.5, 'G': -0.4, 'H': -3.2, 'I': 4.5,
-    'L': 3.8, 'K': -3.9, 'M': 1.9, 'F': 2.8, 'P': -1.6,
-    'S': -0.8, 'T': -0.7, 'W': -0.9, 'Y': -1.3, 'V': 4.2
-}
-
-def calculate_gravy(sequence):
-    aa_values = [hydropathy_index.get(aa, 0) for aa in sequence]
-    return sum(aa_values) / len(sequence) if sequence else np.nan
+from Functions.peptide_store import PeptideStore
 
 def find_pr_matrix_files(root_folder):
     pr_files = []
@@ -59,13 +48,15 @@ def analyze_gravy_psm():
     gravy_abundance_summary = {}
     all_gravy = []
 
+    # GRAVY comes from the shared peptide store; only unseen peptides are computed
+    store = PeptideStore()
     for file_path in tqdm(pr_files, desc="Processing files"):
         try:
             df = pd.read_csv(file_path, sep='\t')
             if 'Stripped.Sequence' not in df.columns:
                 continue
 
-            df["GRAVY"] = df["Stripped.Sequence"].apply(calculate_gravy)
+            df["GRAVY"] = store.gravy(df["Stripped.Sequence"], decimals=None)
 
             # Identify and rename sample columns
             sample_cols_raw = [col for col in df.columns if col.endswith(".raw")]
@@ -91,6 +82,7 @@ def analyze_gravy_psm():
             peptide_psm_summary[subfolder_name] = (df, sample_cols, qc_exp002_cols)
         except Exception as e:
             print(f"Error processing {file_path}: {e}")
+    store.close()
 
     # Global GRAVY bins
     min_gravy = np.floor(min(all_gravy) * 20) / 20
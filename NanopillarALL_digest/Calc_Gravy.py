@@ -4,29 +4,11 @@
 
 
 import pandas as pd
-import numpy as np
-import os
 from tkinter import Tk, filedialog
+from Functions.pr_matrix_ingest import find_pr_matrix_files, ingest_pr_matrices
 
-# Kyte & Doolittle hydropathy index
-hydropathy_index = {
-    'A': 1.8,  'R': -4.5, 'N': -3.5, 'D': -3.5, 'C': 2.5,
-    'Q': -3.5, 'E': -3.5, 'G': -0.4, 'H': -3.2, 'I': 4.5,
-    'L': 3.8,  'K': -3.9, 'M': 1.9,  'F': 2.8,  'P': -1.6,
-    'S': -0.8, 'T': -0.7, 'W': -0.9, 'Y': -1.3, 'V': 4.2
-}
-
-def calculate_gravy(sequence):
-    aa_values = [hydropathy_index.get(aa, 0) for aa in sequence]
-    return sum(aa_values) / len(sequence) if sequence else np.nan
-
-def find_pr_matrix_files(root_folder):
-    pr_files = []
-    for dirpath, _, filenames in os.walk(root_folder):
-        for filename in filenames:
-            if filename == "report.pr_matrix" or filename == "report.pr_matrix.tsv":
-                pr_files.append(os.path.join(dirpath, filename))
-    return pr_files
+# Worker processes for reading the pr_matrix files (None = all cores)
+MAX_WORKERS = None
 
 def process_all_pr_matrices():
     root = Tk()
@@ -38,40 +20,14 @@ def process_all_pr_matrices():
         print("No folder selected.")
         return
 
-    pr_files = find_pr_matrix_files(folder_path)
+    pr_files = find_pr_matrix_files(folder_path, filenames=("report.pr_matrix", "report.pr_matrix.tsv"))
     if not pr_files:
         print("No 'report.pr_matrix' files found in the folder or subfolders.")
         return
 
-    output_data = {}
-
-    for file_path in pr_files:
-        try:
-            df = pd.read_csv(file_path, sep="\t")
-
-            if "Stripped.Sequence" not in df.columns:
-                print(f"Skipping {file_path} — 'Stripped.Sequence' column not found.")
-                continue
-
-            df["GRAVY"] = df["Stripped.Sequence"].apply(calculate_gravy)
-            cols = ["Stripped.Sequence", "GRAVY"] + [col for col in df.columns if col not in ["Stripped.Sequence", "GRAVY"]]
-            df = df[cols]
-
-            # Use the immediate subfolder name as sheet name
-            subfolder_name = os.path.basename(os.path.dirname(file_path))
-
-            # Avoid duplicate sheet names
-            if subfolder_name in output_data:
-                suffix = 1
-                new_name = f"{subfolder_name}_{suffix}"
-                while new_name in output_data:
-                    suffix += 1
-                    new_name = f"{subfolder_name}_{suffix}"
-                subfolder_name = new_name
-
-            output_data[subfolder_name] = df
-        except Exception as e:
-            print(f"Error processing {file_path}: {e}")
+    # Read every file and add the GRAVY column in parallel; sheet names are the subfolder names
+    ingested = ingest_pr_matrices(pr_files, max_workers=MAX_WORKERS)
+    output_data = ingested
 
     if not output_data:
         print("No valid data to write.")
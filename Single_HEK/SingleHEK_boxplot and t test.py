@@ -9,6 +9,8 @@ from tkinter.filedialog import askopenfilename
 import matplotlib.cm as cm
 import matplotlib.colors as mcolors
 
+from Functions.resampling import bootstrap_difference_ci, permutation_test
+
 # Define gradient colors for Peptides (Warm Clay → Soft Taupe) and Proteins (Muted Copper)
 peptide_gradient_cmap = mcolors.LinearSegmentedColormap.from_list(
     "peptide_gradient", ["#D8BFAA", "#897D75"]  # Warm Clay → Soft Taupe
@@ -58,6 +60,12 @@ def extract_and_analyze(file_path):
         peptide_ttest = ttest_ind(acn_peptides, noacn_peptides, nan_policy='omit', equal_var=False)
         protein_ttest = ttest_ind(acn_proteins, noacn_proteins, nan_policy='omit', equal_var=False)
 
+        # Permutation p-values and bootstrap CIs of the mean difference (ACN - No ACN)
+        _, peptide_perm_p = permutation_test(acn_peptides, noacn_peptides)
+        _, protein_perm_p = permutation_test(acn_proteins, noacn_proteins)
+        peptide_diff, peptide_ci_low, peptide_ci_high = bootstrap_difference_ci(acn_peptides, noacn_peptides)
+        protein_diff, protein_ci_low, protein_ci_high = bootstrap_difference_ci(acn_proteins, noacn_proteins)
+
         # Define font sizes
         fontsize = 12  # Base font size
         title_fontsize = fontsize + 1  # Larger for titles
@@ -67,7 +75,11 @@ def extract_and_analyze(file_path):
         statistical_results = pd.DataFrame({
             "Comparison": ["Peptides (ACN vs. No ACN)", "Proteins (ACN vs. No ACN)"],
             "t-Statistic": [peptide_ttest.statistic, protein_ttest.statistic],
-            "p-Value": [peptide_ttest.pvalue, protein_ttest.pvalue]
+            "p-Value": [peptide_ttest.pvalue, protein_ttest.pvalue],
+            "Permutation p-Value": [peptide_perm_p, protein_perm_p],
+            "Mean Difference": [peptide_diff, protein_diff],
+            "95% CI Low": [peptide_ci_low, protein_ci_low],
+            "95% CI High": [peptide_ci_high, protein_ci_high]
         })
 
         # Create figure and axes with improved spacing
@@ -97,13 +109,14 @@ def extract_and_analyze(file_path):
         axes[0].set_ylabel("Peptide Count", fontsize=fontsize)
         axes[0].set_xticklabels(["ACN", "No ACN"], fontsize=fontsize)
 
-        # Add t-test results to the first plot
-        pval_peptides = statistical_results["p-Value"][0]
+        # Add t-test and permutation p-value to the first plot
+        pval_peptides = statistical_results["Permutation p-Value"][0]
         t_stat_peptides = statistical_results["t-Statistic"][0]
+        pval_t_peptides = statistical_results["p-Value"][0]
         stars = '***' if pval_peptides < 0.001 else '**' if pval_peptides < 0.01 else '*' if pval_peptides < 0.05 else 'ns'
 
         y_pos = df_melted_peptides["Peptide Count"].max() + (df_melted_peptides["Peptide Count"].max() * 0.05)
-        axes[0].annotate(f"{stars}\nt={t_stat_peptides:.2f}, p={pval_peptides:.2e}",
+        axes[0].annotate(f"{stars}\nt={t_stat_peptides:.2f}, p_t={pval_t_peptides:.2e}, p_perm={pval_peptides:.2e}",
                          xy=(0.5, y_pos),
                          xycoords=('axes fraction', 'data'),
                          ha='center',
@@ -128,13 +141,14 @@ def extract_and_analyze(file_path):
         axes[1].set_ylabel("Protein Count", fontsize=fontsize)
         axes[1].set_xticklabels(["ACN", "No ACN"], fontsize=fontsize)
 
-        # Add t-test results to the second plot
-        pval_proteins = statistical_results["p-Value"][1]
+        # Add t-test and permutation p-value to the second plot
+        pval_proteins = statistical_results["Permutation p-Value"][1]
         t_stat_proteins = statistical_results["t-Statistic"][1]
+        pval_t_proteins = statistical_results["p-Value"][1]
         stars = '***' if pval_proteins < 0.001 else '**' if pval_proteins < 0.01 else '*' if pval_proteins < 0.05 else 'ns'
 
         y_pos = df_melted_proteins["Protein Count"].max() + (df_melted_proteins["Protein Count"].max() * 0.05)
-        axes[1].annotate(f"{stars}\nt={t_stat_proteins:.2f}, p={pval_proteins:.2e}",
+        axes[1].annotate(f"{stars}\nt={t_stat_proteins:.2f}, p_t={pval_t_proteins:.2e}, p_perm={pval_proteins:.2e}",
                          xy=(0.5, y_pos),
                          xycoords=('axes fraction', 'data'),
                          ha='center',
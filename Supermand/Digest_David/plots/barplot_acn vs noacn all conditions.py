@@ -2,10 +2,11 @@
 import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
-from scipy.stats import ttest_ind
 import tkinter as tk
 from tkinter import filedialog
 
+from Functions.hypothesis_tests import pairwise_tests
+
 # Use Tkinter to select the CSV file
 root = tk.Tk()
 root.withdraw()
@@ -39,31 +40,34 @@ def get_log2_means(df, chip, load, group):
     return np.log2(df[cols].mean(axis=1) + 1)
 
 
-for chip in chips:
-    for load in loads:
-        acn = get_log2_means(df, chip, load, "ACN")
-        noacn = get_log2_means(df, chip, load, "NoACN")
-        if acn.empty or noacn.empty:
-            continue
-
-        t_stat, p_val = ttest_ind(acn, noacn, equal_var=False)
-        chip_label = chip.replace("p", ".")
-
-        results.append({
-            "Chip": chip_label,
-            "Load": load,
-            "t": round(t_stat, 2),
-            "p": p_val
-        })
-
-        plot_data.append({
-            "Chip": chip_label, "Load": load, "Group": "ACN",
-            "Mean": acn.mean(), "SE": acn.sem()
-        })
-        plot_data.append({
-            "Chip": chip_label, "Load": load, "Group": "NoACN",
-            "Mean": noacn.mean(), "SE": noacn.sem()
-        })
+# Welch t-tests of ACN vs NoACN for every chip and load in one call
+samples = {(chip, load, group): get_log2_means(df, chip, load, group)
+           for chip in chips for load in loads for group in ("ACN", "NoACN")}
+comparisons = [(chip, load) for chip in chips for load in loads
+               if not samples[(chip, load, "ACN")].empty and not samples[(chip, load, "NoACN")].empty]
+ttests = pairwise_tests(samples, [((chip, load, "ACN"), (chip, load, "NoACN")) for chip, load in comparisons],
+                        tests=("welch",))
+
+for (chip, load), t_stat, p_val in zip(comparisons, ttests["welch_stat"], ttests["welch_p"]):
+    acn = samples[(chip, load, "ACN")]
+    noacn = samples[(chip, load, "NoACN")]
+    chip_label = chip.replace("p", ".")
+
+    results.append({
+        "Chip": chip_label,
+        "Load": load,
+        "t": round(t_stat, 2),
+        "p": p_val
+    })
+
+    plot_data.append({
+        "Chip": chip_label, "Load": load, "Group": "ACN",
+        "Mean": acn.mean(), "SE": acn.sem()
+    })
+    plot_data.append({
+        "Chip": chip_label, "Load": load, "Group": "NoACN",
+        "Mean": noacn.mean(), "SE": noacn.sem()
+    })
 
 results_df = pd.DataFrame(results)
 plot_df = pd.DataFrame(plot_data)
@@ -1,8 +1,9 @@
 import pandas as pd
 import numpy as np
-from scipy.stats import ttest_ind
 from tkinter import Tk, filedialog
 
+from Functions.hypothesis_tests import pairwise_tests
+
 # Set up Tkinter file dialog
 root = Tk()
 root.withdraw()
@@ -38,32 +39,37 @@ else:
         pooled_std = np.sqrt(((nx - 1) * np.var(x, ddof=1) + (ny - 1) * np.var(y, ddof=1)) / (nx + ny - 2))
         return (np.mean(x) - np.mean(y)) / pooled_std
 
-    # Run t-tests
+    # Run all Welch t-tests (ACN vs NoACN per load and chip) in one call
+    comparisons = [(amount, chip) for amount in ['50pg', '250pg'] for chip in ['3.2', '3.5', '5.5']]
+    samples = {(amount, chip, extraction): np.array([]) for amount, chip in comparisons for extraction in ['ACN', 'NoACN']}
+    for key, group in df.groupby(['Amount', 'SurfaceType', 'Extraction'])['Log2Intensity']:
+        samples[key] = group.to_numpy()
+    ttests = pairwise_tests(samples, [((amount, chip, 'ACN'), (amount, chip, 'NoACN')) for amount, chip in comparisons],
+                            tests=("welch",), min_samples=3)
+
     ttest_results = []
 
-    for amount in ['50pg', '250pg']:
-        for chip in ['3.2', '3.5', '5.5']:
-            data_acn = df[(df['Amount'] == amount) & (df['SurfaceType'] == chip) & (df['Extraction'] == 'ACN')]['Log2Intensity']
-            data_noacn = df[(df['Amount'] == amount) & (df['SurfaceType'] == chip) & (df['Extraction'] == 'NoACN')]['Log2Intensity']
+    for (amount, chip), p_value in zip(comparisons, ttests['welch_p']):
+        data_acn = samples[(amount, chip, 'ACN')]
+        data_noacn = samples[(amount, chip, 'NoACN')]
 
-            if len(data_acn) >= 3 and len(data_noacn) >= 3:
-                stat, p_value = ttest_ind(data_acn, data_noacn, equal_var=False)  # Welch's t-test
-                effect_size = cohens_d(data_acn, data_noacn)
-                ttest_results.append({
-                    'Load': amount,
-                    'ChipID': chip,
-                    'T-test p-value': round(p_value, 4),
-                    'Significant Difference?': 'Yes' if p_value < 0.05 else 'No',
-                    "Cohen's d (Effect Size)": round(effect_size, 2)
-                })
-            else:
-                ttest_results.append({
-                    'Load': amount,
-                    'ChipID': chip,
-                    'T-test p-value': 'NA (too few samples)',
-                    'Significant Difference?': 'Undetermined',
-                    "Cohen's d (Effect Size)": 'NA'
-                })
+        if len(data_acn) >= 3 and len(data_noacn) >= 3:
+            effect_size = cohens_d(data_acn, data_noacn)
+            ttest_results.append({
+                'Load': amount,
+                'ChipID': chip,
+                'T-test p-value': round(p_value, 4),
+                'Significant Difference?': 'Yes' if p_value < 0.05 else 'No',
+                "Cohen's d (Effect Size)": round(effect_size, 2)
+            })
+        else:
+            ttest_results.append({
+                'Load': amount,
+                'ChipID': chip,
+                'T-test p-value': 'NA (too few samples)',
+                'Significant Difference?': 'Undetermined',
+                "Cohen's d (Effect Size)": 'NA'
+            })
 
     # Display t-test results
     ttest_df = pd.DataFrame(ttest_results)
@@ -2,10 +2,11 @@
 import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
-from scipy.stats import ttest_ind
 import tkinter as tk
 from tkinter import filedialog
 
+from Functions.hypothesis_tests import pairwise_tests
+
 # Open file selection dialog
 root = tk.Tk()
 root.withdraw()
@@ -40,10 +41,13 @@ loads = ["50pg", "250pg"]
 plot_data = []
 ttest_data = []
 
-for load in loads:
-    m32 = get_log2_peptide_means(df, "3p2", load, "NoACN")
-    m35 = get_log2_peptide_means(df, "3p5", load, "NoACN")
-    t_stat, p_val = ttest_ind(m32, m35, equal_var=False)
+# Welch t-tests of 3.2 vs 3.5 for both loads in one call
+samples = {(chip, load): get_log2_peptide_means(df, chip, load, "NoACN") for chip in chips for load in loads}
+ttests = pairwise_tests(samples, [(("3p2", load), ("3p5", load)) for load in loads], tests=("welch",))
+
+for load, t_stat, p_val in zip(loads, ttests["welch_stat"], ttests["welch_p"]):
+    m32 = samples[("3p2", load)]
+    m35 = samples[("3p5", load)]
     ttest_data.append({"Load": load, "t-statistic": round(t_stat, 2), "p-value": p_val})
     plot_data.append({"Chip": "3.2", "Load": load, "Mean": m32.mean(), "SE": m32.sem()})
     plot_data.append({"Chip": "3.5", "Load": load, "Mean": m35.mean(), "SE": m35.sem()})
@@ -1,11 +1,12 @@
 
 import pandas as pd
 import numpy as np
-from scipy.stats import ttest_ind
 import matplotlib.pyplot as plt
 import tkinter as tk
 from tkinter import filedialog
 
+from Functions.hypothesis_tests import pairwise_tests
+
 # Prompt for file selection
 root = tk.Tk()
 root.withdraw()
@@ -33,10 +34,13 @@ colors = {
 results = []
 plot_data = []
 
-for load in loads:
-    g35 = get_log2_peptide_means(df, "3p5", load, "ACN")
-    g55 = get_log2_peptide_means(df, "5p5", load, "ACN")
-    t_stat, p_val = ttest_ind(g35, g55, equal_var=False)
+# Welch t-tests of 3.5 vs 5.5 for both loads in one call
+samples = {(chip, load): get_log2_peptide_means(df, chip, load, "ACN") for chip in chips for load in loads}
+ttests = pairwise_tests(samples, [(("3p5", load), ("5p5", load)) for load in loads], tests=("welch",))
+
+for load, t_stat, p_val in zip(loads, ttests["welch_stat"], ttests["welch_p"]):
+    g35 = samples[("3p5", load)]
+    g55 = samples[("5p5", load)]
     results.append({"Load": load, "t": round(t_stat, 2), "p": p_val})
     plot_data.append({"Chip": "3.5", "Load": load, "Mean": g35.mean(), "SE": g35.sem()})
     plot_data.append({"Chip": "5.5", "Load": load, "Mean": g55.mean(), "SE": g55.sem()})
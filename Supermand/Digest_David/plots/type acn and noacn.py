@@ -1,11 +1,12 @@
 
 import pandas as pd
 import numpy as np
-from scipy.stats import ttest_ind
 import matplotlib.pyplot as plt
 import tkinter as tk
 from tkinter import filedialog
 
+from Functions.hypothesis_tests import pairwise_tests
+
 # Prompt for file selection
 root = tk.Tk()
 root.withdraw()
@@ -36,14 +37,21 @@ colors = {
     ("5.5", "250pg"): '#c8af88'
 }
 
+# Welch t-tests of 3.5 vs 5.5 for every extraction and load in one call
+samples = {(chip, load, group): get_log2_peptide_means(df, chip, load, group)
+           for chip in chips for load in loads for group, _ in plot_configs}
+pairs = [(("3p5", load, group), ("5p5", load, group)) for group, _ in plot_configs for load in loads]
+ttests = pairwise_tests(samples, pairs, tests=("welch",))
+ttest_results = dict(zip(pairs, zip(ttests["welch_stat"], ttests["welch_p"])))
+
 for group, output_file in plot_configs:
     results = []
     plot_data = []
 
     for load in loads:
-        g35 = get_log2_peptide_means(df, "3p5", load, group)
-        g55 = get_log2_peptide_means(df, "5p5", load, group)
-        t_stat, p_val = ttest_ind(g35, g55, equal_var=False)
+        g35 = samples[("3p5", load, group)]
+        g55 = samples[("5p5", load, group)]
+        t_stat, p_val = ttest_results[(("3p5", load, group), ("5p5", load, group))]
         results.append({"Load": load, "t": round(t_stat, 2), "p": p_val})
         plot_data.append({"Chip": "3.5", "Load": load, "Mean": g35.mean(), "SE": g35.sem()})
         plot_data.append({"Chip": "5.5", "Load": load, "Mean": g55.mean(), "SE": g55.sem()})
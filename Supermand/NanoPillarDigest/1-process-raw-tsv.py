@@ -1,10 +1,24 @@
-import csv
 from tkinter.filedialog import askopenfilename
-import pandas as pd
-import numpy as np
 import os
 from tkinter import Tk
-from GravyHelper import GravyHelper
+from Functions.pr_matrix_stream import SCALING_FACTORS, read_pr_matrix_header, process_pr_matrix_streaming
+from Functions.plate_normalization import read_bridge_factors
+from nanopillar.stages import (process_pr_matrix, read_sample_names, sample_map as build_sample_map,
+                               write_processed_csv)
+
+# Rows per block for very wide matrices (None = read the whole file at once)
+CHUNK_SIZE = None
+
+# Surface scaling: factors of SCALING_PLATE from a bridge_factors CSV ("Scaling plates (bridge).py"),
+# or the fixed SCALING_FACTORS when no file is given
+SCALING_FACTORS_FILE = None
+SCALING_PLATE = "P2"
+
+
+def surface_scaling():
+    if SCALING_FACTORS_FILE:
+        return read_bridge_factors(SCALING_FACTORS_FILE)[SCALING_PLATE]
+    return SCALING_FACTORS
 
 
 def main():
@@ -20,95 +34,60 @@ def prepare_raw_gravy_file():
         print("No file selected. Exiting script.")
         exit()
 
-    # Raw data
-    df = pd.read_csv(pr_file, sep="\t")
+    if CHUNK_SIZE:
+        return prepare_raw_gravy_file_streaming(pr_file)
 
-    data = {}
+    # Raw data -> renamed, scaled, GRAVY-sorted table (the same stage the batch runner uses)
+    try:
+        processed = process_pr_matrix(pr_file, ask_sample_names(), scaling=surface_scaling())
+    except ValueError as e:
+        print(e)
+        exit()
 
-    # Add column with replaced unimod code
-    if 'Modified.Sequence' in df.columns:
-        data['Modified.Sequence'] = df['Modified.Sequence']
-        data["GravySequence"] = df["Modified.Sequence"].apply(GravyHelper.replace_modification)
+    # Print data to file
+    selected_dir = os.path.dirname(pr_file)
+    processed_data_filename = os.path.basename(pr_file).rstrip('\r\n')
+    output_file = os.path.join(selected_dir, processed_data_filename + '_processed.csv')
+    write_processed_csv(processed, output_file)
 
-    elif 'Stripped.Sequence' in df.columns:
-        data['Stripped.Sequence'] = df['Stripped.Sequence']
-        data["GravySequence"] = df["Stripped.Sequence"]
-    else:
-        print("No Modified.Sequence nor Stripped.Sequence column in file.")
-        exit()
+    print("Written output file: \n" + output_file)
+    return output_file
 
-    # Add gravy score column and charge
-    data["GravyScore"] = data["GravySequence"].apply(GravyHelper.calculate_gravy)
-    data['Precursor.Charge'] = df['Precursor.Charge']
 
-    # Add sample columns
-    raw_cols = [col for col in df.columns if col.endswith(".raw")]
-    sample_map = {col: extract_clean_sample_name(col) for col in raw_cols}
-    sample_map = {k: v for k, v in sample_map.items() if v is not None}
+def prepare_raw_gravy_file_streaming(pr_file):
+    # Same rows and order as prepare_raw_gravy_file, read in row blocks of CHUNK_SIZE; the
+    # intensities pass through float32 and are written with 7 significant digits
+    raw_cols = [col for col in read_pr_matrix_header(pr_file) if col.endswith(".raw")]
+    sample_map = build_sample_map(raw_cols, ask_sample_names())
     if not sample_map:
         print("No sample_map")
         exit()
 
-    for key, value in df.items():
-        if key.endswith('.raw') and key in sample_map:
-            new_key = sample_map[key]
-            data[new_key] = value.fillna(0)
-
-            # Apply scaling based on prefix
-            if new_key.startswith("F"):
-                data[new_key] *= 1.4091
-            elif new_key.startswith("R"):
-                data[new_key] *= 1.0750
-
-    # Sort by gravy score
-    sorter = sorted(range(len(data["GravyScore"])), key=lambda i: data["GravyScore"][i])
-    for col, colvalues in data.items():
-        data[col] = [colvalues[i] for i in sorter]
-
-    # Print data to file
     selected_dir = os.path.dirname(pr_file)
     processed_data_filename = os.path.basename(pr_file).rstrip('\r\n')
     output_file = os.path.join(selected_dir, processed_data_filename + '_processed.csv')
 
-    with open(output_file, 'w', newline='') as csvfile:
-        writer = csv.writer(csvfile)
-        # Write the header row using the dictionary keys
-        writer.writerow(data.keys())
-        # Zip together the lists to create rows and write them
-        for row in zip(*data.values()):
-            writer.writerow(row)
+    try:
+        process_pr_matrix_streaming(pr_file, output_file, sample_map, scaling=surface_scaling(),
+                                    chunksize=CHUNK_SIZE)
+    except ValueError as e:
+        print(e)
+        exit()
 
     print("Written output file: \n" + output_file)
     return output_file
 
 
-def extract_clean_sample_name(col_path):
-    # Load sampleNames only once
-    if not hasattr(extract_clean_sample_name, "sampleNames"):
-        sampleNames = {}
-        sampleNamesMapFile = askopenfilename(
-            title="Select the file defining sample names",
-            filetypes=[("CSV files", "*.csv")]
-        )
-        with open(sampleNamesMapFile, "r") as file:
-            for line in file:
-                # path, label = line.strip().split("\t")
-                path, label = line.strip().split(";")
-                sampleNames[path] = label  # store in a dictionary
-        extract_clean_sample_name.sampleNames = sampleNames
-
-    # Now use the cached data
-    sampleNames = extract_clean_sample_name.sampleNames
-
-    return sampleNames.get(col_path, "UNKNOWN")
-
-
-def bin_gravy_column(gravy_values, bin_size=0.05):
-    min_bin = np.floor(min(gravy_values) * 20) / 20
-    max_bin = np.ceil(max(gravy_values) * 20) / 20
-    bins = np.arange(min_bin, max_bin + bin_size, bin_size)
-    labels = [f"{round(bins[i], 3)} to {round(bins[i + 1], 3)}" for i in range(len(bins) - 1)]
-    return bins, labels
+def ask_sample_names():
+    # The sample names map is picked once, before any column is renamed
+    sampleNamesMapFile = askopenfilename(
+        title="Select the file defining sample names",
+        filetypes=[("CSV files", "*.csv")]
+    )
+    if not sampleNamesMapFile:
+        print("No sample names file selected. Exiting script.")
+        exit()
+    return read_sample_names(sampleNamesMapFile)
 
 
 if __name__ == "__main__":
@@ -1,9 +1,13 @@
 #merges the two csv created by the process-raw. here all0 value are converted to null/Nan
 
 
-import pandas as pd
 import os
 from tkinter import Tk, filedialog
+from Functions.processed_merge import merge_processed_files, merge_processed_files_streaming
+
+# Merge the GravyScore-sorted files row by row instead of loading them all (output is then
+# sorted by GravyScore, GravySequence instead of by first appearance)
+STREAMING = False
 
 def main():
     merge_files()
@@ -16,43 +20,18 @@ def merge_files():
     if not pr_files:
         return
 
-    # Merge files into one table
-    merged_data = {}
-    for pr_file in pr_files:
-        fileData = pd.read_csv(pr_file, sep=",")
-
-        # Loop data and add to merged
-        for _, row in fileData.iterrows():
-            seq = row["GravySequence"]
-            if seq not in merged_data:
-                merged_data[seq] = {
-                    "GravySequence": seq,
-                    "GravyScore": row["GravyScore"],
-                    "Precursor.Charge": row["Precursor.Charge"]
-                }
-
-            # Add sample columns
-            for col in fileData.columns:
-                if any(char.isdigit() for char in col):
-                    merged_data[seq][col] = row[col]
-
-    # Convert the merged dictionary to a DataFrame
-    merged_table = pd.DataFrame(merged_data.values())
-
-    # Optional: fill missing sample columns with 0.0 (if needed)
-    #merged_table = merged_table.fillna(0.0)
-
-    # Replace any 0.0 values in numeric/sample columns with NaN
-    for col in merged_table.columns:
-        if any(char.isdigit() for char in col):  # likely a sample column
-            merged_table[col] = merged_table[col].replace(0.0, pd.NA)
-
-    # Print data to file
-    selected_dir = os.path.dirname(pr_file)
+    selected_dir = os.path.dirname(pr_files[-1])
     filenames = [os.path.splitext(os.path.basename(fp))[0] for fp in pr_files]
     output_file = os.path.join(selected_dir, "-".join(filenames) + ' - merged.csv')
 
-    merged_table.to_csv(output_file, index=False)
+    if STREAMING:
+        merge_processed_files_streaming(pr_files, output_file)
+    else:
+        # Merge files into one table (outer join on GravySequence, 0 -> NaN)
+        merged_table = merge_processed_files(pr_files)
+
+        # Print data to file
+        merged_table.to_csv(output_file, index=False)
 
     print("Result written to: \n" + output_file)
     return output_file
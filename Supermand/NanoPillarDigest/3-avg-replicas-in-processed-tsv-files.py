@@ -1,11 +1,11 @@
 import os
 from tkinter import Tk
 from tkinter.filedialog import askopenfilename
-import re
 
-import numpy as np
 import pandas as pd
 
+from nanopillar.stages import average_replicates
+
 
 def main():
     root = Tk()
@@ -21,35 +21,9 @@ def main():
         print("Invalid file: No column called GravyScore")
         exit()
 
-    # Detect sample columns: those that contain a number in their name
-    sample_cols = [col for col in fileData.columns if re.search(r'\d', col)]
-
-    # Group these columns by sample name (excluding the replica index)
-    sample_groups = {}
-    for col in sample_cols:
-        sample_name = col.rsplit(".", 1)[0]  # e.g., R_1.1 → R_1
-        sample_groups.setdefault(sample_name, []).append(col)
-
-    # Average across replicas
-    for sample_name, replicas in sample_groups.items():
-        # fileData[sample_name] = fileData[replicas].mean(axis=1).round(2)
-        # Create a sub-DataFrame of replicas
-        replica_values = fileData[replicas]
-
-        # Count how many values are non-zero per row
-        non_zero_counts = (replica_values != 0).sum(axis=1)
-
-        # Compute mean across rows
-        mean_values = replica_values.mean(axis=1).round(2)
-
-        # Set mean only if at least 3 non-zero values, else NaN
-        fileData[sample_name] = np.where(non_zero_counts >= 3, mean_values, np.nan)
-
-    # Drop the individual replica columns
-    fileData.drop(columns=sample_cols, inplace=True)
-
-    # This is where I need the logic that takes the average of all the replicas:
-    out = fileData
+    # Mean across replicas per condition, only where at least 3 replicas are non-zero
+    # (missing values count as non-zero), else NaN
+    out = average_replicates(fileData)
 
     # Print to file
     selected_dir = os.path.dirname(pr_file)
@@ -5,6 +5,8 @@ import re
 import tkinter as tk
 from tkinter import filedialog
 
+from Functions.replicate_collapse import group_replicates, mask_undetected
+
 def main():
     # --- File selection ---
     root = tk.Tk()
@@ -24,16 +26,11 @@ def main():
     rep_cols = [col for col in df.columns if re.match(r".*\.\d+$", col)]
 
     # --- Group by sample group prefix (e.g. F_1 from F_1.1, F_1.2...) ---
-    group_map = {col: col.rsplit('.', 1)[0] for col in rep_cols}
-    groups = sorted(set(group_map.values()))
+    groups = group_replicates(rep_cols)
 
-    # --- Apply filtering: set all values to NaN if < 3 replicates detected ---
+    # --- Apply filtering: set all values to NaN if < 3 replicates detected (0 counts as detected) ---
     df_filtered = df.copy()
-    for group in groups:
-        group_reps = [col for col in rep_cols if group_map[col] == group]
-        detected = df_filtered[group_reps].notna().sum(axis=1)
-        low_confidence = detected < 3
-        df_filtered.loc[low_confidence, group_reps] = np.nan
+    df_filtered[rep_cols] = mask_undetected(df, groups, zero_detected=True)
 
     # --- Log2 transform (after filtering, skipping 0s) ---
     df_log2 = df_filtered.copy()
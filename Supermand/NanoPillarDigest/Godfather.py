@@ -1,42 +1,72 @@
-
 import pandas as pd
 import numpy as np
 import tkinter as tk
 from tkinter import filedialog
 import os
+from functools import partial
 
-def process_task_a(df, use_metadata=True):
-    metadata_cols = ['Modified.Sequence', 'GravySequence', 'GravyScore', 'Precursor.Charge'] if use_metadata else []
-    sample_cols = [col for col in df.columns if col not in metadata_cols]
-    conditions = set(col.split('.')[0] for col in sample_cols)
+from Functions.replicate_collapse import collapse_replicates, group_replicates
+from Functions.task_graph import TaskGraph, file_hash
+
+METADATA_COLS = ['Modified.Sequence', 'GravySequence', 'GravyScore', 'Precursor.Charge']
+
+# Threads for the independent tasks (None = default pool size)
+MAX_WORKERS = None
+
+# Tasks to (re)compute, e.g. ["P1_TaskC"]; None = all outputs. Unchanged tasks are read from the cache.
+TASKS = None
+
+# Output tasks (the P1/P2_mean/P2_median loader tasks only feed them)
+OUTPUT_TASKS = [f"{dataset}_Task{task}" for dataset in ("P1", "P2") for task in "ABCDE"]
+
+def condition_name(col):
+    # F_1.2 -> F_1 (exact condition, so F_1 does not pick up F_10.x)
+    return col.split('.')[0]
+
+class ConditionMatrix:
+    """One input table with its condition grouping and zero->NaN sample matrix, computed once."""
 
-    collapsed_data = []
+    def __init__(self, df, use_metadata=True):
+        self.df = df
+        self.use_metadata = use_metadata
+        self.metadata_cols = METADATA_COLS if use_metadata else []
+        self.sample_cols = [col for col in df.columns if col not in self.metadata_cols]
+        self.groups = group_replicates(self.sample_cols, condition_of=condition_name)
+        self.samples_nan = df[self.sample_cols].replace(0, np.nan)
 
-    for condition in conditions:
-        replicate_cols = [col for col in sample_cols if col.startswith(condition)]
-        mean_values = df[replicate_cols].mean(axis=1)
-        detected_counts = (df[replicate_cols] > 0).sum(axis=1)
-        percent_detected = (detected_counts / len(replicate_cols)) * 100
+def condition_matrix(df, use_metadata=True):
+    # Tasks accept a plain DataFrame or the shared ConditionMatrix of an input
+    if isinstance(df, ConditionMatrix):
+        if df.use_metadata == use_metadata:
+            return df
+        df = df.df
+    return ConditionMatrix(df, use_metadata)
 
-        temp_df = df[metadata_cols].copy() if use_metadata else pd.DataFrame()
-        temp_df['Condition'] = condition
-        temp_df['Mean_Abundance'] = mean_values
-        temp_df['Percent_Detected'] = percent_detected
+def load_condition_matrix(path):
+    return ConditionMatrix(pd.read_csv(path))
 
-        collapsed_data.append(temp_df)
+def collapsed_long_format(df, metadata_cols, collapsed, columns):
+    # One block of rows per condition (metadata repeated), like concatenating per-condition frames
+    conditions = list(collapsed["passes"].columns)
+    long_df = df[metadata_cols].iloc[np.tile(np.arange(len(df)), len(conditions))].reset_index(drop=True)
+    long_df['Condition'] = np.repeat(conditions, len(df))
+    for name, stat in columns.items():
+        long_df[name] = collapsed[stat].to_numpy().ravel(order='F')
+    return long_df
 
-    collapsed_df = pd.concat(collapsed_data, ignore_index=True)
-    return collapsed_df
+def process_task_a(df, use_metadata=True):
+    data = condition_matrix(df, use_metadata)
+    collapsed = collapse_replicates(data.df, data.groups)
+    return collapsed_long_format(data.df, data.metadata_cols, collapsed,
+                                 {'Mean_Abundance': 'mean', 'Percent_Detected': 'percent_detected'})
 
 def process_task_b(df_list):
     stats_data = []
     for df in df_list:
-        sample_cols = [col for col in df.columns if col not in ['Modified.Sequence', 'GravySequence', 'GravyScore', 'Precursor.Charge']]
-        conditions = set(col.split('.')[0] for col in sample_cols)
+        data = condition_matrix(df)
 
-        for condition in conditions:
-            replicate_cols = [col for col in sample_cols if col.startswith(condition)]
-            all_values = df[replicate_cols].values.flatten()
+        for condition, replicate_cols in data.groups.items():
+            all_values = data.df[replicate_cols].values.flatten()
             mean_all = np.mean(all_values)
             std_all = np.std(all_values)
             sem_all = std_all / np.sqrt(len(all_values))
@@ -59,47 +89,28 @@ def process_task_b(df_list):
     stats_df = pd.DataFrame(stats_data)
     return stats_df
 
-def process_task_c(df, use_metadata=True):
-    metadata_cols = ['Modified.Sequence', 'GravySequence', 'GravyScore', 'Precursor.Charge'] if use_metadata else []
-    sample_cols = [col for col in df.columns if col not in metadata_cols]
-    conditions = set(col.split('.')[0] for col in sample_cols)
-
-    collapsed_data = []
-
-    for condition in conditions:
-        replicate_cols = [col for col in sample_cols if col.startswith(condition)]
-        data = df[replicate_cols].replace(0, np.nan)
-        median_values = data.median(axis=1, skipna=True)
-        q1_values = data.quantile(0.25, axis=1)
-        q3_values = data.quantile(0.75, axis=1)
-        detected_counts = data.notna().sum(axis=1)
-        percent_detected = (detected_counts / len(replicate_cols)) * 100
+def process_task_b_single(df):
+    # Task B of one input table (task graph tasks take one input)
+    return process_task_b([df])
 
-        temp_df = df[metadata_cols].copy() if use_metadata else pd.DataFrame()
-        temp_df['Condition'] = condition
-        temp_df['Median_Abundance'] = median_values
-        temp_df['Q1'] = q1_values
-        temp_df['Q3'] = q3_values
-        temp_df['Percent_Detected'] = percent_detected
-
-        collapsed_data.append(temp_df)
-
-    collapsed_df = pd.concat(collapsed_data, ignore_index=True)
-    return collapsed_df
+def process_task_c(df, use_metadata=True):
+    data = condition_matrix(df, use_metadata)
+    collapsed = collapse_replicates(data.samples_nan, data.groups)
+    return collapsed_long_format(data.df, data.metadata_cols, collapsed,
+                                 {'Median_Abundance': 'median', 'Q1': 'q1', 'Q3': 'q3',
+                                  'Percent_Detected': 'percent_detected'})
 
 def process_task_d(df_list):
     stats_data = []
     for df in df_list:
-        sample_cols = [col for col in df.columns if col not in ['Modified.Sequence', 'GravySequence', 'GravyScore', 'Precursor.Charge']]
-        conditions = set(col.split('.')[0] for col in sample_cols)
+        data = condition_matrix(df)
 
-        for condition in conditions:
-            replicate_cols = [col for col in sample_cols if col.startswith(condition)]
-            data = df[replicate_cols].replace(0, np.nan).values.flatten()
-            median = np.nanmedian(data)
-            q1 = np.nanpercentile(data, 25)
-            q3 = np.nanpercentile(data, 75)
-            count_detected = np.sum(~np.isnan(data))
+        for condition, replicate_cols in data.groups.items():
+            values = data.samples_nan[replicate_cols].values.flatten()
+            median = np.nanmedian(values)
+            q1 = np.nanpercentile(values, 25)
+            q3 = np.nanpercentile(values, 75)
+            count_detected = np.sum(~np.isnan(values))
 
             stats_data.append({
                 'Condition': condition,
@@ -112,18 +123,19 @@ def process_task_d(df_list):
     stats_df = pd.DataFrame(stats_data)
     return stats_df
 
-def process_task_e_fixed(df, dataset_name, output_folder):
-    metadata_cols = ['Modified.Sequence', 'GravySequence', 'GravyScore', 'Precursor.Charge']
-    sample_cols = [col for col in df.columns if col not in metadata_cols]
-    conditions = set(col.split('.')[0] for col in sample_cols)
+def process_task_d_single(df):
+    # Task D of one input table (task graph tasks take one input)
+    return process_task_d([df])
+
+def process_task_e(df):
+    data = condition_matrix(df)
 
     summary = []
-    filtered_df = df.copy()
-    total_peptides = len(df)
+    filtered_df = data.df.copy()
+    total_peptides = len(data.df)
 
-    for condition in conditions:
-        replicate_cols = [col for col in sample_cols if col.startswith(condition)]
-        zero_counts = (df[replicate_cols] == 0).sum(axis=1)
+    for condition, replicate_cols in data.groups.items():
+        zero_counts = (data.df[replicate_cols] == 0).sum(axis=1)
         to_nan = zero_counts >= 3
         filtered_df.loc[to_nan, replicate_cols] = np.nan
 
@@ -140,9 +152,37 @@ def process_task_e_fixed(df, dataset_name, output_folder):
         })
 
     summary_df = pd.DataFrame(summary)
-    summary_df.to_csv(os.path.join(output_folder, f"{dataset_name}_TaskE.csv"), index=False)
-    filtered_df.to_csv(os.path.join(output_folder, f"{dataset_name}_Filtered.csv"), index=False)
-    print(f"Task E completed for {dataset_name} (handled separately).")
+    return summary_df, filtered_df
+
+def build_task_graph(p1_file, p2_mean_file, p2_median_file, output_folder):
+    """Inputs are loaded (and grouped) once each; every output is a task cached by input hash
+    and by the code of its function and of the helpers it calls."""
+    graph = TaskGraph(cache_dir=os.path.join(output_folder, ".godfather_cache"), max_workers=MAX_WORKERS)
+    for name, path in [("P1", p1_file), ("P2_mean", p2_mean_file), ("P2_median", p2_median_file)]:
+        graph.add(name, partial(load_condition_matrix, path), key=file_hash(path), cache=False)
+
+    graph.add("P1_TaskA", process_task_a, deps=["P1"])
+    graph.add("P2_TaskA", process_task_a, deps=["P2_mean"])
+    graph.add("P1_TaskB", process_task_b_single, deps=["P1"])
+    graph.add("P2_TaskB", process_task_b_single, deps=["P2_mean"])
+    graph.add("P1_TaskC", process_task_c, deps=["P1"])
+    graph.add("P2_TaskC", process_task_c, deps=["P2_median"])
+    graph.add("P1_TaskD", process_task_d_single, deps=["P1"])
+    graph.add("P2_TaskD", process_task_d_single, deps=["P2_median"])
+    graph.add("P1_TaskE", process_task_e, deps=["P1"])
+    graph.add("P2_TaskE", process_task_e, deps=["P2_mean"])
+    return graph
+
+def write_task_outputs(results, output_folder):
+    for name, result in results.items():
+        if name.endswith("_TaskE"):
+            dataset_name = name[:-len("_TaskE")]
+            summary_df, filtered_df = result
+            summary_df.to_csv(os.path.join(output_folder, f"{dataset_name}_TaskE.csv"), index=False)
+            filtered_df.to_csv(os.path.join(output_folder, f"{dataset_name}_Filtered.csv"), index=False)
+        else:
+            result.to_csv(os.path.join(output_folder, f"{name}.csv"), index=False)
+        print(f"{name} completed.")
 
 if __name__ == "__main__":
     root = tk.Tk()
@@ -157,33 +197,8 @@ if __name__ == "__main__":
 
         p1_file, p2_mean_file, p2_median_file = file_paths
 
-        p1_df = pd.read_csv(p1_file)
-        p2_mean_df = pd.read_csv(p2_mean_file)
-        p2_median_df = pd.read_csv(p2_median_file)
-
-        # Task A
-        process_task_a(p1_df).to_csv(os.path.join(output_folder, "P1_TaskA.csv"), index=False)
-        process_task_a(p2_mean_df).to_csv(os.path.join(output_folder, "P2_TaskA.csv"), index=False)
-        print("Task A completed.")
-
-        # Task B - Separate
-        process_task_b([p1_df]).to_csv(os.path.join(output_folder, "P1_TaskB.csv"), index=False)
-        process_task_b([p2_mean_df]).to_csv(os.path.join(output_folder, "P2_TaskB.csv"), index=False)
-        print("Task B completed.")
-
-        # Task C
-        process_task_c(p1_df).to_csv(os.path.join(output_folder, "P1_TaskC.csv"), index=False)
-        process_task_c(p2_median_df).to_csv(os.path.join(output_folder, "P2_TaskC.csv"), index=False)
-        print("Task C completed.")
-
-        # Task D - Separate
-        process_task_d([p1_df]).to_csv(os.path.join(output_folder, "P1_TaskD.csv"), index=False)
-        process_task_d([p2_median_df]).to_csv(os.path.join(output_folder, "P2_TaskD.csv"), index=False)
-        print("Task D completed.")
-
-        # Task E
-        process_task_e_fixed(p1_df, "P1", output_folder)
-        process_task_e_fixed(p2_mean_df, "P2", output_folder)
+        graph = build_task_graph(p1_file, p2_mean_file, p2_median_file, output_folder)
+        write_task_outputs(graph.run(OUTPUT_TASKS if TASKS is None else TASKS), output_folder)
 
     else:
         print("Please select exactly three files (P1, P2_scaled_by_mean, P2_scaled_by_median). Exiting.")
@@ -2,6 +2,11 @@ import pandas as pd
 import tkinter as tk
 from tkinter import filedialog
 
+from Functions.plate_normalization import apply_bridge_factors, bridge_factors, plate_matrix
+
+# Bridge condition of each plate, per surface
+BRIDGES = {"P1": {"F": "F_6", "R": "R_6"}, "P2": {"F": "F_5", "R": "R_5"}}
+
 # === File Selection ===
 root = tk.Tk()
 root.withdraw()
@@ -19,29 +24,20 @@ output_dir = filedialog.askdirectory(title="Select Output Folder")
 p1 = pd.read_csv(p1_file)
 p2 = pd.read_csv(p2_file)
 
-# === Compute Mean-Based Scaling Factors ===
-def compute_mean(df, condition_prefix):
-    reps = [col for col in df.columns if col.startswith(condition_prefix)]
-    return df[reps].values.flatten().mean()
-
-mean_f5 = compute_mean(p2, 'F_5')
-mean_f6 = compute_mean(p1, 'F_6')
-mean_r5 = compute_mean(p2, 'R_5')
-mean_r6 = compute_mean(p1, 'R_6')
-
-scaling_f = mean_f6 / mean_f5
-scaling_r = mean_r6 / mean_r5
+# === Compute Mean-Based Scaling Factors (bridge F_6/R_6 in P1 vs F_5/R_5 in P2) ===
+factors = bridge_factors({"P1": p1, "P2": p2}, BRIDGES, reference="P1", method="mean")
+scaling_f = factors.loc["P2", "F"]
+scaling_r = factors.loc["P2", "R"]
 
 print(f"F Scaling Factor (Mean): {scaling_f:.4f}")
 print(f"R Scaling Factor (Mean): {scaling_r:.4f}")
 
 # === Apply Scaling ===
 p2_scaled = p2.copy()
-for col in p2_scaled.select_dtypes(include='number').columns:
-    if col.startswith('F_'):
-        p2_scaled[col] *= scaling_f
-    elif col.startswith('R_'):
-        p2_scaled[col] *= scaling_r
+scaled_cols = [col for col in p2_scaled.select_dtypes(include='number').columns if col.startswith(('F_', 'R_'))]
+matrix, scaled_cols = plate_matrix(p2_scaled, scaled_cols, dtype=float)
+apply_bridge_factors(matrix, scaled_cols, factors.loc["P2"])
+p2_scaled[scaled_cols] = matrix
 
 # === Save Scaled P2 ===
 output_path = f"{output_dir}/P2_mean_scaled_dual.csv"
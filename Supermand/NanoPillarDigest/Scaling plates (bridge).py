@@ -0,0 +1,56 @@
+import os
+import pandas as pd
+import tkinter as tk
+from tkinter import filedialog
+
+from Functions.plate_normalization import (apply_bridge_factors, bridge_factors, plate_matrix,
+                                           write_bridge_factors)
+
+# Bridge condition of each plate, per surface (add one line per plate of the campaign)
+BRIDGES = {
+    "P1": {"F": "F_6", "R": "R_6"},
+    "P2": {"F": "F_5", "R": "R_5"},
+}
+REFERENCE_PLATE = "P1"
+
+# "mean", "median_no_zeros" or "median_of_ratios"
+METHOD = "median_of_ratios"
+
+# === File Selection ===
+root = tk.Tk()
+root.withdraw()
+
+plate_files = {}
+for plate in BRIDGES:
+    print(f"Select {plate} CSV file...")
+    plate_files[plate] = filedialog.askopenfilename(title=f"Select {plate} CSV", filetypes=[("CSV Files", "*.csv")])
+    if not plate_files[plate]:
+        print(f"No file selected for {plate}. Exiting.")
+        exit()
+
+print("Select folder to save scaled plates...")
+output_dir = filedialog.askdirectory(title="Select Output Folder")
+
+# === Load Data ===
+plates = {plate: pd.read_csv(path) for plate, path in plate_files.items()}
+
+# === Compute Scaling Factors (every plate onto the reference plate) ===
+factors = bridge_factors(plates, BRIDGES, reference=REFERENCE_PLATE, method=METHOD)
+print(f"Scaling factors ({METHOD}):")
+print(factors.round(4).to_string())
+
+factors_path = os.path.join(output_dir, f"bridge_factors_{METHOD}.csv")
+write_bridge_factors(factors, factors_path)
+print(f"✅ Scaling factors saved to: {factors_path}")
+
+# === Apply Scaling (float32, in place) and Save ===
+for plate, df in plates.items():
+    if plate == REFERENCE_PLATE:
+        continue
+    matrix, sample_cols = plate_matrix(df)
+    apply_bridge_factors(matrix, sample_cols, factors.loc[plate])
+    df[sample_cols] = matrix
+
+    output_path = os.path.join(output_dir, f"{plate}_{METHOD}_scaled.csv")
+    df.to_csv(output_path, index=False)
+    print(f"✅ Scaled {plate} saved to: {output_path}")
@@ -0,0 +1,40 @@
+#Compares the per-sequence GravyHelper.calculate_gravy (Series.apply) with the vectorized
+#batch GRAVY engine on the P2 matrix, and checks that both give identical scores.
+
+import os
+import sys
+import timeit
+
+import numpy as np
+import pandas as pd
+from GravyHelper import GravyHelper
+
+DEFAULT_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "data",
+                            "NanoPillar_Digest", "P2_report.pr_matrix.tsv_processed.csv")
+
+
+def main():
+    pr_file = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_FILE
+    sequences = pd.read_csv(pr_file, usecols=["Modified.Sequence"])["Modified.Sequence"]
+
+    # Repeat the column so timings are not dominated by call overhead
+    repeats = 20
+    sequences = pd.concat([sequences] * repeats, ignore_index=True)
+    print(f"{len(sequences)} sequences ({repeats}x {os.path.basename(pr_file)})")
+
+    loop_scores = sequences.apply(GravyHelper.calculate_gravy).to_numpy()
+    batch_scores = GravyHelper.calculate_gravy_batch(sequences)
+    if not np.array_equal(loop_scores, batch_scores):
+        print("Scores differ!")
+        exit(1)
+
+    loop_time = min(timeit.repeat(lambda: sequences.apply(GravyHelper.calculate_gravy), number=1, repeat=3))
+    batch_time = min(timeit.repeat(lambda: GravyHelper.calculate_gravy_batch(sequences), number=1, repeat=3))
+
+    print(f"Series.apply(calculate_gravy): {loop_time * 1000:8.1f} ms")
+    print(f"calculate_gravy_batch:         {batch_time * 1000:8.1f} ms")
+    print(f"Speed-up: {loop_time / batch_time:.1f}x (identical scores)")
+
+
+if __name__ == "__main__":
+    main()
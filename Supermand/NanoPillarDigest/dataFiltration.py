@@ -4,6 +4,10 @@ import tkinter as tk
 from tkinter import filedialog
 import matplotlib.pyplot as plt
 import time
+import numpy as np
+
+# Rows converted to text at a time when writing the long table
+CSV_CHUNK_ROWS = 100000
 
 
 # --- Helper: Statistical summary ---
@@ -13,8 +17,9 @@ def statistical_summary(long_df):
 
     total_peptides = long_df['GravySequence'].nunique()
     total_samples = long_df['Sample'].nunique()
-    nonzero_peptides = long_df.groupby('GravySequence')['Intensity'].apply(lambda x: (x > 0).any()).sum()
-    nonzero_samples = long_df.groupby('Sample')['Intensity'].apply(lambda x: (x > 0).any()).sum()
+    has_signal = long_df['Intensity'] > 0
+    nonzero_peptides = has_signal.groupby(long_df['GravySequence'], observed=True).any().sum()
+    nonzero_samples = has_signal.groupby(long_df['Sample'], observed=True).any().sum()
 
     print(f"✅ Total peptides: {total_peptides}")
     print(f"✅ Total samples (replicates): {total_samples}")
@@ -31,6 +36,56 @@ def statistical_summary(long_df):
     plt.show()
 
 
+# --- Helper: Filter on the wide matrix, then melt ---
+SAMPLE_PATTERN = r'(?P<Load>\d+p\d+)_(?P<Amount>\d+pg)_(?P<Extraction>ACN|NoACN)\.(?P<Replicate>\d+)'
+
+
+def filter_wide(df, id_vars, value_vars):
+    """Intensity matrix with peptides and replicates without any signal dropped.
+
+    A peptide (GravySequence) is kept when any of its rows has an intensity > 0, then a
+    replicate is kept when it has an intensity > 0 for any kept peptide.
+    Returns (kept rows of df[id_vars], intensity matrix of the kept rows and replicates).
+    """
+    intensities = df[value_vars].apply(pd.to_numeric, errors='coerce').fillna(0)
+    positive = (intensities > 0).to_numpy()
+
+    # Step 1: Drop fully missing peptides (all rows of a GravySequence together)
+    peptide_codes, peptides = pd.factorize(df['GravySequence'])
+    named = peptide_codes >= 0
+    signal_rows = np.bincount(peptide_codes[named], weights=positive.any(axis=1)[named], minlength=len(peptides))
+    keep_rows = named & (signal_rows > 0)[peptide_codes]
+
+    # Step 2: Drop empty replicates
+    keep_samples = positive[keep_rows].any(axis=0)
+
+    return df.loc[keep_rows, id_vars], intensities.loc[keep_rows, keep_samples]
+
+
+def melt_categorical(ids, intensities):
+    """Long format (one row per peptide row x replicate, replicate-major like DataFrame.melt).
+
+    Sequence and sample metadata are categoricals, parsed once per sample instead of per row.
+    """
+    n_rows, n_samples = intensities.shape
+    samples = pd.Index(intensities.columns)
+    sample_meta = samples.to_series().str.extract(SAMPLE_PATTERN)
+    sample_meta['Position'] = sample_meta['Load'] + '_' + sample_meta['Amount']
+    sample_codes = np.repeat(np.arange(n_samples), n_rows)
+
+    long_df = pd.DataFrame({
+        'GravySequence': pd.Categorical(np.tile(ids['GravySequence'].to_numpy(), n_samples)),
+        'GravyScore': np.tile(ids['GravyScore'].to_numpy(), n_samples),
+        'Precursor.Charge': np.tile(ids['Precursor.Charge'].to_numpy(), n_samples),
+        'Sample': pd.Categorical.from_codes(sample_codes, categories=samples),
+        'Intensity': intensities.to_numpy().ravel(order='F'),
+    })
+    for col in ['Load', 'Amount', 'Extraction', 'Replicate', 'Position']:
+        codes, uniques = pd.factorize(sample_meta[col])
+        long_df[col] = pd.Categorical.from_codes(codes[sample_codes], categories=uniques)
+    return long_df
+
+
 # --- Main Script ---
 
 # Start tkinter hidden window
@@ -58,44 +113,20 @@ start = time.time()
 df = pd.read_csv(input_file)
 print(f"✅ File loaded ({df.shape[0]} rows, {df.shape[1]} columns) in {time.time() - start:.2f} seconds.")
 
-# Preprocessing: melt wide to long
-print("🔄 Reshaping wide to long format...")
+# Decide which peptides and replicates to keep on the wide matrix
+print("🔄 Dropping peptides missing across all samples and replicates missing all peptides...")
 id_vars = ['GravySequence', 'GravyScore', 'Precursor.Charge']
 value_vars = [col for col in df.columns if col not in id_vars]
+ids, intensities = filter_wide(df, id_vars, value_vars)
 
-long_df = df.melt(id_vars=id_vars, value_vars=value_vars,
-                  var_name='Sample', value_name='Intensity')
-
-# Parse sample metadata
-print("🔄 Parsing sample metadata...")
-sample_split = long_df['Sample'].str.extract(
-    r'(?P<Load>\d+p\d+)_(?P<Amount>\d+pg)_(?P<Extraction>ACN|NoACN)\.(?P<Replicate>\d+)'
-)
-
-long_df = pd.concat([long_df, sample_split], axis=1)
-long_df['Position'] = long_df['Load'] + '_' + long_df['Amount']
-# Keep Sample column for now!
-# No drop of 'Sample' column
-
-# Make Intensity numeric
-long_df['Intensity'] = pd.to_numeric(long_df['Intensity'], errors='coerce').fillna(0)
-
-# Step 1: Drop fully missing peptides
-print("🔄 Dropping peptides missing across all samples...")
-peptides_with_signal = long_df.groupby('GravySequence')['Intensity'].apply(lambda x: (x > 0).any())
-peptides_to_keep = peptides_with_signal[peptides_with_signal].index
-long_df = long_df[long_df['GravySequence'].isin(peptides_to_keep)]
-
-# Step 2: Drop empty replicates
-print("🔄 Dropping sample replicates missing all peptides...")
-samples_with_signal = long_df.groupby('Sample')['Intensity'].apply(lambda x: (x > 0).any())
-samples_to_keep = samples_with_signal[samples_with_signal].index
-long_df = long_df[long_df['Sample'].isin(samples_to_keep)]
+# Reshape wide to long (categorical sample metadata)
+print("🔄 Reshaping wide to long format...")
+long_df = melt_categorical(ids, intensities)
 
 # Final statistics
 statistical_summary(long_df)
 
 # Save output
 output_filename = os.path.join(output_folder, "Filtered_LongFormat.csv")
-long_df.to_csv(output_filename, index=False)
+long_df.to_csv(output_filename, index=False, chunksize=CSV_CHUNK_ROWS)
 print(f"\n✅ Output saved to: {output_filename}")
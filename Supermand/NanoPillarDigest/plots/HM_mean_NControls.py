@@ -6,8 +6,11 @@ import matplotlib.pyplot as plt
 import seaborn as sns
 import tkinter as tk
 from tkinter import filedialog
+import os
 import re
 
+from Functions.gravy_binning import GravyBinIndex
+
 # --------------------------
 # File selection via Tkinter
 # --------------------------
@@ -22,8 +25,9 @@ df = pd.read_csv(file_path)
 # Prepare heatmap matrix
 # --------------------------
 
-# Bin GravyScore
-df["GravyBin"] = pd.cut(df["GravyScore"], bins=20)
+# Bin GravyScore (bins shared with the other 20-bin scripts on this folder)
+bin_index = GravyBinIndex.shared(os.path.dirname(file_path), df["GravyScore"], num_bins=20)
+df["GravyBin"] = bin_index.categorical(df["GravyScore"], bin_index.cut_labels())
 
 # Define sample/replicate columns (based on actual file)
 rep_cols = [
@@ -5,20 +5,28 @@ import seaborn as sns
 import matplotlib.pyplot as plt
 import tkinter as tk
 from tkinter import filedialog
+import os
 import re
 
+from Functions.gravy_binning import GravyBinIndex
+from Functions.missingness import bin_missingness, calculate_missingness
+
 # Custom font size settings
 XTICK_FONT_SIZE = 16
 YTICK_FONT_SIZE = 16
 AXIS_LABEL_FONT_SIZE = 20
 TITLE_FONT_SIZE = 16
 
+# GRAVY bins used when a peptide intensity table is selected instead of a binned CSV
+NUM_BINS = 20
+
+
 def main():
     # --- File dialog to select input CSV ---
     root = tk.Tk()
     root.withdraw()
     file_path = filedialog.askopenfilename(
-        title="Select the GRAVY-binned missingness CSV",
+        title="Select the GRAVY-binned missingness CSV (or a peptide intensity CSV)",
         filetypes=[("CSV files", "*.csv")]
     )
 
@@ -27,14 +35,18 @@ def main():
         return
 
     # --- Load the data ---
+    # A binned missingness CSV (Missingness.py), or a peptide intensity table to bin here
     df = pd.read_csv(file_path)
 
+    if 'GravyBin' not in df.columns:
+        # Same tables as Missingness.py: peptides labelled by the first column, pooled per label
+        rates = calculate_missingness(pd.read_csv(file_path, index_col=0))
+        bin_index = GravyBinIndex.shared(os.path.dirname(file_path), rates['GravyScore'], num_bins=NUM_BINS)
+        df = bin_missingness(rates, bins=bin_index)
+
     # --- Convert GRAVY bin to midpoint for plotting ---
-    df['GravyMid'] = df['GravyBin'].apply(
-        lambda x: (pd.Interval(float(x.split(',')[0][1:]), float(x.split(',')[1][:-1]), closed='right').left +
-                   pd.Interval(float(x.split(',')[0][1:]), float(x.split(',')[1][:-1]), closed='right').right) / 2
-        if isinstance(x, str) and ',' in x else None
-    )
+    bounds = df['GravyBin'].astype(str).str.extract(r"^[\(\[]([^,]+),\s*([^\]\)]+)[\]\)]$").astype(float)
+    df['GravyMid'] = (bounds[0] + bounds[1]) / 2
 
     # --- Melt for long-form plotting ---
     df_long = df.melt(id_vars=['GravyBin', 'GravyMid'], var_name='Sample', value_name='Missingness')
@@ -5,6 +5,8 @@ from tkinter import filedialog
 import numpy as np
 from scipy.stats import gaussian_kde, ks_2samp
 
+from Functions.detection_matrix import DetectionMatrix
+
 # ====== USER SETTINGS ======
 p1_color = 'purple'
 p2_color = 'orange'
@@ -25,7 +27,9 @@ def load_and_compute_custom_missing(path, group_type):
     else:
         cols = []
 
-    missing_pct = (df[cols] == 0).sum() / df.shape[0] * 100
+    # Missing (0 or empty) per replicate column, counted from the packed detection bits
+    detected = DetectionMatrix.from_frame(df, cols).replicate_counts()
+    missing_pct = (df.shape[0] - detected) / df.shape[0] * 100
     return missing_pct
 
 def print_stats(name, data):
@@ -6,6 +6,66 @@ import os
 import tkinter as tk
 from tkinter import filedialog
 
+from Functions.replicate_collapse import collapse_replicates, group_replicates, mask_undetected, replicate_condition
+
+def get_dataset(sample):
+    # Identify dataset from replicate naming
+    return "P1" if sample.startswith("F_") or sample.startswith("R_") else "P2"
+
+
+def shared_norm_filter(df):
+    """Shared-peptide, >=3-replicate filter, group medians/IQR and log2 median normalization.
+
+    df has one row per peptide (index), a GravyScore column and replicate columns (name.N),
+    zeros already NaN. Works on the wide matrix with a replicate -> group index instead of a
+    stacked long table. Returns (replicate-level long table, medians/IQR, log2-normalized medians).
+    """
+    gravy = df["GravyScore"]
+    rep_cols = [col for col in df.columns if re.match(r".*\.\d+$", col)]
+    groups = group_replicates(rep_cols)
+    samples = [replicate_condition(col) for col in rep_cols]
+    datasets = [get_dataset(sample) for sample in samples]
+    in_p1 = np.array([dataset == "P1" for dataset in datasets])
+
+    # Shared peptides: detected in at least 1 replicate in both P1 and P2
+    detected = df[rep_cols].notna().to_numpy()
+    shared = detected[:, in_p1].any(axis=1) & detected[:, ~in_p1].any(axis=1)
+
+    # Peptide × sample groups with <3 replicates become NaN, then peptides left without
+    # any valid value in any group are removed
+    filtered = mask_undetected(df[shared], groups)[rep_cols]
+    filtered = filtered[filtered.notna().any(axis=1)]
+
+    # Replicate-level long table: every replicate of every kept peptide, in matrix order
+    n_reps = len(rep_cols)
+    df_long = pd.DataFrame({
+        "peptide": np.repeat(filtered.index.to_numpy(), n_reps),
+        "replicate": np.tile(rep_cols, len(filtered)),
+        "intensity": filtered.to_numpy().ravel(),
+        "sample": np.tile(samples, len(filtered)),
+        "GravyScore": np.repeat(gravy.loc[filtered.index].to_numpy(), n_reps),
+        "dataset": np.tile(datasets, len(filtered)),
+    })
+
+    # Group-level summary: median and IQR (sorted by peptide and sample, like a pivot)
+    collapsed = collapse_replicates(filtered, groups)
+    sample_order = sorted(groups)
+    summary = pd.concat([
+        collapsed["median"][sample_order].add_prefix("median_"),
+        (collapsed["q3"] - collapsed["q1"])[sample_order].add_prefix("IQR_"),
+    ], axis=1).sort_index()
+    summary.index.name = "peptide"
+    summary["GravyScore"] = gravy
+
+    # Log2 transform and median normalize the medians
+    med_cols = [col for col in summary.columns if col.startswith("median_")]
+    df_log = np.log2(summary[med_cols])
+    df_norm = df_log.sub(df_log.median(axis=0), axis=1)
+    df_final = pd.concat([df_norm, summary[["GravyScore"]]], axis=1)
+
+    return df_long, summary, df_final
+
+
 def main():
     # GUI: Select input file
     root = tk.Tk()
@@ -30,64 +90,17 @@ def main():
         print("Missing 'GravyScore' column.")
         return
 
-    gravy = df["GravyScore"]
-    rep_cols = [col for col in df.columns if re.match(r".*\.\d+$", col)]
-    df_reps = df[rep_cols].copy()
-
-    # Map replicates to group names
-    group_map = {col: col.rsplit(".", 1)[0] for col in rep_cols}
-    df_long = df_reps.stack().reset_index()
-    df_long.columns = ["peptide", "replicate", "intensity"]
-    df_long["sample"] = df_long["replicate"].map(group_map)
-    df_long["GravyScore"] = df_long["peptide"].map(gravy)
-
-    # Identify dataset from replicate naming
-    def get_dataset(sample):
-        return "P1" if sample.startswith("F_") or sample.startswith("R_") else "P2"
-    df_long["dataset"] = df_long["sample"].apply(get_dataset)
-
-    # Find shared peptides: detected in at least 1 replicate in both P1 and P2
-    detected = df_long.dropna(subset=["intensity"])
-    dataset_presence = detected.groupby(["peptide", "dataset"]).size().unstack(fill_value=0)
-    shared_peptides = dataset_presence[(dataset_presence["P1"] > 0) & (dataset_presence["P2"] > 0)].index
-
-    # Filter to shared peptides only
-    df_long = df_long[df_long["peptide"].isin(shared_peptides)]
-
-    # Filter peptide × sample groups with <3 replicates
-    rep_counts = df_long.groupby(["peptide", "sample"])["intensity"].apply(lambda x: x.notna().sum())
-    keep = rep_counts[rep_counts >= 3].index
-    df_long.loc[~df_long.set_index(["peptide", "sample"]).index.isin(keep), "intensity"] = np.nan
-
-    # NEW: Remove peptides with no valid values in any group
-    valid_peptides = df_long.dropna(subset=["intensity"])["peptide"].unique()
-    df_long = df_long[df_long["peptide"].isin(valid_peptides)]
+    df_long, summary, df_final = shared_norm_filter(df)
 
     # Save filtered long-form replicate-level data
     filtered_path = os.path.join(output_dir, "filtered_replicate_level.csv")
     df_long.to_csv(filtered_path, index=False)
     print(f"Saved replicate-level data: {filtered_path}")
 
-    # Compute group-level summary: median and IQR
-    summary = (
-        df_long.groupby(["peptide", "sample"])["intensity"]
-        .agg(median="median", IQR=lambda x: np.nanpercentile(x, 75) - np.nanpercentile(x, 25))
-        .reset_index()
-        .pivot(index="peptide", columns="sample")
-    )
-    summary.columns = ['_'.join(col).strip() for col in summary.columns.values]
-    summary["GravyScore"] = df_long.drop_duplicates("peptide").set_index("peptide")["GravyScore"]
-
     summary_path = os.path.join(output_dir, "group_medians_iqr.csv")
     summary.to_csv(summary_path)
     print(f"Saved group-level summary: {summary_path}")
 
-    # Log2 transform and median normalize the medians
-    med_cols = [col for col in summary.columns if col.startswith("median_")]
-    df_log = np.log2(summary[med_cols])
-    df_norm = df_log.sub(df_log.median(axis=0), axis=1)
-    df_final = pd.concat([df_norm, summary[["GravyScore"]]], axis=1)
-
     norm_path = os.path.join(output_dir, "group_medians_log2norm.csv")
     df_final.to_csv(norm_path)
     print(f"Saved log2-normalized summary: {norm_path}")
@@ -0,0 +1 @@
+#Headless NanoPillarDigest pipeline: python -m nanopillar run config.toml
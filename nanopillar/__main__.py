@@ -0,0 +1,28 @@
+#Command line entry point: python -m nanopillar run config.toml [--until STAGE]
+#Runs from the repository root (like the scripts, which import Functions from there).
+
+import argparse
+import sys
+
+from nanopillar.pipeline import STAGES, load_config, run_pipeline
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m nanopillar",
+                                     description="Run the NanoPillarDigest pipeline without dialogs.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    run = commands.add_parser("run", help="run the stages of a pipeline TOML file")
+    run.add_argument("config", help="pipeline configuration (see nanopillar/example.toml)")
+    run.add_argument("--until", choices=STAGES, help="last stage to run (overrides the configuration)")
+    args = parser.parse_args(argv)
+
+    try:
+        run_pipeline(load_config(args.config), until=args.until)
+    except (OSError, ValueError) as e:
+        print(e, file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
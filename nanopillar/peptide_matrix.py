@@ -0,0 +1,173 @@
+#Typed table handed between the pipeline stages: peptide metadata plus a float32 matrix.
+#The intensities are one contiguous peptides x samples float32 array and the metadata
+#(GravySequence, GravyScore, Precursor.Charge, ...) a small DataFrame, so stages pass the
+#arrays along instead of formatting and re-parsing CSV text. Checkpoints are binary: a
+#folder with values.npy (memory-mapped on load), one .npy per metadata column (strings
+#factorized, like the pr_matrix cache) and a meta.json with the sample names and attributes.
+
+import json
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+from Functions.processed_merge import KEY_COLUMN, META_COLUMNS, is_sample_column
+
+CHECKPOINT_VERSION = 1
+
+CHECKPOINT_SUFFIX = ".npmatrix"
+
+
+class PeptideMatrix:
+    """Peptide metadata (DataFrame) and intensities (peptides x samples array) of one stage.
+
+    attrs holds small JSON-serializable facts about the table (e.g. the stage that made
+    it); they are saved with the checkpoint.
+    """
+
+    def __init__(self, meta, values, samples, attrs=None):
+        if values.shape != (len(meta), len(samples)):
+            raise ValueError(f"Values of shape {values.shape} do not match {len(meta)} peptides "
+                             f"x {len(samples)} samples")
+        self.meta = meta.reset_index(drop=True)
+        self.values = values
+        self.samples = list(samples)
+        self.attrs = dict(attrs or {})
+
+    @classmethod
+    def from_frame(cls, df, samples=None, dtype=np.float32, attrs=None):
+        """Split a processed/merged table into metadata and a contiguous sample matrix."""
+        samples = [col for col in df.columns if is_sample_column(col)] if samples is None else list(samples)
+        meta = df[[col for col in df.columns if col not in set(samples)]]
+        values = np.ascontiguousarray(df[samples].to_numpy(dtype=dtype))
+        return cls(meta, values, samples, attrs)
+
+    def __len__(self):
+        return len(self.meta)
+
+    @property
+    def shape(self):
+        return self.values.shape
+
+    def frame(self):
+        """The sample matrix as a DataFrame (a view of values, no copy)."""
+        return pd.DataFrame(self.values, columns=self.samples, copy=False)
+
+    def to_frame(self, decimals=None):
+        """Metadata and sample columns as one table, e.g. to write a CSV."""
+        samples = self.frame()
+        if decimals is not None:
+            samples = samples.astype(float).round(decimals)
+        return pd.concat([self.meta, samples], axis=1)
+
+    def with_values(self, values, samples, attrs=None):
+        """A matrix with the same peptides (metadata) and new sample columns."""
+        return PeptideMatrix(self.meta, values, samples, {**self.attrs, **(attrs or {})})
+
+    def save(self, path):
+        """Write a binary checkpoint folder (replaced atomically if it exists)."""
+        tmp_dir = f"{path}.tmp-{os.getpid()}"
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        os.makedirs(tmp_dir)
+
+        np.save(os.path.join(tmp_dir, "values.npy"), np.ascontiguousarray(self.values))
+        columns = []
+        for i, (name, values) in enumerate(self.meta.items()):
+            column = {"name": name, "file": f"m{i:03d}"}
+            _save_column(tmp_dir, column, values)
+            columns.append(column)
+
+        meta = {
+            "version": CHECKPOINT_VERSION,
+            "n_rows": len(self.meta),
+            "samples": self.samples,
+            "meta_columns": columns,
+            "attrs": self.attrs,
+        }
+        with open(os.path.join(tmp_dir, "meta.json"), "w", encoding="utf-8") as file:
+            json.dump(meta, file)
+
+        shutil.rmtree(path, ignore_errors=True)
+        os.replace(tmp_dir, path)
+        return path
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        """Read a checkpoint folder; with mmap the values stay on disk until used (read-only)."""
+        meta_file = os.path.join(path, "meta.json")
+        if not os.path.isfile(meta_file):
+            raise ValueError(f"{path} is not a peptide matrix checkpoint")
+        with open(meta_file, "r", encoding="utf-8") as file:
+            meta = json.load(file)
+        if meta.get("version") != CHECKPOINT_VERSION:
+            raise ValueError(f"{path} was written by another checkpoint version")
+
+        values = np.load(os.path.join(path, "values.npy"), mmap_mode="r" if mmap else None)
+        columns = {column["name"]: _load_column(path, column) for column in meta["meta_columns"]}
+        return cls(pd.DataFrame(columns, index=pd.RangeIndex(meta["n_rows"])), values, meta["samples"],
+                   meta["attrs"])
+
+
+def merge_matrices(matrices, dtype=np.float32):
+    """Outer-join processed matrices on GravySequence, like merge_processed_tables.
+
+    Rows keep the order in which peptides are first seen, with the GravyScore and
+    Precursor.Charge of that first row; sample values come from the last row seen. Only
+    sample columns (with a number in their name) are kept, and their 0 values become NaN.
+    """
+    matrices = list(matrices)
+    keys = pd.concat([matrix.meta[KEY_COLUMN] for matrix in matrices], ignore_index=True)
+    codes, uniques = pd.factorize(keys)
+
+    # factorize numbers the peptides in order of first appearance
+    _, first_rows = np.unique(codes, return_index=True)
+    meta = pd.concat([matrix.meta[META_COLUMNS] for matrix in matrices], ignore_index=True).iloc[first_rows]
+
+    samples = list(dict.fromkeys(sample for matrix in matrices for sample in matrix.samples
+                                 if is_sample_column(sample)))
+    position = {sample: i for i, sample in enumerate(samples)}
+    values = np.full((len(uniques), len(samples)), np.nan, dtype=dtype)
+
+    offset = 0
+    for matrix in matrices:
+        matrix_codes = codes[offset:offset + len(matrix)]
+        offset += len(matrix)
+        # Last row of every peptide in this matrix (a peptide measured at several charges)
+        reversed_codes = matrix_codes[::-1]
+        _, last = np.unique(reversed_codes, return_index=True)
+        rows = len(matrix) - 1 - last
+        kept = [i for i, sample in enumerate(matrix.samples) if sample in position]
+        columns = [position[matrix.samples[i]] for i in kept]
+        values[np.ix_(matrix_codes[rows], columns)] = matrix.values[np.ix_(rows, kept)]
+
+    values[values == 0] = np.nan
+    return PeptideMatrix(meta, values, samples)
+
+
+def _save_column(directory, column, values):
+    base = os.path.join(directory, column["file"])
+    if pd.api.types.is_numeric_dtype(values.dtype):
+        column["kind"] = "numeric"
+        np.save(base + ".npy", values.to_numpy())
+    else:
+        # Strings are stored factorized; code -1 marks a missing value
+        column["kind"] = "string"
+        codes, uniques = pd.factorize(values)
+        uniques = np.asarray(uniques, dtype=str) if len(uniques) else np.array([], dtype="U1")
+        np.save(base + ".codes.npy", codes.astype(np.int32))
+        np.save(base + ".uniques.npy", uniques)
+
+
+def _load_column(directory, column):
+    base = os.path.join(directory, column["file"])
+    if column["kind"] == "numeric":
+        return np.load(base + ".npy")
+
+    codes = np.load(base + ".codes.npy")
+    uniques = np.load(base + ".uniques.npy").astype(object)
+    values = np.empty(len(codes), dtype=object)
+    present = codes >= 0
+    values[present] = uniques[codes[present]]
+    values[~present] = np.nan
+    return values
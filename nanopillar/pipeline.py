@@ -0,0 +1,212 @@
+#Batch runner of the NanoPillarDigest pipeline, configured by one TOML file (see example.toml).
+#The stages run in order on PeptideMatrix objects (metadata + float32 intensities): every
+#input pr_matrix is processed, all plates are merged, missingness is summarised, replicates
+#averaged, the averages binned by GRAVY and the binned means plotted. Nothing is written or
+#rounded between stages. Tables of the stages listed in "write" are saved as CSV under the
+#file names the interactive scripts use; stages listed in "checkpoint" are saved as binary
+#PeptideMatrix folders, and "resume" continues a run from such a checkpoint.
+
+import os
+import tomllib
+
+import numpy as np
+import pandas as pd
+
+from Functions.plate_normalization import read_bridge_factors
+from Functions.pr_matrix_stream import SCALING_FACTORS
+from nanopillar import stages
+from nanopillar.peptide_matrix import CHECKPOINT_SUFFIX, PeptideMatrix, merge_matrices
+
+STAGES = ("process", "merge", "missingness", "avg", "bin", "plot")
+
+# Stages whose result is a PeptideMatrix, so they can be checkpointed and resumed from
+MATRIX_STAGES = ("process", "merge", "avg")
+
+# Last stage when the configuration has no "until" (plot needs matplotlib and seaborn)
+DEFAULT_UNTIL = "bin"
+
+DEFAULT_WRITE = ("bin",)
+
+# Intensity dtype of the matrices ("float64" keeps the precision of the script outputs)
+DEFAULT_DTYPE = "float32"
+
+
+def load_config(path):
+    """Read a pipeline TOML file; relative paths in it are taken relative to the file."""
+    with open(path, "rb") as file:
+        config = tomllib.load(file)
+    base_dir = os.path.dirname(os.path.abspath(path))
+
+    def resolve(value):
+        return value if not value or os.path.isabs(value) else os.path.join(base_dir, value)
+
+    config["output_dir"] = resolve(config.get("output_dir", "."))
+    for key in ("sample_names", "resume"):
+        if config.get(key):
+            config[key] = resolve(config[key])
+    scaling = config.setdefault("scaling", {})
+    if scaling.get("factors_file"):
+        scaling["factors_file"] = resolve(scaling["factors_file"])
+    for entry in config.get("inputs", []):
+        for key in ("pr_matrix", "processed", "matrix", "sample_names"):
+            if entry.get(key):
+                entry[key] = resolve(entry[key])
+    return config
+
+
+def run_pipeline(config, until=None):
+    """Run the stages of config up to until (default config["until"], else DEFAULT_UNTIL).
+
+    Returns {stage: result}: a {name: PeptideMatrix} dict for process, a PeptideMatrix for
+    merge and avg, (peptide rates, binned rates) for missingness, the long statistics table
+    for bin and the image path for plot.
+    """
+    until = until or config.get("until", DEFAULT_UNTIL)
+    _check_stages([until], "until")
+    write = set(config.get("write", DEFAULT_WRITE))
+    _check_stages(write, "write")
+    checkpoints = set(config.get("checkpoint", []))
+    _check_stages(checkpoints, "checkpoint", allowed=MATRIX_STAGES)
+
+    output_dir = config["output_dir"]
+    os.makedirs(output_dir, exist_ok=True)
+    run = _Run(config, output_dir, write, checkpoints)
+
+    if config.get("resume"):
+        matrix = PeptideMatrix.load(config["resume"])
+        start = matrix.attrs.get("stage")
+        if start not in MATRIX_STAGES or start == "process":
+            raise ValueError(f"Cannot resume from a checkpoint of stage {start}")
+        name = matrix.attrs.get("name", os.path.basename(config["resume"]).removesuffix(CHECKPOINT_SUFFIX))
+        run.results[start] = matrix
+        print(f"Resuming after {start}: {config['resume']}")
+    else:
+        start = "merge"
+        processed = run.process()
+        if until == "process":
+            return run.results
+        name = "-".join(processed) + " - merged"
+        matrix = run.finish("merge", merge_matrices(processed.values(), dtype=run.dtype), name)
+
+    for stage in STAGES[STAGES.index(start) + 1:STAGES.index(until) + 1]:
+        if stage == "missingness":
+            run.missingness(matrix, name)
+        elif stage == "avg":
+            name = "avg-replicas-" + name
+            matrix = run.finish("avg", stages.average_matrix(matrix), name)
+        elif stage == "bin":
+            name = "binned statistics, " + name
+            run.bin(matrix, name)
+        else:
+            statistic = config.get("plot", {}).get("statistic", "mean")
+            output_file = os.path.join(output_dir, f"{name} - {statistic} heatmap.png")
+            run.results["plot"] = stages.plot_binned(run.results["bin"], output_file, statistic=statistic)
+            print("Plot written to: \n" + output_file)
+    return run.results
+
+
+class _Run:
+    """Results and outputs of one run_pipeline call."""
+
+    def __init__(self, config, output_dir, write, checkpoints):
+        self.config = config
+        self.output_dir = output_dir
+        self.write = write
+        self.checkpoints = checkpoints
+        self.dtype = np.dtype(config.get("dtype", DEFAULT_DTYPE))
+        self.results = {}
+
+    def process(self):
+        # One matrix per input (processed CSVs and checkpoints are read as they are)
+        inputs = self.config.get("inputs", [])
+        if not inputs:
+            raise ValueError("No inputs in the pipeline configuration")
+        processed = self.results["process"] = {}
+        for entry in inputs:
+            name = _input_name(entry)
+            if name in processed:
+                raise ValueError(f"Two inputs are named {name}; give them different plates")
+            if entry.get("matrix"):
+                processed[name] = PeptideMatrix.load(entry["matrix"])
+            elif entry.get("processed"):
+                processed[name] = PeptideMatrix.from_frame(pd.read_csv(entry["processed"], sep=","), dtype=self.dtype)
+            else:
+                matrix = stages.process_matrix(entry["pr_matrix"], _sample_names(self.config, entry),
+                                               scaling=_scaling(self.config, entry), dtype=self.dtype)
+                print(f"Processed: {entry['pr_matrix']}")
+                processed[name] = self.finish("process", matrix, name)
+        return processed
+
+    def finish(self, stage, matrix, name):
+        # Record, write and checkpoint the PeptideMatrix of a stage
+        matrix.attrs.update(stage=stage, name=name)
+        if stage != "process":
+            self.results[stage] = matrix
+        if stage in self.write:
+            if stage == "process":
+                output_file = os.path.join(self.output_dir, name + ".csv")
+                stages.write_processed_csv(matrix.to_frame(), output_file)
+                print("Written output file: \n" + output_file)
+            else:
+                decimals = self.config.get("avg", {}).get("decimals", stages.DECIMALS) if stage == "avg" else None
+                self.write_table(matrix.to_frame(decimals=decimals), name + ".csv")
+        if stage in self.checkpoints:
+            path = matrix.save(os.path.join(self.output_dir, name + CHECKPOINT_SUFFIX))
+            print("Checkpoint written to: \n" + path)
+        return matrix
+
+    def missingness(self, matrix, name):
+        num_bins = self.config.get("missingness", {}).get("num_bins", stages.MISSINGNESS_BINS)
+        rates, binned = self.results["missingness"] = stages.missingness(matrix, num_bins=num_bins)
+        if "missingness" in self.write:
+            self.write_table(rates, name + "_missingness_rates_with_gravy.csv", index=True)
+            self.write_table(binned, name + "_binned_missingness.csv")
+
+    def bin(self, matrix, name):
+        options = self.config.get("bin", {})
+        table = self.results["bin"] = stages.bin_matrix(matrix, num_bins=options.get("num_bins", stages.NUM_BINS))
+        if "bin" in self.write:
+            # Rounded only in the CSV, like the 4-bin script
+            decimals = options.get("decimals", stages.DECIMALS)
+            self.write_table(table if decimals is None else table.round(decimals), name + ".csv")
+
+    def write_table(self, table, filename, index=False):
+        output_file = os.path.join(self.output_dir, filename)
+        table.to_csv(output_file, index=index)
+        print("Result written to: \n" + output_file)
+        return output_file
+
+
+def _check_stages(selected, setting, allowed=STAGES):
+    unknown = set(selected) - set(allowed)
+    if unknown:
+        raise ValueError(f"Unknown stages in {setting}: {sorted(unknown)} (expected {', '.join(allowed)})")
+
+
+def _input_name(entry):
+    if entry.get("matrix"):
+        return os.path.basename(entry["matrix"]).removesuffix(CHECKPOINT_SUFFIX)
+    if entry.get("processed"):
+        return os.path.splitext(os.path.basename(entry["processed"]))[0]
+    # DIA-NN names every matrix report.pr_matrix.tsv, so the plate goes in front (P2_report...)
+    plate = entry.get("plate")
+    return (f"{plate}_" if plate else "") + os.path.basename(entry["pr_matrix"]) + "_processed"
+
+
+def _sample_names(config, entry):
+    path = entry.get("sample_names") or config.get("sample_names")
+    if not path:
+        raise ValueError(f"No sample_names map for {entry['pr_matrix']}")
+    return stages.read_sample_names(path)
+
+
+def _scaling(config, entry):
+    # Factors of the input's plate from a bridge_factors CSV, else the fixed surface factors
+    factors_file = config["scaling"].get("factors_file")
+    if not factors_file:
+        return SCALING_FACTORS
+    factors = read_bridge_factors(factors_file)
+    plate = entry.get("plate", config["scaling"].get("plate"))
+    if plate not in factors:
+        raise ValueError(f"Plate {plate} of {entry['pr_matrix']} is not in {factors_file}")
+    return factors[plate]
@@ -0,0 +1,214 @@
+#In-memory stages of the NanoPillarDigest pipeline: process -> merge -> avg -> bin -> plot.
+#The DataFrame stages (process_pr_matrix, average_replicates, bin_table) give the tables the
+#Tk scripts in Supermand/NanoPillarDigest write, byte for byte the tables of the scripts
+#before they were split up (the old median table being the "median" rows of bin_table); the
+#scripts only add the file dialogs. The batch runner uses the PeptideMatrix stages
+#(process_matrix, merge_matrices, average_matrix, bin_matrix, missingness), which hand
+#float32 matrices along and round only on output.
+
+import os
+import re
+
+import numpy as np
+import pandas as pd
+
+from Functions.detection_matrix import DetectionMatrix
+from Functions.gravy_binning import (BIN_STATISTICS, GravyBinIndex, bin_statistics, binned_statistics_table,
+                                     select_statistic)
+from Functions.peptide_store import PeptideStore
+from Functions.pr_matrix_cache import read_pr_matrix
+from Functions.pr_matrix_stream import SCALING_FACTORS, scaling_factor
+from Functions.processed_merge import KEY_COLUMN, is_sample_column
+from Functions.replicate_collapse import collapse_replicates, group_replicates
+from nanopillar.peptide_matrix import PeptideMatrix
+
+# Name given to .raw columns that are not in the sample names map
+UNKNOWN_SAMPLE = "UNKNOWN"
+
+NUM_BINS = 50
+
+# GRAVY bins of the missingness summary, as in Missingness.py
+MISSINGNESS_BINS = 20
+
+# Rounding of the averaged and binned values, as in the CSV outputs of the scripts
+DECIMALS = 2
+
+
+def read_sample_names(path):
+    """{raw file path: sample name} from a sample names map (one "path;name" or "path<TAB>name" per line)."""
+    sample_names = {}
+    with open(path, "r") as file:
+        for line in file:
+            line = line.strip()
+            if not line:
+                continue
+            path_part, label = line.split(";" if ";" in line else "\t", 1)
+            sample_names[path_part] = label
+    return sample_names
+
+
+def sample_map(raw_columns, sample_names):
+    """{.raw column: sample name}; columns missing from the map are named UNKNOWN_SAMPLE."""
+    return {col: sample_names.get(col, UNKNOWN_SAMPLE) for col in raw_columns}
+
+
+def process_pr_matrix(pr_file, sample_names, scaling=SCALING_FACTORS):
+    """Processed table of one DIA-NN pr_matrix.tsv (the 1-process-raw-tsv stage).
+
+    Sample columns are renamed with sample_names, missing intensities become 0 and every
+    sample is multiplied by the scaling factor of its surface. Rows are sorted by GravyScore
+    (stable). Raises ValueError when the file has no sequence column or no sample columns.
+    """
+    meta, samples = _process(pr_file, sample_names, scaling)
+    return pd.concat([meta, pd.DataFrame(samples)], axis=1)
+
+
+def process_matrix(pr_file, sample_names, scaling=SCALING_FACTORS, dtype=np.float32):
+    """process_pr_matrix as a PeptideMatrix (float32 intensities by default)."""
+    meta, samples = _process(pr_file, sample_names, scaling, dtype=dtype)
+    values = np.column_stack(list(samples.values())) if samples else np.empty((len(meta), 0), dtype=dtype)
+    return PeptideMatrix(meta, values, list(samples), attrs={"stage": "process"})
+
+
+def write_processed_csv(processed, output_file):
+    # csv-module line endings, like the processed files written before this module existed
+    processed.to_csv(output_file, index=False, lineterminator="\r\n")
+    return output_file
+
+
+def average_replicates(df, decimals=DECIMALS):
+    """Replace the replicate columns by their mean per condition (the 3-avg stage).
+
+    A condition keeps its mean only where at least MIN_DETECTED replicates are non-zero,
+    else it is NaN. As in the original script a missing (NaN) replicate counts as non-zero;
+    the merged tables this stage reads have NaN for every missing value. Means skip NaN and
+    are rounded to decimals (None = no rounding).
+    """
+    sample_cols = [col for col in df.columns if is_sample_column(col)]
+
+    # Group these columns by sample name (excluding the replica index), e.g. R_1.1 -> R_1
+    collapsed = collapse_replicates(df, group_replicates(sample_cols), nan_detected=True)
+    averages = collapsed["mean"] if decimals is None else collapsed["mean"].round(decimals)
+    return pd.concat([df.drop(columns=sample_cols), averages.where(collapsed["passes"])], axis=1)
+
+
+def bin_table(df, num_bins=NUM_BINS, decimals=DECIMALS):
+    """Per-GRAVY-bin statistics of the sample columns in one long table (the 4-bin stage).
+
+    num_bins bins over the GravyScore range, closed on the left like np.digitize; bins
+    without peptides are 0. Values and bin starts are rounded to decimals (None = no rounding).
+    """
+    return _bin(df["GravyScore"], df[[col for col in df.columns if is_sample_column(col)]], num_bins, decimals)
+
+
+def average_matrix(matrix):
+    """average_replicates of a PeptideMatrix, without rounding: one float32 column per condition."""
+    collapsed = collapse_replicates(matrix.frame(), group_replicates(matrix.samples), nan_detected=True)
+    averages = collapsed["mean"].where(collapsed["passes"])
+    values = np.ascontiguousarray(averages.to_numpy(dtype=matrix.values.dtype))
+    return matrix.with_values(values, list(averages.columns), attrs={"stage": "avg"})
+
+
+def bin_matrix(matrix, num_bins=NUM_BINS, decimals=None):
+    """bin_table of a PeptideMatrix (unrounded unless decimals is given)."""
+    return _bin(matrix.meta["GravyScore"], matrix.frame(), num_bins, decimals)
+
+
+def missingness(matrix, num_bins=MISSINGNESS_BINS):
+    """(peptide x condition missing rates with GravyScore, mean missing rate per GRAVY bin).
+
+    The same tables as Missingness.py: replicate columns (name.number) are grouped by
+    condition, peptides are labelled by GravySequence (rows sharing one are pooled) and the
+    bin table has one row per non-empty bin of num_bins over the GravyScore range.
+    """
+    replicates = [col for col in matrix.samples if re.match(r".*\.\d+$", col)]
+    if not replicates:
+        raise ValueError("No replicate columns matched pattern 'name.number'.")
+    groups = dict(sorted(group_replicates(replicates).items()))
+
+    samples = matrix.frame()
+    samples.index = pd.Index(matrix.meta[KEY_COLUMN], name="peptide")
+    rates = DetectionMatrix.from_frame(samples, replicates).missing_rates(groups, pool_labels=True)
+    rates.index.name = "peptide"
+    gravy = matrix.meta.set_index(KEY_COLUMN)["GravyScore"]
+    rates = rates.merge(gravy[~gravy.index.duplicated()], left_index=True, right_index=True)
+
+    scores = rates["GravyScore"].dropna()
+    bin_index = GravyBinIndex.from_scores(scores, num_bins=num_bins)
+    gravy_bins = pd.Series(bin_index.categorical(scores, bin_index.cut_labels()), index=scores.index, name="GravyBin")
+    binned = rates.loc[scores.index, list(groups)].groupby(gravy_bins, observed=True).mean().reset_index()
+    return rates, binned
+
+
+def plot_binned(table, output_file, statistic="mean"):
+    """Save a samples x GRAVY bins heatmap of one statistic of a bin_table to output_file."""
+    # Plotting libraries are only needed for this stage
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+    from matplotlib.colors import SymLogNorm
+
+    selected = select_statistic(table, statistic)
+    heatmap = selected.set_index("bin_start").drop(columns="peptides_count").T
+
+    data_min, data_max = np.nanmin(heatmap.to_numpy()), np.nanmax(heatmap.to_numpy())
+    norm = None if data_min == data_max else SymLogNorm(linthresh=1000, vmin=data_min, vmax=data_max)
+
+    fig = plt.figure(figsize=(20, 10))
+    sns.heatmap(heatmap, cmap="magma", norm=norm, linewidths=0.5, linecolor="gray")
+    plt.xticks(rotation=45, ha="right")
+    plt.xlabel("GravyScore Bins")
+    plt.ylabel("Samples")
+    plt.title(f"Binned {statistic} per sample")
+    os.makedirs(os.path.dirname(os.path.abspath(output_file)), exist_ok=True)
+    fig.savefig(output_file, dpi=300, bbox_inches="tight")
+    plt.close(fig)
+    return output_file
+
+
+def _process(pr_file, sample_names, scaling, dtype=float):
+    # (metadata DataFrame, {sample name: scaled intensities}), both sorted by GravyScore
+    df = read_pr_matrix(pr_file, usecols=lambda col: col.endswith(".raw") or col in (
+        "Modified.Sequence", "Stripped.Sequence", "Precursor.Charge"))
+
+    meta = {}
+    if "Modified.Sequence" in df.columns:
+        sequences = meta["Modified.Sequence"] = df["Modified.Sequence"]
+        meta["GravySequence"] = sequences.str.replace("C(UniMod:4)", "U", regex=False)
+    elif "Stripped.Sequence" in df.columns:
+        sequences = meta["Stripped.Sequence"] = df["Stripped.Sequence"]
+        meta["GravySequence"] = sequences
+    else:
+        raise ValueError("No Modified.Sequence nor Stripped.Sequence column in file.")
+
+    # GRAVY looked up in the shared peptide store, computed only for new peptides
+    with PeptideStore() as store:
+        meta["GravyScore"] = pd.Series(store.gravy(sequences), index=df.index)
+    meta["Precursor.Charge"] = df["Precursor.Charge"]
+
+    names = sample_map([col for col in df.columns if col.endswith(".raw")], sample_names)
+    if not names:
+        raise ValueError("No sample_map")
+    meta = pd.DataFrame(meta)
+    order = np.argsort(meta["GravyScore"].to_numpy(), kind="stable")
+
+    # Columns mapped to the same name keep the position of the first and the values of the last
+    samples = {}
+    for col, name in names.items():
+        values = np.nan_to_num(df[col].to_numpy(dtype=dtype)[order], nan=0)
+        samples[name] = values * np.asarray(scaling_factor(name, scaling), dtype=dtype)
+    return meta.iloc[order].reset_index(drop=True), samples
+
+
+def _bin(scores, samples, num_bins, decimals):
+    bin_index = GravyBinIndex.from_scores(scores, num_bins=num_bins, right=False)
+    bin_codes = bin_index.codes(scores)
+
+    binned = bin_statistics(samples, samples.columns, bin_index, bin_codes, empty_bin_value=0)
+    bin_starts = bin_index.starts
+    if decimals is not None:
+        bin_starts = np.round(bin_starts, decimals)
+        for statistic in BIN_STATISTICS:
+            binned[statistic] = binned[statistic].round(decimals)
+    return binned_statistics_table(binned, bin_starts)